@@ -0,0 +1,246 @@
+"""
+控制路徑端到端延遲基準測試
+
+瀏覽器 -> app_server -> app_client -> 驅動程式 -> 模擬儀器 (含 GPIB 延遲模型)，
+在不同併發數下量測 /api/control、/api/detect 與 /api/status 的 p50/p95/p99 延遲與吞吐量，
+結果存成 JSON 以便比較不同版本。
+
+使用方式:
+    python benchmarks/control_path.py                         # 啟動服務器與模擬模式客戶端後執行
+    python benchmarks/control_path.py --no-spawn              # 使用已在運行的服務器/客戶端
+    python benchmarks/control_path.py --compare baseline.json # 與先前結果比較
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+SERVER_URL = "http://127.0.0.1:8000"
+CLIENT_URL = "http://127.0.0.1:8001"
+
+# 模擬儀器位址 (client/instrument_simulator.py 的 SIMULATED_ADDRESSES)
+PSU_ADDRESS = "GPIB0::6::INSTR"
+DAQ_ADDRESS = "GPIB0::10::INSTR"
+
+# 測試情境: 名稱 -> (HTTP 方法, 路徑, 參數/內容, 每個併發數的請求數比例)
+SCENARIOS = {
+    "control_set_voltage": ("POST", "/api/control", {
+        "instrument_type": "power-supply", "address": PSU_ADDRESS, "action": "set_voltage", "value": "12"
+    }, 1.0),
+    "control_daq_read": ("POST", "/api/control", {
+        "instrument_type": "daq", "address": DAQ_ADDRESS, "action": "read",
+        "value": [{"channel": "101", "unit": "VOLT"}, {"channel": "102", "unit": "VOLT"}]
+    }, 1.0),
+    "status": ("GET", "/api/status", {
+        "instrument_type": "power-supply", "address": PSU_ADDRESS
+    }, 1.0),
+    "detect": ("POST", "/api/detect", None, 0.1),
+}
+
+# 延遲增加超過此比例時在比較結果中標示
+REGRESSION_THRESHOLD = 0.10
+
+
+def percentile_summary(latencies: List[float]) -> Dict[str, float]:
+    """計算延遲統計 (毫秒)"""
+    if not latencies:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "min": None, "max": None}
+    if len(latencies) == 1:
+        cuts = latencies * 99
+    else:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "p50": round(cuts[49] * 1000, 3),
+        "p95": round(cuts[94] * 1000, 3),
+        "p99": round(cuts[98] * 1000, 3),
+        "mean": round(statistics.fmean(latencies) * 1000, 3),
+        "min": round(min(latencies) * 1000, 3),
+        "max": round(max(latencies) * 1000, 3),
+    }
+
+
+async def run_scenario(http: httpx.AsyncClient, name: str, concurrency: int, requests: int) -> Dict:
+    """以固定數量的併發工作者送出請求，量測每個請求的延遲"""
+    method, path, payload, _ = SCENARIOS[name]
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                if method == "GET":
+                    response = await http.get(path, params=payload)
+                else:
+                    response = await http.post(path, json=payload)
+                ok = response.status_code == 200 and response.json().get("success", True)
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "duration": round(duration, 3),
+        "throughput": round(len(latencies) / duration, 2) if duration > 0 else None,
+        **percentile_summary(latencies),
+    }
+
+
+async def run_benchmarks(server_url: str, scenarios: List[str], concurrency_levels: List[int],
+                         requests: int, warmup: int) -> List[Dict]:
+    results = []
+    limits = httpx.Limits(max_connections=max(concurrency_levels) * 2)
+    async with httpx.AsyncClient(base_url=server_url, timeout=120.0, limits=limits) as http:
+        for name in scenarios:
+            count = max(int(requests * SCENARIOS[name][3]), 5)
+            await run_scenario(http, name, 1, warmup)
+            for concurrency in concurrency_levels:
+                result = await run_scenario(http, name, concurrency, max(count, concurrency))
+                results.append(result)
+                print(f"  {name:<22} c={concurrency:<3} p50={result['p50']}ms p95={result['p95']}ms "
+                      f"p99={result['p99']}ms {result['throughput']} req/s errors={result['errors']}")
+    return results
+
+
+def wait_until_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"等待 {url} 啟動逾時")
+
+
+def spawn_stack(server_python: str, client_python: str, latency_scale: float) -> List[subprocess.Popen]:
+    """啟動服務器與模擬模式的客戶端"""
+    log = subprocess.DEVNULL
+    server = subprocess.Popen(
+        [server_python, "-m", "uvicorn", "app_server:app", "--host", "127.0.0.1", "--port", "8000",
+         "--log-level", "warning"],
+        cwd=os.path.join(REPO_ROOT, "server"), stdout=log, stderr=log)
+    client = subprocess.Popen(
+        [client_python, "app_client.py", "--simulate", "--host", "127.0.0.1",
+         "--sim-latency-scale", str(latency_scale)],
+        cwd=os.path.join(REPO_ROOT, "client"), stdout=log, stderr=log)
+    processes = [server, client]
+    try:
+        wait_until_ready(f"{SERVER_URL}/api/my-status")
+        wait_until_ready(f"{CLIENT_URL}/status")
+    except RuntimeError:
+        stop_stack(processes)
+        raise
+    return processes
+
+
+def stop_stack(processes: List[subprocess.Popen]):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict], baseline_path: str):
+    """與先前的結果比較 p50/p95/p99 與吞吐量"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+    print(f"\n與 {baseline_path} 比較:")
+    for result in results:
+        previous = baseline.get((result["scenario"], result["concurrency"]))
+        if not previous:
+            continue
+        changes = []
+        for key in ("p50", "p95", "p99", "throughput"):
+            if result[key] is None or not previous[key]:
+                continue
+            change = (result[key] - previous[key]) / previous[key]
+            worse = change < -REGRESSION_THRESHOLD if key == "throughput" else change > REGRESSION_THRESHOLD
+            changes.append(f"{key} {change:+.0%}{' ⚠' if worse else ''}")
+        print(f"  {result['scenario']:<22} c={result['concurrency']:<3} {', '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="控制路徑端到端延遲基準測試")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2, 4, 8, 16],
+                        help="併發數 (預設: 1 2 4 8 16)")
+    parser.add_argument("--requests", type=int, default=200, help="每個併發數的請求數 (detect 為其 1/10)")
+    parser.add_argument("--warmup", type=int, default=5, help="每個情境的暖身請求數")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="模擬儀器延遲倍率 (0 = 只量測軟體開銷)")
+    parser.add_argument("--no-spawn", action="store_true", help="不啟動服務器/客戶端，使用已在運行的實例")
+    parser.add_argument("--server-url", default=SERVER_URL)
+    parser.add_argument("--server-python", default=sys.executable, help="啟動服務器使用的 Python")
+    parser.add_argument("--client-python", default=sys.executable, help="啟動客戶端使用的 Python")
+    parser.add_argument("--output", help="結果檔案 (預設: benchmarks/results/control_path_<時間>.json)")
+    parser.add_argument("--compare", help="與先前的結果檔案比較")
+    args = parser.parse_args()
+
+    processes = [] if args.no_spawn else spawn_stack(args.server_python, args.client_python, args.latency_scale)
+    try:
+        print(f"🏁 控制路徑基準測試: {args.server_url}")
+        results = asyncio.run(run_benchmarks(args.server_url, args.scenarios, args.concurrency,
+                                             args.requests, args.warmup))
+    finally:
+        stop_stack(processes)
+
+    report = {
+        "benchmark": "control_path",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency_scale": args.latency_scale if not args.no_spawn else None,
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"control_path_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"💾 結果已儲存: {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
 import pyvisa
 import httpx
 import asyncio
@@ -6,7 +7,26 @@ import logging
 from typing import List, Dict, Optional
 from instruments.daq_factory import DAQFactory
 from instruments.afg_factory import AFGFactory
+from daq_alarm_monitor import DAQAlarmMonitor
+from sequence_engine import SequenceEngine
+from efficiency_sweep import EfficiencySweep
+from load_transient import LoadTransientTest
+from instrument_manager import InstrumentStatusReader, connected_instruments, instrument_lock
+from instruments.oscilloscope_interface import TriggerSlope
+from instruments.afg_interface import SweepSpacing, SweepMode, BurstMode
+from waveform_analysis import analyze_waveform, frame_statistics, min_max_decimate, spectrum, to_volts
+from waveform_archive import WaveformArchive
+from file_cache import FileCache
+from instrument_simulator import SimulatedResourceManager
+from instruments.scpi_metrics import scpi_metrics, slowest_commands
+from server_tunnel import serve_tunnel, send_tunnel_event
+from single_flight import SingleFlight
+from job_manager import Job, JobCancelled, JobManager, to_json_safe
+from measurement_logger import MeasurementLogger, list_sessions
 import time
+import json
+import concurrent.futures
+import numpy as np
 import socket
 import threading
 
@@ -20,14 +40,57 @@ app = FastAPI(title="GPIB儀器控制客戶端", version="2.0.0")
 rm = None
 instruments: Dict[str, any] = {}
 
+# DAQ警報監控 - 以儀器位址為key
+alarm_monitors: Dict[str, DAQAlarmMonitor] = {}
+
+# 波形資料庫 (首次使用時建立)
+waveform_archive: Optional[WaveformArchive] = None
+
+# 從儀器讀回的檔案快取 (首次使用時建立)
+file_cache: Optional[FileCache] = None
+
+# DAQ 讀值與電源/負載狀態的量測記錄 (首次使用時建立)
+measurement_logger: Optional[MeasurementLogger] = None
+
 # 客戶端配置
 CLIENT_CONFIG = {
     "server_host": "127.0.0.1",  # 服務器地址
     "server_port": 8000,
     "client_port": 8001,
-    "heartbeat_interval": 30  # 心跳間隔（秒）
+    "heartbeat_interval": 20,  # 通道 ping 間隔（秒），用於偵測斷線
+    "waveform_dir": "waveforms",  # 波形資料庫目錄
+    "file_cache_dir": "file_cache",  # 儀器檔案快取目錄
+    "simulate": False,  # 使用模擬儀器 (不需要硬體)
+    "sim_latency_scale": 1.0,  # 模擬儀器的延遲倍率
+    "scpi_sample_rate": 1.0,  # SCPI 指令延遲的取樣比例 (0 表示只計數不計時)
+    "status_cache_ttl": 1.0,  # /status 中 VISA 資源列表的快取時間（秒）
+    "measurement_dir": "measurements",  # 量測記錄目錄
+    "measurement_fsync_interval": 10.0  # 量測記錄的 fsync 間隔（秒）
 }
 
+# 同時送出的偵測請求共用同一次 GPIB 掃描；VISA 資源列表短暫快取
+# (首次使用時建立，讓 --status-cache-ttl 生效)
+detect_flight = SingleFlight()
+resources_flight: Optional[SingleFlight] = None
+
+# /status 可讀取即時狀態 (並記錄讀值) 的儀器類型
+STATUS_INSTRUMENT_TYPES = ("power-supply", "eload")
+
+# 狀態輪詢的儀器連線 (每台儀器建立一次，儀器被其他操作使用時返回最近一次的狀態)
+status_reader = InstrumentStatusReader()
+
+# 控制指令等待同一台儀器上其他操作 (狀態讀取、效率掃描等) 結束的最長時間（秒）
+CONTROL_LOCK_TIMEOUT = 2.0
+
+# 截圖在示波器上的暫存路徑 (讀回後刪除)
+SCOPE_SCREENSHOT_PATH = "C:/Temp/ate_screenshot.png"
+
+# 長記錄波形每段傳輸的預設點數
+WAVEFORM_CHUNK_POINTS = 1_000_000
+
+# 二進位波形 (繪圖用) 的預設最多點數，超過時以每段最小/最大值抽取
+WAVEFORM_PLOT_POINTS = 2_000_000
+
 def get_local_ip():
     """獲取本機IP地址"""
     try:
@@ -40,11 +103,17 @@ def get_local_ip():
     except Exception:
         return "127.0.0.1"
 
+def create_resource_manager():
+    """建立VISA資源管理器 (模擬模式下使用模擬儀器)"""
+    if CLIENT_CONFIG["simulate"]:
+        return SimulatedResourceManager(latency_scale=CLIENT_CONFIG["sim_latency_scale"])
+    return pyvisa.ResourceManager()
+
 def initialize_visa():
     """初始化VISA資源管理器"""
     global rm
     try:
-        rm = pyvisa.ResourceManager()
+        rm = create_resource_manager()
         logger.info(f"✅ VISA資源管理器初始化成功 - Backend: {rm}")
         
         # 測試VISA是否正常工作
@@ -59,14 +128,20 @@ def initialize_visa():
         logger.error("請確認已安裝 VISA 驅動程式和 pyvisa 套件")
         return False
 
-def scan_gpib_instruments() -> List[Dict[str, str]]:
-    """掃描所有VISA儀器（確保每次都獲取最新列表）"""
+def scan_gpib_instruments(on_progress=None, cancel=None) -> List[Dict[str, str]]:
+    """
+    掃描所有VISA儀器（確保每次都獲取最新列表）
+
+    Args:
+        on_progress: 開始掃描每個資源時呼叫 on_progress(已掃描數, 資源總數, 資源位址)
+        cancel: 返回 True 時停止掃描 (返回已發現的儀器)
+    """
     found_instruments = []
     local_rm = None
 
     try:
         # 每次掃描都創建一個新的ResourceManager以避免快取
-        local_rm = pyvisa.ResourceManager()
+        local_rm = create_resource_manager()
     except Exception as e:
         logger.error(f"❌ VISA初始化失敗: {e}")
         logger.error("請確認已安裝 VISA 驅動程式和 pyvisa 套件")
@@ -77,7 +152,12 @@ def scan_gpib_instruments() -> List[Dict[str, str]]:
         logger.info(f"🔍 掃描所有VISA資源: {resources}")
         logger.info(f"🔌 找到 {len(resources)} 個VISA資源")
         
-        for resource in resources:
+        for index, resource in enumerate(resources):
+            if cancel and cancel():
+                logger.info(f"⏹️ 掃描已取消 ({index}/{len(resources)})")
+                break
+            if on_progress:
+                on_progress(index, len(resources), resource)
             try:
                 logger.info(f"🔗 嘗試連接: {resource}")
                 
@@ -215,6 +295,32 @@ def control_eload_instrument(address: str, action: str, value: Optional[str] = N
                     success, message = True, "電流設定成功"
                 else:
                     return False, "設定電流需要提供數值"
+            elif action == 'set_dynamic':
+                if not isinstance(value, dict):
+                    return False, "設定動態負載需要提供 level1, level2, t1, t2"
+                success = instrument.configure_dynamic(
+                    float(value["level1"]),
+                    float(value["level2"]),
+                    float(value["t1"]),
+                    float(value["t2"]),
+                    float(value.get("rise", 1.0)),
+                    float(value.get("fall", 1.0)),
+                    int(value.get("repeat", 0))
+                )
+                message = "動態負載設定成功" if success else "動態負載設定失敗"
+            elif action == 'set_program':
+                if not isinstance(value, dict) or not value.get("sequences"):
+                    return False, "設定程序需要提供 sequences (e.g., [{'memory': 1, 'on_time': 0.5}])"
+                program = int(value.get("program", 1))
+                success = instrument.configure_program(program, value["sequences"], int(value.get("repeat", 0)))
+                message = f"程序 {program} 設定成功" if success else "程序設定失敗"
+            elif action == 'run_program':
+                program = int(value) if value is not None else 1
+                success = instrument.run_program(program)
+                message = f"程序 {program} 開始執行" if success else "程序執行失敗"
+            elif action == 'stop_program':
+                success = instrument.stop_program()
+                message = "程序已停止" if success else "停止程序失敗"
             else:
                 return False, f"不支持的動作: {action}"
             
@@ -227,28 +333,32 @@ def control_eload_instrument(address: str, action: str, value: Optional[str] = N
         logger.error(f"❌ 控制電子負載 {address} 失敗: {e}")
         return False, f"控制電子負載失敗: {str(e)}"
 
-async def heartbeat_to_server():
-    """定期向服務器發送心跳"""
+def push_event_to_server(event: Dict):
+    """將事件 (如DAQ警報、工作進度) 立即推送到服務器 (已建立通道時經由通道送出，不等待)"""
+    if send_tunnel_event(event):
+        return
+
     server_url = f"http://{CLIENT_CONFIG['server_host']}:{CLIENT_CONFIG['server_port']}"
-    
-    while True:
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{server_url}/api/my-status")
-                if response.status_code == 200:
-                    logger.debug("💓 心跳正常")
-                else:
-                    logger.warning("⚠️ 服務器心跳異常")
-        except Exception as e:
-            logger.debug(f"💔 心跳失敗: {e}")
-        
-        await asyncio.sleep(CLIENT_CONFIG['heartbeat_interval'])
+    try:
+        response = httpx.post(f"{server_url}/api/client-events", json=event, timeout=5.0)
+        if response.status_code != 200:
+            logger.warning(f"⚠️ 事件推送失敗: HTTP {response.status_code}")
+    except Exception as e:
+        logger.warning(f"⚠️ 事件推送失敗: {e}")
+
+def push_alarm_to_server(alarm: Dict):
+    """推送DAQ警報"""
+    push_event_to_server({"type": "alarm", **alarm})
+
+def push_alarm_monitor_state(status: Dict):
+    """推送DAQ警報監控的狀態 (監控中、暫停、失敗、停止)"""
+    push_event_to_server({"type": "alarm_monitor", **status})
 
 @app.on_event("startup")
 async def startup_event():
     """啟動時執行"""
     local_ip = get_local_ip()
-    logger.info(f"🚀 啟動GPIB儀器控制客戶端...")
+    logger.info("🚀 啟動GPIB儀器控制客戶端...")
     logger.info(f"📍 本機IP: {local_ip}")
     logger.info(f"🌐 服務器: {CLIENT_CONFIG['server_host']}:{CLIENT_CONFIG['server_port']}")
     
@@ -261,29 +371,49 @@ async def startup_event():
         instruments_found = scan_gpib_instruments()
         logger.info(f"✅ 啟動掃描完成，發現 {len(instruments_found)} 個儀器")
     
-    # 啟動心跳任務
-    asyncio.create_task(heartbeat_to_server())
+    # 建立到服務器的持久通道 (服務器經由通道送出控制請求，並即時得知客戶端斷線)
+    tunnel_url = f"ws://{CLIENT_CONFIG['server_host']}:{CLIENT_CONFIG['server_port']}/api/tunnel"
+    asyncio.create_task(serve_tunnel(app, tunnel_url, CLIENT_CONFIG['heartbeat_interval']))
     
     logger.info("✅ 客戶端啟動完成")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """關閉時執行"""
+    for monitor in alarm_monitors.values():
+        monitor.stop()
+    alarm_monitors.clear()
+    job_manager.cancel_all()
+    status_reader.close()
+    if waveform_archive:
+        waveform_archive.close()
+    if measurement_logger:
+        measurement_logger.stop()
+
+async def run_detect(on_progress=None, cancel=None) -> dict:
+    logger.info("🔍 開始偵測VISA儀器...")
+
+    start_time = time.time()
+    instruments_list = await asyncio.to_thread(scan_gpib_instruments, on_progress, cancel)
+    scan_time = time.time() - start_time
+    if cancel and cancel():
+        # 不把部分結果當作完整的儀器列表交給共用這次掃描的請求
+        raise JobCancelled("掃描已取消")
+
+    logger.info(f"⏱️ 掃描完成，耗時 {scan_time:.2f} 秒")
+
+    return {
+        "success": True,
+        "instruments": instruments_list,
+        "count": len(instruments_list),
+        "scan_time": round(scan_time, 2)
+    }
+
 @app.post("/detect")
 async def detect_instruments():
-    """偵測儀器API端點"""
+    """偵測儀器API端點 (掃描進行中時，後到的請求等待並共用同一次掃描的結果)"""
     try:
-        logger.info("🔍 開始偵測VISA儀器...")
-        
-        start_time = time.time()
-        instruments_list = scan_gpib_instruments()
-        scan_time = time.time() - start_time
-        
-        logger.info(f"⏱️ 掃描完成，耗時 {scan_time:.2f} 秒")
-        
-        return {
-            "success": True,
-            "instruments": instruments_list,
-            "count": len(instruments_list),
-            "scan_time": round(scan_time, 2)
-        }
+        return await detect_flight.run("detect", run_detect)
         
     except Exception as e:
         logger.error(f"❌ 偵測儀器失敗: {e}")
@@ -295,7 +425,26 @@ async def detect_instruments():
 
 @app.post("/control")
 async def control_instrument(request: dict):
-    """控制儀器API端點"""
+    """控制儀器API端點 (在背景執行緒中執行，等待儀器與 VISA 通訊時不阻塞其他請求與通道)"""
+    return await asyncio.to_thread(run_locked_control, request)
+
+def run_locked_control(request: dict) -> dict:
+    """取得儀器的鎖後執行控制指令 (同一台儀器正被其他操作使用時最多等待 CONTROL_LOCK_TIMEOUT 秒)"""
+    address = request.get("address")
+    # 警報監控以自己的連線在背景長時間運行，停止時不需要等待
+    if not address or request.get("action") == "stop_alarm_monitor":
+        return run_control(request)
+
+    lock = instrument_lock(address)
+    if not lock.acquire(timeout=CONTROL_LOCK_TIMEOUT):
+        return {"success": False, "message": f"儀器 {address} 正在執行其他操作 (效率掃描、暫態量測或測試序列)，請稍後再試"}
+    try:
+        return run_control(request)
+    finally:
+        lock.release()
+
+def run_control(request: dict) -> dict:
+    """執行控制指令"""
     try:
         address = request.get("address")
         action = request.get("action")
@@ -307,7 +456,6 @@ async def control_instrument(request: dict):
 
         logger.info(f"🎛️ 控制請求: {instrument_type} ({address}) - {action.upper()}")
 
-        global rm
         if not rm:
             if not initialize_visa():
                 raise HTTPException(status_code=500, detail="VISA資源管理器初始化失敗")
@@ -318,7 +466,6 @@ async def control_instrument(request: dict):
                 if not channels_to_read or not isinstance(channels_to_read, list):
                     raise HTTPException(status_code=400, detail="缺少DAQ通道參數 (value)")
 
-                from instruments.daq_factory import DAQFactory
                 daq_instrument = DAQFactory.create_daq(rm, address)
                 if not daq_instrument:
                     raise HTTPException(status_code=404, detail=f"找不到或不支持的DAQ儀器 at {address}")
@@ -328,6 +475,7 @@ async def control_instrument(request: dict):
                 
                 try:
                     results = daq_instrument.read_channels(channels_to_read)
+                    get_measurement_logger().log(f"daq:{address}", results)
                     return {
                         "success": True,
                         "message": f"成功讀取 {len(results)} 個通道",
@@ -335,6 +483,50 @@ async def control_instrument(request: dict):
                     }
                 finally:
                     daq_instrument.disconnect()
+            elif action == 'start_alarm_monitor':
+                channels_to_watch = request.get("value")
+                if not channels_to_watch or not isinstance(channels_to_watch, list):
+                    raise HTTPException(status_code=400, detail="缺少DAQ警報通道參數 (value)")
+
+                existing_monitor = alarm_monitors.pop(address, None)
+                if existing_monitor:
+                    existing_monitor.stop()
+
+                daq_instrument = DAQFactory.create_daq(rm, address)
+                if not daq_instrument:
+                    raise HTTPException(status_code=404, detail=f"找不到或不支持的DAQ儀器 at {address}")
+
+                monitor = DAQAlarmMonitor(
+                    daq_instrument,
+                    channels_to_watch,
+                    on_alarm=push_alarm_to_server,
+                    scan_interval=float(request.get("scan_interval", 1.0)),
+                    on_state=push_alarm_monitor_state
+                )
+                if not monitor.start():
+                    raise HTTPException(status_code=500, detail=f"無法啟動DAQ警報監控 at {address}")
+
+                alarm_monitors[address] = monitor
+                return {
+                    "success": True,
+                    "message": f"已啟動 {len(channels_to_watch)} 個通道的警報監控",
+                    "address": address,
+                    "action": action.upper(),
+                    "monitor": monitor.status()
+                }
+            elif action == 'stop_alarm_monitor':
+                monitor = alarm_monitors.pop(address, None)
+                if not monitor:
+                    return {"success": False, "message": f"{address} 沒有執行中的警報監控"}
+
+                monitor.stop()
+                return {
+                    "success": True,
+                    "message": "警報監控已停止",
+                    "address": address,
+                    "action": action.upper(),
+                    "monitor": monitor.status()
+                }
             else:
                 raise HTTPException(status_code=400, detail=f"不支持的DAQ動作: {action}")
 
@@ -386,7 +578,6 @@ async def control_instrument(request: dict):
             }
 
         elif instrument_type == 'afg':
-            from instruments.afg_factory import AFGFactory
             instrument = AFGFactory.create_afg(rm, address)
             if not instrument:
                 raise HTTPException(status_code=404, detail=f"找不到或不支持的AFG儀器 at {address}")
@@ -410,6 +601,54 @@ async def control_instrument(request: dict):
                     channel = int(request.get("channel", 1))
                     success = instrument.output_off(channel)
                     message = "輸出關閉成功" if success else "輸出關閉失敗"
+                elif action == 'set_sweep':
+                    if not isinstance(value, dict):
+                        return {"success": False, "message": "設定頻率掃描需要提供 start, stop, time"}
+                    channel = int(request.get("channel", 1))
+                    success = instrument.configure_sweep(
+                        channel,
+                        float(value["start"]),
+                        float(value["stop"]),
+                        float(value["time"]),
+                        SweepSpacing(value.get("spacing", SweepSpacing.LINEAR.value)),
+                        float(value.get("hold_time", 0.0)),
+                        float(value.get("return_time", 0.0)),
+                        SweepMode(value.get("mode", SweepMode.AUTO.value)),
+                        float(value["interval"]) if value.get("interval") is not None else None
+                    )
+                    message = "頻率掃描設定成功" if success else "頻率掃描設定失敗"
+                elif action == 'set_burst':
+                    if not isinstance(value, dict):
+                        return {"success": False, "message": "設定叢發模式需要提供 cycles"}
+                    channel = int(request.get("channel", 1))
+                    cycles = value.get("cycles", 1)
+                    interval = value.get("interval")
+                    success = instrument.configure_burst(
+                        channel,
+                        None if cycles is None else int(cycles),
+                        BurstMode(value.get("mode", BurstMode.TRIGGERED.value)),
+                        None if interval is None else float(interval),
+                        float(value.get("delay", 0.0))
+                    )
+                    message = "叢發模式設定成功" if success else "叢發模式設定失敗"
+                elif action == 'upload_arb':
+                    if not isinstance(value, dict) or not value.get("samples"):
+                        return {"success": False, "message": "上傳任意波形需要提供 samples"}
+                    channel = int(request.get("channel", 1))
+                    success = instrument.upload_arbitrary_waveform(
+                        channel,
+                        np.asarray(value["samples"], dtype=float),
+                        set_levels=bool(value.get("set_levels", False)),
+                        force=bool(value.get("force", False))
+                    )
+                    message = "任意波形上傳成功" if success else "任意波形上傳失敗"
+                elif action == 'trigger':
+                    success = instrument.trigger()
+                    message = "觸發成功" if success else "觸發失敗"
+                elif action == 'continuous':
+                    channel = int(request.get("channel", 1))
+                    success = instrument.set_continuous(channel)
+                    message = "已回到連續輸出" if success else "設定連續輸出失敗"
                 else:
                     return {"success": False, "message": f"不支持的AFG動作: {action}"}
                 
@@ -431,9 +670,666 @@ async def control_instrument(request: dict):
             return {"success": False, "message": e.detail}
         return {"success": False, "message": f"控制失敗: {str(e)}"}
 
+@app.post("/sequence")
+async def run_sequence(recipe: dict):
+    """在客戶端本地執行測試序列，以 NDJSON 串流回傳進度事件"""
+    if not rm and not initialize_visa():
+        raise HTTPException(status_code=500, detail="VISA資源管理器初始化失敗")
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    engine = SequenceEngine(rm, recipe, on_event=lambda e: loop.call_soon_threadsafe(events.put_nowait, e))
+    logger.info(f"📜 開始執行測試序列: {len(recipe.get('steps', []))} 個步驟")
+    worker = threading.Thread(target=engine.run, name="sequence", daemon=True)
+    worker.start()
+
+    async def event_stream():
+        try:
+            while True:
+                event = await events.get()
+                yield json.dumps(event, default=str) + "\n"
+                if event["type"] in ("done", "error"):
+                    break
+        finally:
+            # 瀏覽器或服務器中斷串流時停止序列
+            engine.cancel()
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+def to_json_arrays(arrays: Dict[str, np.ndarray]) -> Dict[str, list]:
+    """將 NumPy 陣列轉為 JSON 可序列化的列表 (NaN 不是合法 JSON，轉為 null)"""
+    return {k: np.where(np.isnan(v), None, v).tolist() if v.dtype.kind == "f" else v.tolist()
+            for k, v in arrays.items()}
+
+def run_efficiency_sweep(request: dict, job: Optional[Job] = None) -> dict:
+    """連接電源/負載/DAQ並執行效率掃描 (以工作執行時逐點回報量測結果，並可取消)"""
+    specs = {
+        "psu": ("power-supply", request.get("psu_address")),
+        "load": ("eload", request.get("load_address")),
+        "daq": ("daq", request.get("daq_address")),
+    }
+    with connected_instruments(rm, specs) as connected:
+        sweep = EfficiencySweep(
+            connected["psu"],
+            connected["load"],
+            connected["daq"],
+            vout_channel=request.get("vout_channel"),
+            tolerance=float(request.get("tolerance", 0.002)),
+            samples=int(request.get("samples", 3)),
+            timeout=float(request.get("settle_timeout", 5.0)),
+            on_point=(lambda point: job.report(point["progress"], point=point)) if job else None,
+        )
+        if job:
+            job.on_cancel(sweep.cancel)
+        start_time = time.time()
+        result = sweep.run(request.get("vin", []), request.get("iout", []))
+        sweep_time = time.time() - start_time
+        logger.info(f"⏱️ 效率掃描完成，耗時 {sweep_time:.2f} 秒")
+
+    return {
+        "success": True,
+        "message": f"完成 {result['efficiency'].size} 個量測點",
+        "sweep_time": round(sweep_time, 2),
+        "results": to_json_arrays(result)
+    }
+
+def run_load_transient(request: dict, job: Optional[Job] = None) -> dict:
+    """連接電子負載/示波器並執行負載暫態量測 (以工作執行時逐次回報擷取結果，並可取消)"""
+    specs = {
+        "load": ("eload", request.get("load_address")),
+        "scope": ("scope", request.get("scope_address")),
+    }
+    with connected_instruments(rm, specs) as connected:
+        test = LoadTransientTest(
+            connected["load"],
+            connected["scope"],
+            vout_channel=int(request.get("vout_channel", 1)),
+            trigger_source=request.get("trigger_source", 2),
+            trigger_level=float(request.get("trigger_level", 0.0)),
+            trigger_slope=TriggerSlope(request.get("trigger_slope", TriggerSlope.RISING.value)),
+            on_step=(lambda step: job.report(step["progress"], step=step)) if job else None,
+        )
+        if job:
+            job.on_cancel(test.cancel)
+        if not test.configure(
+            float(request["level1"]),
+            float(request["level2"]),
+            float(request["t1"]),
+            float(request["t2"]),
+            float(request.get("rise", 1.0)),
+            float(request.get("fall", 1.0)),
+        ):
+            return {"success": False, "message": "負載暫態設定失敗"}
+
+        start_time = time.time()
+        result = test.run(int(request.get("steps", 1)), float(request.get("band", 0.01)))
+        test_time = time.time() - start_time
+        logger.info(f"⏱️ 負載暫態量測完成，耗時 {test_time:.2f} 秒")
+
+    captured = result["statistics"]["overshoot"]["count"]
+    return {
+        "success": captured > 0,
+        "message": f"成功擷取 {captured} 個負載步階",
+        "test_time": round(test_time, 2),
+        "metrics": to_json_arrays(result["metrics"]),
+        "statistics": {name: {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in stats.items()}
+                       for name, stats in result["statistics"].items()}
+    }
+
+@app.post("/sweep/efficiency")
+async def efficiency_sweep(request: dict):
+    """執行電源轉換器效率掃描 (Vin × Iout)"""
+    if not rm and not initialize_visa():
+        return {"success": False, "message": "VISA資源管理器初始化失敗"}
+
+    if not request.get("vin") or not request.get("iout") or not request.get("vout_channel"):
+        return {"success": False, "message": "缺少必要參數 (vin, iout, vout_channel)"}
+
+    try:
+        return await asyncio.to_thread(run_efficiency_sweep, request)
+    except Exception as e:
+        logger.error(f"❌ 效率掃描失敗: {e}")
+        return {"success": False, "message": f"效率掃描失敗: {str(e)}"}
+
+@app.post("/transient")
+async def load_transient(request: dict):
+    """執行負載暫態量測 (動態負載步階 + 示波器擷取)"""
+    if not rm and not initialize_visa():
+        return {"success": False, "message": "VISA資源管理器初始化失敗"}
+
+    if not all(k in request for k in ("load_address", "scope_address", "level1", "level2", "t1", "t2")):
+        return {"success": False, "message": "缺少必要參數 (load_address, scope_address, level1, level2, t1, t2)"}
+
+    try:
+        return await asyncio.to_thread(run_load_transient, request)
+    except Exception as e:
+        logger.error(f"❌ 負載暫態量測失敗: {e}")
+        return {"success": False, "message": f"負載暫態量測失敗: {str(e)}"}
+
+def get_waveform_archive() -> WaveformArchive:
+    """取得波形資料庫"""
+    global waveform_archive
+    if waveform_archive is None:
+        waveform_archive = WaveformArchive(CLIENT_CONFIG["waveform_dir"])
+    return waveform_archive
+
+def run_waveform_analysis(request: dict) -> dict:
+    """下載示波器波形 (或載入已儲存的記錄) 並在客戶端計算波形參數"""
+    capture_id = request.get("capture_id")
+    if capture_id:
+        raw_data, entry = get_waveform_archive().load(capture_id)
+        preamble, channel = entry["preamble"], entry["channel"]
+    else:
+        channel = int(request.get("channel", 1))
+        with connected_instruments(rm, {"scope": ("scope", request.get("address"))}) as connected:
+            raw_data, preamble = connected["scope"].get_waveform_raw(channel)
+
+    if raw_data.size == 0:
+        return {"success": False, "message": f"無法讀取通道 CH{channel} 的波形"}
+
+    if not capture_id and request.get("archive"):
+        capture_id = get_waveform_archive().store(
+            raw_data, preamble, request["address"], channel, tags=request.get("tags"))["id"]
+
+    result = {
+        "success": True,
+        "message": f"完成 {raw_data.size} 點波形分析",
+        "points": int(raw_data.size),
+        "capture_id": capture_id,
+        "measurements": analyze_waveform(raw_data, preamble)
+    }
+    if request.get("spectrum"):
+        frequencies, magnitude = spectrum(raw_data, preamble, nfft=request.get("nfft"))
+        result["spectrum"] = to_json_arrays({"frequency": frequencies, "magnitude": magnitude})
+    result["measurements"] = {k: (None if np.isnan(v) else v) for k, v in result["measurements"].items()}
+    return result
+
+@app.post("/scope/analyze")
+async def analyze_scope_waveform(request: dict):
+    """下載示波器波形並計算 pk-pk、RMS、上升/下降時間、工作週期、頻率與頻譜"""
+    if not request.get("address") and not request.get("capture_id"):
+        return {"success": False, "message": "缺少必要參數 (address 或 capture_id)"}
+
+    # 分析已儲存的記錄不需要連接儀器
+    if not request.get("capture_id") and not rm and not initialize_visa():
+        return {"success": False, "message": "VISA資源管理器初始化失敗"}
+
+    try:
+        return await asyncio.to_thread(run_waveform_analysis, request)
+    except Exception as e:
+        logger.error(f"❌ 波形分析失敗: {e}")
+        return {"success": False, "message": f"波形分析失敗: {str(e)}"}
+
+def run_fastframe_capture(request: dict) -> dict:
+    """以 FastFrame 一次擷取多個觸發事件，並一次下載所有分段"""
+    channel = int(request.get("channel", 1))
+    frames = int(request["frames"])
+    timeout = float(request.get("timeout", 10.0))
+    with connected_instruments(rm, {"scope": ("scope", request.get("address"))}) as connected:
+        scope = connected["scope"]
+        if not scope.configure_fastframe(frames):
+            return {"success": False, "message": "FastFrame設定失敗"}
+        try:
+            start_time = time.time()
+            if not scope.single_acquisition() or not scope.wait_for_acquisition(timeout):
+                return {"success": False, "message": f"示波器在 {timeout} 秒內未完成 {frames} 個分段"}
+            acquire_time = time.time() - start_time
+            raw_data, timestamps, preamble = scope.get_fastframe_raw(channel, int(request.get("width", 1)))
+            download_time = time.time() - start_time - acquire_time
+        finally:
+            scope.configure_fastframe(0)
+            scope.start_acquisition()
+
+    if raw_data.size == 0:
+        return {"success": False, "message": f"無法讀取通道 CH{channel} 的FastFrame波形"}
+
+    captured = raw_data.shape[0]
+    span = float(timestamps[-1]) if timestamps.size > 1 else 0.0
+    logger.info(f"🎞️ FastFrame擷取 {captured} 個分段，擷取 {acquire_time:.2f} 秒，下載 {download_time:.2f} 秒")
+    return {
+        "success": True,
+        "message": f"成功擷取 {captured} 個分段",
+        "frames": captured,
+        "record_length": int(raw_data.shape[1]),
+        "acquire_time": round(acquire_time, 3),
+        "download_time": round(download_time, 3),
+        "event_rate": (timestamps.size - 1) / span if span > 0 else None,
+        "timestamps": timestamps.tolist(),
+        "statistics": to_json_arrays(frame_statistics(raw_data, preamble))
+    }
+
+def record_waveform(request: dict, on_event, cancel: threading.Event):
+    """分段下載長記錄波形，直接寫入波形資料庫"""
+    channel = int(request.get("channel", 1))
+    archive = get_waveform_archive()
+    capture_id, filepath = archive.reserve()
+
+    try:
+        with connected_instruments(rm, {"scope": ("scope", request.get("address"))}) as connected:
+            start_time = time.time()
+            result = connected["scope"].stream_waveform_to_file(
+                channel,
+                filepath,
+                chunk_points=int(request.get("chunk_points", WAVEFORM_CHUNK_POINTS)),
+                width=int(request.get("width", 1)),
+                on_progress=lambda done, total: on_event(
+                    {"type": "progress", "points": done, "record_length": total, "progress": done / total}),
+                cancel=cancel.is_set,
+            )
+            record_time = time.time() - start_time
+    except Exception as e:
+        logger.error(f"❌ 長記錄波形下載失敗: {e}")
+        on_event({"type": "error", "message": f"長記錄波形下載失敗: {str(e)}"})
+        return
+
+    if not result:
+        on_event({"type": "error", "message": f"無法讀取通道 CH{channel} 的波形"})
+        return
+
+    # 未完整下載的記錄已由驅動刪除，不登錄
+    if result["complete"]:
+        archive.register(capture_id, result["dtype"], result["points"], result["preamble"],
+                         request["address"], channel, tags=request.get("tags"), captured_at=start_time)
+        logger.info(f"💾 波形已儲存: {filepath} ({result['points']} 點，耗時 {record_time:.2f} 秒)")
+        message = f"已儲存 {result['points']} 點"
+    else:
+        capture_id = None
+        message = f"已取消 ({result['points']}/{result['record_length']} 點)，未儲存"
+    on_event({
+        "type": "done",
+        "success": result["complete"],
+        "message": message,
+        "capture_id": capture_id,
+        "record_time": round(record_time, 2),
+        **result
+    })
+
+@app.post("/scope/record")
+async def record_scope_waveform(request: dict):
+    """分段下載示波器長記錄波形到磁碟，以 NDJSON 串流回傳下載進度"""
+    if not rm and not initialize_visa():
+        raise HTTPException(status_code=500, detail="VISA資源管理器初始化失敗")
+
+    if not request.get("address"):
+        raise HTTPException(status_code=400, detail="缺少必要參數 (address)")
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    cancel = threading.Event()
+    on_event = lambda e: loop.call_soon_threadsafe(events.put_nowait, e)
+    worker = threading.Thread(target=record_waveform, args=(request, on_event, cancel),
+                              name="waveform-record", daemon=True)
+    worker.start()
+
+    async def event_stream():
+        try:
+            while True:
+                event = await events.get()
+                yield json.dumps(event, default=str) + "\n"
+                if event["type"] in ("done", "error"):
+                    break
+        finally:
+            # 串流中斷時停止下載 (已下載的部分保留在檔案中)
+            cancel.set()
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@app.post("/scope/fastframe")
+async def fastframe_capture(request: dict):
+    """FastFrame 分段擷取：連續記錄多個觸發事件後一次下載"""
+    if not rm and not initialize_visa():
+        return {"success": False, "message": "VISA資源管理器初始化失敗"}
+
+    if not request.get("address") or not request.get("frames"):
+        return {"success": False, "message": "缺少必要參數 (address, frames)"}
+
+    try:
+        return await asyncio.to_thread(run_fastframe_capture, request)
+    except Exception as e:
+        logger.error(f"❌ FastFrame擷取失敗: {e}")
+        return {"success": False, "message": f"FastFrame擷取失敗: {str(e)}"}
+
+def get_file_cache() -> FileCache:
+    """取得儀器檔案快取"""
+    global file_cache
+    if file_cache is None:
+        file_cache = FileCache(CLIENT_CONFIG["file_cache_dir"])
+    return file_cache
+
+def fetch_scope_file(request: dict) -> dict:
+    """截圖或讀回示波器上的檔案，存入快取"""
+    screenshot = request.get("screenshot", False)
+    filepath = SCOPE_SCREENSHOT_PATH if screenshot else request["path"]
+    with connected_instruments(rm, {"scope": ("scope", request.get("address"))}) as connected:
+        scope = connected["scope"]
+        if screenshot and not scope.save_screenshot(filepath):
+            return {"success": False, "message": "示波器截圖失敗"}
+        data = scope.read_file(filepath)
+        if screenshot or request.get("delete"):
+            scope.delete_file(filepath)
+
+    if not data:
+        return {"success": False, "message": f"無法讀取示波器檔案 {filepath}"}
+
+    file_id = get_file_cache().put(data, filepath)
+    logger.info(f"📁 已讀回示波器檔案 {filepath} ({len(data)} bytes)")
+    return {
+        "success": True,
+        "message": f"已讀回 {len(data)} bytes",
+        "file_id": file_id,
+        "size": len(data),
+        "media_type": FileCache.media_type(file_id)
+    }
+
+@app.post("/scope/screenshot")
+async def scope_screenshot(request: dict):
+    """示波器截圖並透過 VISA 連線讀回 (不需要共用磁碟)"""
+    if not rm and not initialize_visa():
+        return {"success": False, "message": "VISA資源管理器初始化失敗"}
+
+    if not request.get("address"):
+        return {"success": False, "message": "缺少必要參數 (address)"}
+
+    try:
+        return await asyncio.to_thread(fetch_scope_file, {**request, "screenshot": True})
+    except Exception as e:
+        logger.error(f"❌ 示波器截圖失敗: {e}")
+        return {"success": False, "message": f"示波器截圖失敗: {str(e)}"}
+
+@app.post("/scope/files")
+async def fetch_scope_file_endpoint(request: dict):
+    """讀回示波器檔案系統上的檔案 (例如 save_waveform 的結果)"""
+    if not rm and not initialize_visa():
+        return {"success": False, "message": "VISA資源管理器初始化失敗"}
+
+    if not request.get("address") or not request.get("path"):
+        return {"success": False, "message": "缺少必要參數 (address, path)"}
+
+    try:
+        return await asyncio.to_thread(fetch_scope_file, {**request, "screenshot": False})
+    except Exception as e:
+        logger.error(f"❌ 讀取示波器檔案失敗: {e}")
+        return {"success": False, "message": f"讀取示波器檔案失敗: {str(e)}"}
+
+@app.get("/scope/files/{file_id}")
+async def get_scope_file(file_id: str, request: Request):
+    """下載快取的檔案 (檔案編號即內容雜湊，作為 ETag)"""
+    path = get_file_cache().path(file_id)
+    if not path:
+        raise HTTPException(status_code=404, detail=f"找不到檔案 {file_id}")
+
+    headers = {"ETag": f'"{file_id}"', "Cache-Control": "private, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=FileCache.media_type(file_id), headers=headers)
+
+def run_detect_job(request: dict, job: Job, loop: asyncio.AbstractEventLoop) -> dict:
+    """
+    以工作執行儀器掃描，逐一回報正在掃描的資源
+
+    掃描經由 detect_flight 執行：/detect 的掃描進行中時等待並共用其結果 (不回報個別資源)，
+    本工作開始的掃描同樣讓之後到達的 /detect 共用。
+    """
+    started = threading.Event()
+
+    def start_scan():
+        started.set()
+        return run_detect(
+            on_progress=lambda index, total, resource: job.report(index / total, f"掃描 {resource} ({index + 1}/{total})"),
+            cancel=job.cancel_event.is_set)
+
+    def stop():
+        # 停止等待 (/detect 開始的掃描由 detect_flight 保護，不受影響)
+        scan.cancel()
+        if started.is_set():
+            # 本工作開始的掃描即將中止，之後的請求不再加入而是重新掃描
+            loop.call_soon_threadsafe(detect_flight.invalidate)
+
+    scan = asyncio.run_coroutine_threadsafe(detect_flight.run("detect", start_scan), loop)
+    job.on_cancel(stop)
+    try:
+        return scan.result()
+    except concurrent.futures.CancelledError:
+        raise JobCancelled()
+
+def run_sequence_job(recipe: dict, job: Job) -> dict:
+    """以工作執行測試序列，每完成一個步驟回報一次"""
+    engine = SequenceEngine(rm, recipe, on_event=lambda e: job.report(step=e) if e["type"] == "step" else None)
+    job.on_cancel(engine.cancel)
+    return engine.run()
+
+def run_record_job(request: dict, job: Job) -> dict:
+    """以工作分段下載長記錄波形"""
+    outcome = {}
+
+    def on_event(event: Dict):
+        if event["type"] == "progress":
+            job.report(event["progress"], points=event["points"], record_length=event["record_length"])
+        else:
+            outcome.update(event)
+
+    record_waveform(request, on_event, job.cancel_event)
+    if outcome.pop("type", None) == "error":
+        outcome["success"] = False
+    return outcome
+
+# 可提交的工作類型 -> (執行函數, 必要參數, 是否需要 VISA)
+JOB_RUNNERS = {
+    "detect": (run_detect_job, (), True),  # 需要事件迴圈，由 submit_job 另外提交
+    "sequence": (run_sequence_job, ("steps",), True),
+    "sweep_efficiency": (run_efficiency_sweep, ("vin", "iout", "vout_channel"), True),
+    "transient": (run_load_transient, ("load_address", "scope_address", "level1", "level2", "t1", "t2"), True),
+    "scope_record": (run_record_job, ("address",), True),
+    "scope_analyze": (lambda request, job: run_waveform_analysis(request), (), False),
+    "fastframe": (lambda request, job: run_fastframe_capture(request), ("address", "frames"), True),
+    "scope_screenshot": (lambda request, job: fetch_scope_file({**request, "screenshot": True}), ("address",), True),
+}
+
+# 背景工作 (進度與結果以 'job' 事件推送到服務器)
+job_manager = JobManager(push_event_to_server)
+
+@app.post("/jobs")
+async def submit_job(request: dict):
+    """提交長時間操作為背景工作，立即返回工作編號 (進度與結果以 'job' 事件推送)"""
+    kind = request.get("kind")
+    params = request.get("params") or {}
+    if kind not in JOB_RUNNERS:
+        raise HTTPException(status_code=400, detail=f"不支援的工作類型: {kind}")
+
+    runner, required, needs_visa = JOB_RUNNERS[kind]
+    missing = [name for name in required if not params.get(name)]
+    if kind == "scope_analyze" and not params.get("address") and not params.get("capture_id"):
+        missing = ["address 或 capture_id"]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"缺少必要參數 ({', '.join(missing)})")
+
+    # 分析已儲存的記錄不需要連接儀器
+    if (needs_visa or not params.get("capture_id")) and not rm and not initialize_visa():
+        raise HTTPException(status_code=500, detail="VISA資源管理器初始化失敗")
+
+    if kind == "detect":
+        # 掃描工作進行中時返回同一個工作 (進度與結果共用)，不重複掃描
+        running = job_manager.active("detect")
+        if running:
+            return {"success": True, "job_id": running.id, "job": running.to_dict(include_result=False)}
+        loop = asyncio.get_running_loop()
+        job = job_manager.submit(kind, params, lambda job: run_detect_job(params, job, loop))
+    else:
+        job = job_manager.submit(kind, params, lambda job: runner(params, job))
+    return {"success": True, "job_id": job.id, "job": job.to_dict(include_result=False)}
+
+@app.get("/jobs")
+async def list_jobs():
+    """列出進行中與最近完成的工作"""
+    return {"jobs": [job.to_dict(include_result=False) for job in job_manager.list()]}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查詢工作狀態與結果"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"找不到工作 {job_id}")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """取消工作 (在目前的量測點/步驟完成後停止)"""
+    job = job_manager.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"找不到工作 {job_id}")
+    return job.to_dict(include_result=False)
+
+@app.get("/waveforms")
+async def list_waveforms(instrument: Optional[str] = None, channel: Optional[int] = None,
+                         tag: Optional[str] = None, since: Optional[float] = None,
+                         until: Optional[float] = None, limit: int = 100):
+    """查詢波形資料庫"""
+    captures = await asyncio.to_thread(get_waveform_archive().query, instrument, channel, tag, since, until, limit)
+    return {"success": True, "captures": captures}
+
+@app.get("/waveforms/{capture_id}")
+async def get_waveform(capture_id: str, max_points: int = 10000):
+    """載入已儲存的波形 (超過 max_points 時等間隔抽取，用於繪圖)"""
+    try:
+        raw_data, entry = get_waveform_archive().load(capture_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"找不到波形記錄 {capture_id}")
+
+    preamble = entry["preamble"]
+    step = max(1, -(-raw_data.size // max_points)) if max_points > 0 else 1
+    # 切片仍是記憶體映射的檢視，只有被抽取的取樣會從磁碟讀取
+    samples = raw_data[::step]
+    times = preamble["x_zero"] + np.arange(samples.size) * (step * preamble["x_incr"])
+    return {
+        "success": True,
+        **entry,
+        "step": step,
+        "times": times.tolist(),
+        "voltages": to_volts(samples, preamble).tolist() if samples.size else []
+    }
+
+def waveform_binary_response(raw_data: np.ndarray, preamble: Dict[str, float], max_points: int) -> Response:
+    """
+    以 float32 (little-endian) 二進位傳送波形電壓，瀏覽器可直接作為 Float32Array 繪圖
+
+    時間軸是等間隔的，以 X-Waveform-X-Zero (第一點時間) 與 X-Waveform-X-Incr (點間隔) 標頭描述，
+    X-Waveform-Points 為抽取前的原始點數。
+    """
+    samples, step = min_max_decimate(raw_data, max_points)
+    volts = to_volts(samples, preamble).astype("<f4", copy=False)
+    return Response(volts.tobytes(), media_type="application/octet-stream", headers={
+        "X-Waveform-X-Zero": repr(float(preamble["x_zero"])),
+        "X-Waveform-X-Incr": repr(float(preamble["x_incr"]) * step),
+        "X-Waveform-Points": str(raw_data.size),
+    })
+
+@app.get("/waveforms/{capture_id}/binary")
+async def get_waveform_binary(capture_id: str, max_points: int = WAVEFORM_PLOT_POINTS):
+    """以二進位載入已儲存的波形 (繪圖用)"""
+    try:
+        raw_data, entry = get_waveform_archive().load(capture_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"找不到波形記錄 {capture_id}")
+    if raw_data.size == 0:
+        raise HTTPException(status_code=404, detail=f"波形記錄 {capture_id} 沒有資料")
+    return await asyncio.to_thread(waveform_binary_response, raw_data, entry["preamble"], max_points)
+
+@app.get("/scope/waveform")
+async def get_scope_waveform(address: str, channel: int = 1, max_points: int = WAVEFORM_PLOT_POINTS):
+    """下載示波器目前的波形，以二進位回傳 (繪圖用)"""
+    if not rm and not initialize_visa():
+        raise HTTPException(status_code=500, detail="VISA資源管理器初始化失敗")
+
+    def read_waveform():
+        with connected_instruments(rm, {"scope": ("scope", address)}) as connected:
+            raw_data, preamble = connected["scope"].get_waveform_raw(channel)
+        if raw_data.size == 0:
+            raise HTTPException(status_code=500, detail=f"無法讀取通道 CH{channel} 的波形")
+        return waveform_binary_response(raw_data, preamble, max_points)
+
+    try:
+        return await asyncio.to_thread(read_waveform)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ 讀取波形失敗: {e}")
+        raise HTTPException(status_code=500, detail=f"讀取波形失敗: {str(e)}")
+
+@app.delete("/waveforms/{capture_id}")
+async def delete_waveform(capture_id: str):
+    """刪除已儲存的波形"""
+    if not get_waveform_archive().delete(capture_id):
+        raise HTTPException(status_code=404, detail=f"找不到波形記錄 {capture_id}")
+    return {"success": True, "message": f"已刪除波形記錄 {capture_id}"}
+
+@app.get("/metrics/scpi")
+async def get_scpi_metrics(address: Optional[str] = None, top: int = 20):
+    """
+    SCPI 指令統計: 每台儀器、每個指令標頭的呼叫次數、錯誤、位元組數與延遲直方圖 (秒)，
+    'slowest' 為跨儀器累計時間最長的指令
+    """
+    return {
+        "success": True,
+        **scpi_metrics.snapshot(address),
+        "slowest": slowest_commands(top) if address is None else []
+    }
+
+@app.delete("/metrics/scpi")
+async def reset_scpi_metrics():
+    """清除 SCPI 指令統計"""
+    scpi_metrics.reset()
+    return {"success": True, "message": "已清除 SCPI 指令統計"}
+
+def get_measurement_logger() -> MeasurementLogger:
+    """取得量測記錄器"""
+    global measurement_logger
+    if measurement_logger is None:
+        measurement_logger = MeasurementLogger(CLIENT_CONFIG["measurement_dir"],
+                                               fsync_interval=CLIENT_CONFIG["measurement_fsync_interval"])
+        measurement_logger.start()
+    return measurement_logger
+
+@app.get("/measurements")
+async def get_measurements():
+    """查詢量測記錄的狀態與已記錄的 session (以 measurement_logger.to_dataframe 載入)"""
+    return {
+        "success": True,
+        "current": measurement_logger.stats() if measurement_logger else None,
+        "sessions": await asyncio.to_thread(list_sessions, CLIENT_CONFIG["measurement_dir"])
+    }
+
+def read_instrument_status(instrument_type: str, address: str) -> Dict:
+    """讀取電源/負載的即時狀態並記錄數值 (儀器正被其他操作使用時返回最近一次的狀態，'busy' 為 True)"""
+    timestamp, status, busy = status_reader.read(rm, instrument_type, address)
+    if busy:
+        return to_json_safe({"success": True, "instrument_type": instrument_type, "address": address,
+                             "timestamp": timestamp, "busy": True, **(status or {})})
+    # 輸出狀態記為 1/0 (讀取失敗時為 UNKNOWN，不記錄)
+    values = {name: value for name, value in status.items() if name != "output"}
+    if status.get("output") in ("ON", "OFF"):
+        values["output"] = status["output"] == "ON"
+    get_measurement_logger().log(f"{instrument_type}:{address}", values, timestamp)
+    return to_json_safe({"success": True, "instrument_type": instrument_type, "address": address,
+                         "timestamp": timestamp, "busy": False, **status})
+
+def get_resources_flight() -> SingleFlight:
+    global resources_flight
+    if resources_flight is None:
+        resources_flight = SingleFlight(ttl=CLIENT_CONFIG["status_cache_ttl"])
+    return resources_flight
+
 @app.get("/status")
-async def get_status():
-    """獲取客戶端狀態"""
+async def get_status(instrument_type: Optional[str] = None, address: Optional[str] = None):
+    """獲取客戶端狀態 (指定電源/負載的 instrument_type 與 address 時改為讀取該儀器的即時狀態)"""
+    if instrument_type in STATUS_INSTRUMENT_TYPES and address:
+        if not rm and not initialize_visa():
+            raise HTTPException(status_code=500, detail="VISA資源管理器初始化失敗")
+        try:
+            return await asyncio.to_thread(read_instrument_status, instrument_type, address)
+        except Exception as e:
+            logger.error(f"❌ 讀取 {instrument_type} 狀態失敗: {e}")
+            raise HTTPException(status_code=500, detail=f"讀取儀器狀態失敗: {str(e)}")
+
     local_ip = get_local_ip()
     
     # 檢查VISA狀態
@@ -442,7 +1338,8 @@ async def get_status():
     
     if rm:
         try:
-            available_resources = rm.list_resources()
+            available_resources = await get_resources_flight().run(
+                "resources", lambda: asyncio.to_thread(rm.list_resources))
         except:
             visa_status = "錯誤"
     
@@ -452,6 +1349,7 @@ async def get_status():
         "visa_status": visa_status,
         "available_resources": len(available_resources),
         "resources": available_resources,
+        "alarm_monitors": {address: monitor.status() for address, monitor in alarm_monitors.items()},
         "server_config": CLIENT_CONFIG
     }
 
@@ -480,7 +1378,18 @@ async def root():
         "endpoints": {
             "/detect": "偵測儀器",
             "/control": "控制儀器",
+            "/sequence": "執行測試序列",
+            "/sweep/efficiency": "效率掃描",
+            "/transient": "負載暫態量測",
+            "/scope/analyze": "波形分析",
+            "/scope/record": "長記錄波形下載",
+            "/scope/fastframe": "FastFrame分段擷取",
+            "/scope/screenshot": "示波器截圖",
+            "/scope/files": "讀回示波器檔案",
+            "/waveforms": "波形資料庫",
+            "/metrics/scpi": "SCPI指令延遲統計",
             "/status": "獲取狀態",
+            "/measurements": "量測記錄",
             "/debug/resources": "調試資源列表"
         }
     }
@@ -500,9 +1409,57 @@ if __name__ == "__main__":
         help=f"服務器地址 (預設: {CLIENT_CONFIG['server_host']})"
     )
     
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="使用模擬儀器 (34970A、62012P、63206A、AFG3101C、MSO54B)，不需要 GPIB 硬體"
+    )
+
+    parser.add_argument(
+        "--sim-latency-scale",
+        type=float,
+        default=CLIENT_CONFIG["sim_latency_scale"],
+        help="模擬儀器的延遲倍率，0 表示不延遲 (預設: 1.0)"
+    )
+
+    parser.add_argument(
+        "--scpi-sample-rate",
+        type=float,
+        default=CLIENT_CONFIG["scpi_sample_rate"],
+        help="SCPI 指令延遲的取樣比例，0~1 (預設: 1.0，全部記錄)"
+    )
+
+    parser.add_argument(
+        "--status-cache-ttl",
+        type=float,
+        default=CLIENT_CONFIG["status_cache_ttl"],
+        help="/status 中 VISA 資源列表的快取時間 (秒)，0 表示不快取 (預設: 1.0)"
+    )
+
+    parser.add_argument(
+        "--measurement-dir",
+        type=str,
+        default=CLIENT_CONFIG["measurement_dir"],
+        help=f"量測記錄目錄 (預設: {CLIENT_CONFIG['measurement_dir']})"
+    )
+
+    parser.add_argument(
+        "--measurement-fsync-interval",
+        type=float,
+        default=CLIENT_CONFIG["measurement_fsync_interval"],
+        help="量測記錄的 fsync 間隔 (秒)，當機時最多遺失這段時間的讀值 (預設: 10.0)"
+    )
+
     # 更新配置
     args = parser.parse_args()
     CLIENT_CONFIG["server_host"] = args.host
+    CLIENT_CONFIG["simulate"] = args.simulate
+    CLIENT_CONFIG["sim_latency_scale"] = args.sim_latency_scale
+    CLIENT_CONFIG["scpi_sample_rate"] = args.scpi_sample_rate
+    CLIENT_CONFIG["status_cache_ttl"] = args.status_cache_ttl
+    CLIENT_CONFIG["measurement_dir"] = args.measurement_dir
+    CLIENT_CONFIG["measurement_fsync_interval"] = args.measurement_fsync_interval
+    scpi_metrics.sample_rate = args.scpi_sample_rate
 
     print("=" * 60)
     print("🔧 GPIB儀器控制客戶端 v2.0.0")
@@ -510,11 +1467,13 @@ if __name__ == "__main__":
     print(f"📍 本機IP: {get_local_ip()}")
     print(f"🌐 客戶端API: http://localhost:{CLIENT_CONFIG['client_port']}")
     print(f"🔗 連接服務器: {CLIENT_CONFIG['server_host']}:{CLIENT_CONFIG['server_port']}")
+    if CLIENT_CONFIG["simulate"]:
+        print(f"🧪 模擬模式: 延遲倍率 {CLIENT_CONFIG['sim_latency_scale']}")
     print("=" * 60)
     print("📝 請確認:")
     print("   1. VISA驅動程式已安裝")
     print("   2. GPIB儀器已正確連接")
-    print("   3. 防火牆允許8001端口")
+    print("   3. 服務器通道無法建立時，防火牆需允許8001端口")
     print("   4. 服務器正在運行")
     print("=" * 60)
     
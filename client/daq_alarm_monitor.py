@@ -0,0 +1,168 @@
+import threading
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+from instruments.daq_interface import DAQInterface, DAQ_UNIT_FUNCTIONS
+from instrument_manager import instrument_lock
+
+logger = logging.getLogger(__name__)
+
+# 單次等待警報事件的逾時 (毫秒)，同時決定停止監控的反應時間
+ALARM_WAIT_TIMEOUT_MS = 500
+
+# 監控狀態
+MONITOR_ARMED = "armed"        # 掃描執行中，超限時發出警報
+MONITOR_PAUSED = "paused"      # DAQ 正被其他操作使用，結束後重新設定掃描
+MONITOR_FAILED = "failed"      # 重新設定掃描失敗，監控已停止
+MONITOR_STOPPED = "stopped"
+
+
+class DAQAlarmMonitor:
+    """DAQ 警報事件監控
+
+    設定通道限制與定時掃描後，由儀器在超限時發出 SRQ，
+    監控執行緒只在事件發生時讀取警報佇列，不需逐通道輪詢。
+
+    其他操作 (面板讀取、測試序列、效率掃描) 的 MEASure? 會中止掃描並改寫掃描列表，
+    監控以儀器的鎖得知 DAQ 被使用過，之後重新設定掃描。
+    """
+
+    def __init__(self, daq: DAQInterface, channels: List[Dict],
+                 on_alarm: Callable[[Dict], None], scan_interval: float = 1.0,
+                 on_state: Optional[Callable[[Dict], None]] = None):
+        """
+        Args:
+            daq: 數據擷取器實例 (尚未連接)
+            channels: e.g., [{'channel': '101', 'unit': 'TEMP', 'high': 80.0, 'low': None}]
+            on_alarm: 收到警報時的回呼函數
+            scan_interval: 掃描間隔 (秒)
+            on_state: 監控狀態改變時的回呼函數 (參數同 status())
+        """
+        self.daq = daq
+        self.channels = channels
+        self.on_alarm = on_alarm
+        self.scan_interval = scan_interval
+        self.on_state = on_state
+        self.state = MONITOR_STOPPED
+        # 因其他操作中止掃描而重新設定的次數
+        self.rearms = 0
+        self._lock = instrument_lock(daq.address)
+        # 監控最後一次持有儀器的鎖時的使用次數
+        self._uses = 0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self) -> Dict:
+        return {"address": self.daq.address, "state": self.state, "rearms": self.rearms}
+
+    def start(self) -> bool:
+        """連接儀器、設定警報並啟動監控執行緒"""
+        if self.is_running:
+            return True
+
+        with self._lock:
+            if not self.daq.connect():
+                return False
+
+            if not self._configure():
+                self.daq.disconnect()
+                return False
+            self._uses = self._lock.uses
+
+        self._set_state(MONITOR_ARMED)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"alarm-{self.daq.address}", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """停止監控並釋放儀器"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=ALARM_WAIT_TIMEOUT_MS / 1000 * 4)
+            self._thread = None
+
+    def _configure(self) -> bool:
+        channel_list = []
+        for ch_info in self.channels:
+            channel = str(ch_info.get("channel", ""))
+            if not channel:
+                continue
+            function = DAQ_UNIT_FUNCTIONS.get(ch_info.get("unit"), "VOLT:DC")
+            if not self.daq.configure_channel(channel, function):
+                return False
+            if not self.daq.set_alarm(channel, ch_info.get("high"), ch_info.get("low")):
+                return False
+            channel_list.append(channel)
+
+        if not channel_list:
+            return False
+
+        return (self.daq.scan_channels(channel_list)
+                and self.daq.set_scan_interval(self.scan_interval)
+                and self.daq.enable_alarm_events()
+                and self.daq.start_scan())
+
+    def _set_state(self, state: str):
+        if state == self.state:
+            return
+        self.state = state
+        if self.on_state:
+            try:
+                self.on_state(self.status())
+            except Exception as e:
+                logger.error(f"❌ 監控狀態通知失敗: {e}")
+
+    def _rearm(self) -> bool:
+        """其他操作使用過 DAQ 後重新設定掃描 (需持有儀器的鎖)"""
+        logger.info(f"🔁 DAQ 已被其他操作使用，重新設定警報掃描: {self.daq.address}")
+        self.daq.disable_alarm_events()
+        if not self._configure():
+            return False
+        self.rearms += 1
+        return True
+
+    def _run(self):
+        logger.info(f"🚨 DAQ警報監控啟動: {self.daq.address}")
+        try:
+            while not self._stop_event.is_set():
+                # 暫停時掃描已被中止，不等待警報事件
+                fired = self.state == MONITOR_ARMED and self.daq.wait_for_alarm(ALARM_WAIT_TIMEOUT_MS)
+
+                if not self._lock.acquire(timeout=ALARM_WAIT_TIMEOUT_MS / 1000):
+                    self._set_state(MONITOR_PAUSED)
+                    continue
+                try:
+                    alarms = self.daq.read_alarm_queue() if fired else []
+                    # 使用次數只比上次多 1 (本次) 表示期間沒有其他操作
+                    if self._lock.uses != self._uses + 1 and not self._rearm():
+                        logger.error(f"❌ 重新設定警報掃描失敗，停止監控: {self.daq.address}")
+                        self._set_state(MONITOR_FAILED)
+                        break
+                    self._uses = self._lock.uses
+                finally:
+                    self._lock.release()
+                self._set_state(MONITOR_ARMED)
+
+                for alarm in alarms:
+                    alarm.update({
+                        "address": self.daq.address,
+                        "timestamp": time.time(),
+                    })
+                    logger.warning(f"🚨 DAQ警報: {alarm}")
+                    try:
+                        self.on_alarm(alarm)
+                    except Exception as e:
+                        logger.error(f"❌ 警報通知失敗: {e}")
+        finally:
+            with self._lock:
+                self.daq.stop_scan()
+                self.daq.disable_alarm_events()
+                self.daq.disconnect()
+            if self.state != MONITOR_FAILED:
+                self._set_state(MONITOR_STOPPED)
+            logger.info(f"🛑 DAQ警報監控停止: {self.daq.address}")
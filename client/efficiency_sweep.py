@@ -0,0 +1,181 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Sequence, Tuple
+import numpy as np
+from instruments.power_supply_interface import DCSourceInterface
+from instruments.eload_interface import LoadInterface
+from instruments.daq_interface import DAQInterface
+from settling import wait_until_stable
+
+logger = logging.getLogger(__name__)
+
+# 每個量測點讀取的量: VIN, IIN (電源), VOUT (DAQ), IOUT (負載)
+READING_NAMES = ("vin", "iin", "vout", "iout")
+
+# 同時讀取的儀器數 (電源、DAQ、負載)
+READ_WORKERS = 3
+
+
+def compute_efficiency(vin: np.ndarray, iin: np.ndarray,
+                       vout: np.ndarray, iout: np.ndarray) -> Dict[str, np.ndarray]:
+    """以向量運算計算輸入/輸出功率、效率與損耗
+
+    Returns:
+        Dict: {'pin', 'pout', 'efficiency', 'loss'}，形狀與輸入相同；輸入功率 <= 0 的點效率為 NaN
+    """
+    pin = vin * iin
+    pout = vout * iout
+    with np.errstate(divide="ignore", invalid="ignore"):
+        efficiency = np.where(pin > 0, pout / pin, np.nan)
+    return {
+        "pin": pin,
+        "pout": pout,
+        "efficiency": efficiency,
+        "loss": pin - pout,
+    }
+
+
+class EfficiencySweep:
+    """電源轉換器效率掃描 (Vin × Iout 網格)
+
+    每個量測點同時讀取電源、DAQ 與電子負載 (同一台儀器的查詢依序執行)，並以讀值穩定判定取代固定延遲，
+    掃描時間取決於實際的穩定時間而非最壞情況的等待時間。
+    """
+
+    def __init__(self, psu: DCSourceInterface, load: LoadInterface, daq: DAQInterface,
+                 vout_channel: str, psu_channel: int = 1,
+                 tolerance: float = 0.002, floor: float = 1e-3, samples: int = 3,
+                 interval: float = 0.02, timeout: float = 5.0,
+                 on_point: Optional[Callable[[Dict], None]] = None):
+        """
+        Args:
+            psu, load, daq: 已連接的儀器實例
+            vout_channel: 量測 VOUT 的 DAQ 通道
+            psu_channel: 電源通道
+            tolerance: 相對容許差異 (例如 0.002 = 0.2%)
+            floor: 容許差異下限 (讀值接近 0 時使用)
+            samples: 連續穩定讀值數量
+            interval: 讀取間隔 (秒)
+            timeout: 每個量測點最長等待時間 (秒)
+            on_point: 每完成一個量測點的回呼函數
+        """
+        self.psu = psu
+        self.load = load
+        self.daq = daq
+        self.vout_channel = str(vout_channel)
+        self.psu_channel = psu_channel
+        self.tolerance = tolerance
+        self.floor = floor
+        self.samples = samples
+        self.interval = interval
+        self.timeout = timeout
+        self.on_point = on_point
+        self._cancel_event = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def cancel(self):
+        """要求在目前量測點完成後停止掃描"""
+        self._cancel_event.set()
+
+    def _read_psu(self) -> Tuple[float, float]:
+        # 電壓與電流使用同一個 VISA 連線，query 的寫入與讀取不可交錯，必須依序讀取
+        return (self.psu.measure_voltage(self.psu_channel),
+                self.psu.measure_current(self.psu_channel))
+
+    def read_point(self) -> np.ndarray:
+        """同時讀取所有儀器 (每台儀器一個執行緒)
+
+        Returns:
+            np.ndarray: [vin, iin, vout, iout]
+        """
+        psu = self._executor.submit(self._read_psu)
+        vout = self._executor.submit(self.daq.read_channel, self.vout_channel)
+        iout = self._executor.submit(self.load.measure_current)
+        vin, iin = psu.result()
+        return np.array([vin, iin, vout.result(), iout.result()], dtype=float)
+
+    def run(self, vin_values: Sequence[float], iout_values: Sequence[float],
+            auto_output: bool = True) -> Dict[str, np.ndarray]:
+        """
+        執行掃描：外層為 Vin，內層為 Iout
+
+        Args:
+            vin_values: 輸入電壓設定點 (V)
+            iout_values: 負載電流設定點 (A)
+            auto_output: 是否自動開啟電源/負載，結束時先關負載再關電源
+
+        Returns:
+            Dict[str, np.ndarray]: 'vin_set', 'iout_set' (1-D) 以及形狀為 (len(vin), len(iout)) 的
+            'vin', 'iin', 'vout', 'iout', 'settled', 'settle_time', 'pin', 'pout', 'efficiency', 'loss'
+        """
+        vin_set = np.asarray(vin_values, dtype=float)
+        iout_set = np.asarray(iout_values, dtype=float)
+        shape = (vin_set.size, iout_set.size)
+        readings = np.full(shape + (len(READING_NAMES),), np.nan)
+        settled = np.zeros(shape, dtype=bool)
+        settle_time = np.full(shape, np.nan)
+        self._executor = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="sweep-read")
+
+        try:
+            if auto_output:
+                self.load.set_current(float(iout_set[0]) if iout_set.size else 0.0)
+                self.psu.turn_on(self.psu_channel)
+                self.load.turn_on()
+
+            for i, vin in enumerate(vin_set):
+                if self._cancel_event.is_set():
+                    break
+                if not self.psu.set_voltage(self.psu_channel, float(vin)):
+                    raise ValueError(f"電壓設定失敗: {vin}V")
+
+                for j, iout in enumerate(iout_set):
+                    if self._cancel_event.is_set():
+                        break
+                    self.load.set_current(float(iout))
+
+                    settle = wait_until_stable(
+                        self.read_point,
+                        tolerance=self.tolerance,
+                        relative=True,
+                        floor=self.floor,
+                        samples=self.samples,
+                        interval=self.interval,
+                        timeout=self.timeout,
+                        cancel=self._cancel_event.is_set,
+                    )
+                    readings[i, j] = settle["value"]
+                    settled[i, j] = settle["settled"]
+                    settle_time[i, j] = settle["elapsed"]
+
+                    if not settle["settled"]:
+                        logger.warning(f"⚠️ 量測點 Vin={vin}V, Iout={iout}A 未在 {self.timeout} 秒內穩定")
+
+                    if self.on_point:
+                        self.on_point({
+                            "vin_set": float(vin),
+                            "iout_set": float(iout),
+                            **dict(zip(READING_NAMES, readings[i, j].tolist())),
+                            "settled": bool(settle["settled"]),
+                            "settle_time": settle["elapsed"],
+                            "progress": (i * iout_set.size + j + 1) / (vin_set.size * iout_set.size),
+                        })
+        finally:
+            if auto_output:
+                self.load.turn_off()
+                self.psu.turn_off(self.psu_channel)
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+        vin, iin, vout, iout = np.moveaxis(readings, -1, 0)
+        return {
+            "vin_set": vin_set,
+            "iout_set": iout_set,
+            "vin": vin,
+            "iin": iin,
+            "vout": vout,
+            "iout": iout,
+            "settled": settled,
+            "settle_time": settle_time,
+            **compute_efficiency(vin, iin, vout, iout),
+        }
@@ -0,0 +1,67 @@
+import hashlib
+import mimetypes
+import os
+import re
+from typing import Optional
+
+# 快取檔名: 內容雜湊 + 原始副檔名，e.g., 3f2a...9c.png
+FILE_ID_PATTERN = re.compile(r"^[0-9a-f]{64}(\.[A-Za-z0-9]+)?$")
+
+
+class FileCache:
+    """從儀器讀回的檔案 (截圖、波形檔等) 的本地快取
+
+    檔名由內容的 SHA-256 決定，同一個檔名的內容永遠相同，
+    可直接作為 HTTP ETag，瀏覽器重複檢視時不需要再次下載。
+    """
+
+    def __init__(self, root: str, max_files: int = 200):
+        """
+        Args:
+            root: 快取目錄
+            max_files: 保留的檔案數量上限，超過時刪除最舊的檔案
+        """
+        self.root = root
+        self.max_files = max_files
+        os.makedirs(root, exist_ok=True)
+
+    def put(self, data: bytes, filename: str = "") -> str:
+        """
+        儲存檔案內容
+
+        Args:
+            data: 檔案內容
+            filename: 原始檔名 (只用來保留副檔名)
+
+        Returns:
+            str: 快取檔案編號
+        """
+        suffix = os.path.splitext(filename)[1].lower()
+        file_id = hashlib.sha256(data).hexdigest() + suffix
+        path = os.path.join(self.root, file_id)
+        if not os.path.exists(path):
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            self._evict()
+        return file_id
+
+    def path(self, file_id: str) -> Optional[str]:
+        """返回快取檔案路徑，編號無效或檔案不存在時返回 None"""
+        if not FILE_ID_PATTERN.match(file_id):
+            return None
+        path = os.path.join(self.root, file_id)
+        return path if os.path.exists(path) else None
+
+    @staticmethod
+    def media_type(file_id: str) -> str:
+        return mimetypes.guess_type(file_id)[0] or "application/octet-stream"
+
+    def _evict(self):
+        entries = [entry for entry in os.scandir(self.root)
+                   if entry.is_file() and FILE_ID_PATTERN.match(entry.name)]
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            os.remove(entry.path)
@@ -0,0 +1,180 @@
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+import pyvisa
+from instruments.power_supply_factory import DCSourceFactory
+from instruments.eload_factory import LoadFactory
+from instruments.daq_factory import DAQFactory
+from instruments.afg_factory import AFGFactory
+from instruments.oscilloscope_factory import OscilloscopeFactory
+
+# 儀器類型 (與前端 instrument_type 一致) -> 工廠方法
+INSTRUMENT_FACTORIES: Dict[str, Callable] = {
+    "power-supply": DCSourceFactory.create_dc_source,
+    "eload": LoadFactory.create_load,
+    "daq": DAQFactory.create_daq,
+    "afg": AFGFactory.create_afg,
+    "scope": OscilloscopeFactory.create_oscilloscope,
+}
+
+
+class InstrumentLock:
+    """儀器地址的鎖 (同一個執行緒可重複取得)
+
+    uses 為鎖被取得的次數 (同一個執行緒重複取得不計)，長時間在背景運行的操作 (DAQ 警報監控)
+    以此得知兩次使用之間是否有其他操作動過儀器的設定。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._depth = 0
+        self.uses = 0
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if not self._lock.acquire(blocking, timeout):
+            return False
+        if self._depth == 0:
+            self.uses += 1
+        self._depth += 1
+        return True
+
+    def release(self):
+        self._depth -= 1
+        self._lock.release()
+
+    def __enter__(self) -> "InstrumentLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+# 各儀器地址的鎖 - 同一台儀器上的操作 (掃描、量測、控制指令、狀態輪詢、警報監控) 不會在匯流排上交錯
+_instrument_locks: Dict[str, InstrumentLock] = {}
+_instrument_locks_guard = threading.Lock()
+
+
+def instrument_lock(address: str) -> InstrumentLock:
+    """取得儀器地址的鎖 (同一個執行緒可重複取得)"""
+    with _instrument_locks_guard:
+        return _instrument_locks.setdefault(address, InstrumentLock())
+
+
+@contextmanager
+def locked_instruments(addresses: Iterable[str]) -> Iterator[None]:
+    """依固定順序取得多台儀器的鎖，避免兩個操作各持有一部分而互相等待"""
+    with ExitStack() as stack:
+        for address in sorted({address for address in addresses if address}):
+            stack.enter_context(instrument_lock(address))
+        yield
+
+
+def create_instrument(resource_manager: pyvisa.ResourceManager, instrument_type: str, address: str):
+    """
+    根據儀器類型使用對應的工廠創建儀器實例
+
+    Args:
+        resource_manager: VISA資源管理器
+        instrument_type: 儀器類型 ('power-supply', 'eload', 'daq', 'afg', 'scope')
+        address: 儀器地址
+
+    Returns:
+        儀器實例，如果類型或型號不支援則返回None
+    """
+    factory: Optional[Callable] = INSTRUMENT_FACTORIES.get(instrument_type)
+    if not factory:
+        return None
+    return factory(resource_manager, address)
+
+
+@contextmanager
+def connected_instruments(resource_manager: pyvisa.ResourceManager,
+                          specs: Dict[str, Tuple[str, str]]) -> Iterator[Dict]:
+    """
+    建立並連接多台儀器，離開時全部斷開
+
+    Args:
+        resource_manager: VISA資源管理器
+        specs: 名稱 -> (儀器類型, 儀器地址)，e.g., {'load': ('eload', 'GPIB0::7::INSTR')}
+
+    Raises:
+        ValueError: 儀器不支援或無法連接
+    """
+    connected = {}
+    with locked_instruments(address for _, address in specs.values()):
+        try:
+            for name, (instrument_type, address) in specs.items():
+                instrument = create_instrument(resource_manager, instrument_type, address)
+                if not instrument:
+                    raise ValueError(f"找不到或不支持的儀器 {name} at {address}")
+                if not instrument.connect():
+                    raise ValueError(f"無法連接到儀器 {name} at {address}")
+                connected[name] = instrument
+            yield connected
+        finally:
+            for instrument in connected.values():
+                instrument.disconnect()
+
+
+class InstrumentStatusReader:
+    """狀態輪詢用的儀器連線
+
+    每台儀器只在第一次輪詢時以工廠建立實例 (*IDN? 識別型號)，之後的輪詢重複使用同一個連線；
+    讀取失敗時關閉連線，下次輪詢重新開啟。儀器正被其他操作 (效率掃描、暫態量測、控制指令)
+    使用時不等待也不送出指令，改為返回最近一次讀到的狀態。
+    """
+
+    def __init__(self):
+        self._instruments: Dict[Tuple[str, str], object] = {}
+        # (儀器類型, 地址) -> (讀取時間, 狀態)
+        self._last_status: Dict[Tuple[str, str], Tuple[float, Dict]] = {}
+
+    def read(self, resource_manager: pyvisa.ResourceManager, instrument_type: str,
+             address: str) -> Tuple[Optional[float], Optional[Dict], bool]:
+        """
+        讀取儀器狀態
+
+        Returns:
+            Tuple[Optional[float], Optional[Dict], bool]: (讀取時間, 狀態, 儀器是否正被其他操作使用)；
+                使用中時返回最近一次的狀態，尚未讀過時讀取時間與狀態為 None
+
+        Raises:
+            ValueError: 儀器不支援或無法連接
+        """
+        key = (instrument_type, address)
+        lock = instrument_lock(address)
+        if not lock.acquire(blocking=False):
+            timestamp, status = self._last_status.get(key, (None, None))
+            return timestamp, status, True
+
+        try:
+            instrument = self._instruments.get(key)
+            if instrument is None:
+                instrument = create_instrument(resource_manager, instrument_type, address)
+                if not instrument:
+                    raise ValueError(f"找不到或不支持的儀器 at {address}")
+                self._instruments[key] = instrument
+            if instrument.instrument is None and not instrument.connect():
+                raise ValueError(f"無法連接到儀器 at {address}")
+            try:
+                status = instrument.get_status()
+            except Exception:
+                instrument.disconnect()
+                raise
+            if status.get("output") == "UNKNOWN":
+                # get_status 在通訊錯誤時返回 UNKNOWN (例如儀器重新開機)，下次輪詢重新開啟連線
+                instrument.disconnect()
+            timestamp = time.time()
+            self._last_status[key] = (timestamp, status)
+            return timestamp, status, False
+        finally:
+            lock.release()
+
+    def close(self):
+        """關閉所有輪詢連線"""
+        for (_, address), instrument in list(self._instruments.items()):
+            with instrument_lock(address):
+                instrument.disconnect()
+        self._instruments.clear()
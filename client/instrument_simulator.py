@@ -0,0 +1,734 @@
+import math
+import re
+import threading
+import time
+import zlib
+import struct
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+import pyvisa
+from pyvisa import constants
+
+# 模擬儀器的預設位址 (與 README 中的實機位址一致)
+SIMULATED_ADDRESSES = {
+    "power-supply": "GPIB0::6::INSTR",
+    "eload": "GPIB0::7::INSTR",
+    "daq": "GPIB0::10::INSTR",
+    "afg": "GPIB0::11::INSTR",
+    "scope": "TCPIP0::192.168.0.50::inst0::INSTR",
+}
+
+# handle() 返回此值表示指令未被特定儀器處理，改用通用的設定儲存
+NOT_HANDLED = object()
+
+Response = Union[None, str, bytes, np.ndarray]
+
+
+class LatencyModel:
+    """指令延遲模型: 固定延遲 + 傳輸時間 + 隨機抖動"""
+
+    def __init__(self, command: float = 0.002, per_byte: float = 1e-6, jitter: float = 0.1,
+                 scale: float = 1.0):
+        """
+        Args:
+            command: 每個指令的固定延遲 (秒)
+            per_byte: 每個傳輸位元組的延遲 (秒)，預設約為 GPIB 1 MB/s
+            jitter: 隨機抖動 (延遲的比例)
+            scale: 整體倍率，0 表示不延遲 (只量測軟體本身的開銷)
+        """
+        self.command = command
+        self.per_byte = per_byte
+        self.jitter = jitter
+        self.scale = scale
+
+    def delay(self, nbytes: int = 0, extra: float = 0.0):
+        if self.scale <= 0:
+            return
+        seconds = (self.command + nbytes * self.per_byte + extra) * self.scale
+        if self.jitter:
+            seconds *= 1.0 + self.jitter * np.random.uniform(-1.0, 1.0)
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class NoiseModel:
+    """量測雜訊模型: 高斯雜訊，標準差 = absolute + relative * |值|"""
+
+    def __init__(self, absolute: float = 1e-4, relative: float = 2e-4, seed: Optional[int] = None):
+        self.absolute = absolute
+        self.relative = relative
+        self.rng = np.random.default_rng(seed)
+
+    def apply(self, value: float) -> float:
+        sigma = self.absolute + self.relative * abs(value)
+        return float(value + self.rng.normal(0.0, sigma)) if sigma > 0 else float(value)
+
+
+def _number(text: str, default: float = 0.0) -> float:
+    try:
+        return float(text.split(',')[0].strip().strip('"'))
+    except (ValueError, IndexError):
+        return default
+
+
+def _channels(args: str) -> List[str]:
+    """解析通道清單 (@101,102:104)"""
+    match = re.search(r'\(@([^)]*)\)', args)
+    if not match:
+        return []
+    channels = []
+    for part in match.group(1).split(','):
+        part = part.strip()
+        if ':' in part:
+            first, last = part.split(':')
+            channels.extend(str(ch) for ch in range(int(first), int(last) + 1))
+        elif part:
+            channels.append(part)
+    return channels
+
+
+def _quoted(args: str) -> str:
+    match = re.search(r'"([^"]*)"', args)
+    return match.group(1) if match else args.strip()
+
+
+class SimulatedBench:
+    """模擬的測試台: 電源 -> 待測降壓轉換器 -> 電子負載，DAQ 與示波器量測其輸出
+
+    所有模擬儀器共用同一個測試台，設定電源或負載會反映在其他儀器的讀值上。
+    """
+
+    def __init__(self, vout_nominal: float = 5.0, settle_tau: float = 0.005,
+                 noise: Optional[NoiseModel] = None):
+        """
+        Args:
+            vout_nominal: 待測轉換器的輸出電壓 (V)
+            settle_tau: 設定改變後輸出的一階時間常數 (秒)
+            noise: 量測雜訊模型
+        """
+        self.vout_nominal = vout_nominal
+        self.settle_tau = settle_tau
+        self.noise = noise or NoiseModel()
+        self.lock = threading.RLock()
+        self.devices: Dict[str, "SimulatedDevice"] = {}
+
+        self.psu_voltage = 0.0
+        self.psu_current_limit = 10.0
+        self.psu_output = False
+        self.load_current = 0.0
+        self.load_on = False
+        self.load_dynamic = None  # (level1, level2) 或 None
+        self.afg_frequency = 1000.0
+        self.afg_output = False
+
+        self._vout_from = 0.0
+        self._vout_to = 0.0
+        self._changed_at = time.monotonic()
+
+    def add_device(self, address: str, device: "SimulatedDevice"):
+        self.devices[address] = device
+
+    def changed(self):
+        """設定改變時呼叫: 輸出從目前的值以一階響應趨近新的穩態值"""
+        with self.lock:
+            self._vout_from = self.vout()
+            self._vout_to = self._vout_target()
+            self._changed_at = time.monotonic()
+
+    def _vout_target(self) -> float:
+        if not self.psu_output or self.psu_voltage < self.vout_nominal + 0.5:
+            return 0.0
+        # 輸出阻抗造成的壓降
+        return self.vout_nominal - 0.01 * self.iout()
+
+    def vout(self) -> float:
+        with self.lock:
+            elapsed = time.monotonic() - self._changed_at
+            if self.settle_tau <= 0:
+                return self._vout_to
+            return self._vout_to + (self._vout_from - self._vout_to) * math.exp(-elapsed / self.settle_tau)
+
+    def iout(self) -> float:
+        if not self.load_on:
+            return 0.0
+        if self.load_dynamic:
+            return sum(self.load_dynamic) / 2
+        return self.load_current
+
+    def iin(self) -> float:
+        """輸入電流: 輸出功率 + 固定損耗 + 導通損耗"""
+        if not self.psu_output or self.psu_voltage <= 0:
+            return 0.0
+        iout = self.iout()
+        pout = self.vout() * iout
+        loss = 0.3 + 0.02 * iout * iout if self.vout() > 0 else 0.0
+        return min((pout + loss) / self.psu_voltage, self.psu_current_limit)
+
+    def measure(self, value: float) -> float:
+        return self.noise.apply(value)
+
+
+class SimulatedDevice:
+    """模擬儀器基類: 處理共用的 IEEE-488.2 指令，其他設定指令儲存後可由對應的查詢讀回"""
+
+    idn = ""
+    # 量測指令的額外延遲 (秒)
+    measurement_latency = 0.0
+    measurement_prefixes: Tuple[str, ...] = ("MEAS", "FETC")
+
+    def __init__(self, bench: SimulatedBench):
+        self.bench = bench
+        self.settings: Dict[str, str] = {}
+        self.lock = threading.RLock()
+        self.service_request_enable = 0
+
+    def is_measurement(self, header: str) -> bool:
+        return header.startswith(self.measurement_prefixes)
+
+    def execute(self, command: str) -> Response:
+        header, _, args = command.strip().partition(' ')
+        header = header.upper()
+        with self.lock:
+            if header == '*IDN?':
+                return self.idn
+            if header == '*OPC?':
+                return '1'
+            if header in ('*CLS', '*RST', '*WAI', '*TRG'):
+                return None
+            if header == '*SRE':
+                self.service_request_enable = int(_number(args))
+                return None
+            if header == '*SRE?':
+                return str(self.service_request_enable)
+            if header == '*STB?':
+                return str(self.status_byte())
+
+            response = self.handle(header, args)
+            if response is not NOT_HANDLED:
+                return response
+            if header.endswith('?'):
+                return self.settings.get(header[:-1])
+            self.settings[header] = args.strip()
+            return None
+
+    def execute_binary(self, command: str, values: np.ndarray):
+        """處理二進位區塊寫入 (write_binary_values)"""
+
+    def handle(self, header: str, args: str) -> Response:
+        return NOT_HANDLED
+
+    def status_byte(self) -> int:
+        return 0
+
+    def wait_for_service_request(self, timeout: float) -> bool:
+        time.sleep(timeout)
+        return False
+
+
+class SimulatedChroma62012P(SimulatedDevice):
+    idn = "CHROMA,62012P-100-50,SIM62012P,1.00"
+    measurement_latency = 0.01
+
+    def handle(self, header: str, args: str) -> Response:
+        bench = self.bench
+        if header == 'SOUR:VOLT':
+            bench.psu_voltage = _number(args)
+            bench.changed()
+        elif header == 'SOUR:CURR':
+            bench.psu_current_limit = _number(args)
+        elif header == 'SOUR:VOLT?':
+            return f"{bench.psu_voltage:.4f}"
+        elif header == 'SOUR:CURR?':
+            return f"{bench.psu_current_limit:.4f}"
+        elif header == 'CONFIGURE:OUTPUT':
+            bench.psu_output = args.strip().upper() in ('ON', '1')
+            bench.changed()
+        elif header == 'OUTP:STAT?':
+            return '1' if bench.psu_output else '0'
+        elif header == 'MEAS:VOLT?':
+            return f"{bench.measure(bench.psu_voltage if bench.psu_output else 0.0):.5f}"
+        elif header == 'MEAS:CURR?':
+            return f"{bench.measure(bench.iin()):.5f}"
+        elif header == 'STAT:QUES:COND?':
+            return '0'
+        else:
+            return NOT_HANDLED
+        return None
+
+
+class SimulatedChroma63206A(SimulatedDevice):
+    idn = "Chroma,63206A-600-210,SIM63206A,1.00"
+    measurement_latency = 0.01
+
+    def _dynamic_levels(self) -> Optional[Tuple[float, float]]:
+        if not self.settings.get('MODE', '').startswith('CCD'):
+            return None
+        return (_number(self.settings.get('CURR:DYN:L1', '0')),
+                _number(self.settings.get('CURR:DYN:L2', '0')))
+
+    def handle(self, header: str, args: str) -> Response:
+        bench = self.bench
+        if header == 'LOAD':
+            bench.load_on = args.strip().upper() in ('ON', '1')
+            bench.load_dynamic = self._dynamic_levels()
+            bench.changed()
+        elif header == 'LOAD?':
+            return '1' if bench.load_on else '0'
+        elif header == 'CURR:STAT:L1':
+            bench.load_current = _number(args)
+            self.settings[header] = args.strip()
+            bench.changed()
+        elif header == 'MODE':
+            self.settings[header] = args.strip().upper()
+            bench.load_dynamic = self._dynamic_levels()
+            bench.changed()
+        elif header in ('MEAS:VOLT?', 'MEAS:VOLT:MAX?', 'MEAS:VOLT:MIN?'):
+            return f"{bench.measure(bench.vout()):.5f}"
+        elif header in ('MEAS:CURR?', 'MEAS:CURR:MAX?', 'MEAS:CURR:MIN?'):
+            levels = self._dynamic_levels() if bench.load_on else None
+            if levels and header != 'MEAS:CURR?':
+                return f"{(max(levels) if header.endswith('MAX?') else min(levels)):.5f}"
+            return f"{bench.measure(bench.iout()):.5f}"
+        elif header == 'FETC:POW?':
+            return f"{bench.measure(bench.vout() * bench.iout()):.5f}"
+        else:
+            return NOT_HANDLED
+        return None
+
+
+class SimulatedHP34970A(SimulatedDevice):
+    idn = "HEWLETT-PACKARD,34970A,0,13-2-2"
+    # 每個通道的積分與切換時間
+    measurement_latency = 0.02
+    measurement_prefixes = ("MEAS", "FETC", "READ")
+
+    def __init__(self, bench: SimulatedBench):
+        super().__init__(bench)
+        self.functions: Dict[str, str] = {}
+        self.scan_list: List[str] = []
+        self.upper_limits: Dict[str, float] = {}
+        self.lower_limits: Dict[str, float] = {}
+        self.alarm_queue: List[Tuple[float, str, int]] = []
+        self.alarm_enable = 0
+        self.scan_interval = 1.0
+        self.scanning = False
+        self._last_scan = 0.0
+        self._readings: List[float] = []
+
+    def channel_value(self, channel: str, function: Optional[str] = None) -> float:
+        """通道接線: 101 = VOUT, 102 = VIN, 103 = IOUT 分流電阻 (10 mΩ)，其他通道依量測功能給定"""
+        function = function or self.functions.get(channel, 'VOLT:DC')
+        if function.startswith('TEMP'):
+            return self.bench.measure(25.0)
+        if function.startswith('RES'):
+            return self.bench.measure(1000.0)
+        bench = self.bench
+        value = {'101': bench.vout(), '102': bench.psu_voltage if bench.psu_output else 0.0,
+                 '103': bench.iout() * 0.01}.get(channel, 0.0)
+        return bench.measure(value)
+
+    def _scan(self):
+        """執行一次掃描，檢查警報上下限"""
+        readings = []
+        for channel in self.scan_list:
+            value = self.channel_value(channel)
+            readings.append(value)
+            if channel in self.upper_limits and value > self.upper_limits[channel]:
+                self.alarm_queue.append((value, channel, 2))
+            elif channel in self.lower_limits and value < self.lower_limits[channel]:
+                self.alarm_queue.append((value, channel, 1))
+        self._last_scan = time.monotonic()
+        return readings
+
+    def handle(self, header: str, args: str) -> Response:
+        if header.startswith('CONF:'):
+            for channel in _channels(args):
+                self.functions[channel] = header[5:]
+        elif header.startswith('MEAS') and header.endswith('?'):
+            # 與實機相同: MEASure? 中止掃描並以量測的通道取代掃描列表
+            function = header[5:-1] or None
+            self.scanning = False
+            self.scan_list = _channels(args)
+            return ','.join(f"{self.channel_value(ch, function):+.9E}" for ch in self.scan_list)
+        elif header == 'ROUTE:SCAN':
+            self.scan_list = _channels(args)
+        elif header == 'ROUTE:SCAN?':
+            return f"(@{','.join(self.scan_list)})"
+        elif header == 'INIT':
+            self.scanning = True
+            self._readings = self._scan()
+        elif header == 'ABOR':
+            self.scanning = False
+        elif header == 'FETCH?':
+            return ','.join(f"{value:+.9E}" for value in self._readings)
+        elif header == 'TRIG:TIM':
+            self.scan_interval = _number(args, 1.0)
+        elif header in ('CALC:LIM:UPP', 'CALC:LIM:LOW'):
+            limits = self.upper_limits if header.endswith('UPP') else self.lower_limits
+            for channel in _channels(args):
+                limits[channel] = _number(args)
+        elif header == 'STAT:ALAR:ENAB':
+            self.alarm_enable = int(_number(args))
+        elif header in ('STAT:ALAR:EVEN?', 'STAT:ALARM:EVEN?'):
+            return '1' if self.alarm_queue else '0'
+        elif header == 'SYST:ALAR?':
+            if not self.alarm_queue:
+                return "+0.000000000E+00,0000,00,00,00,00,00.000,000,0,0"
+            value, channel, limit = self.alarm_queue.pop(0)
+            now = datetime.now()
+            return (f"{value:+.9E} VDC,{now:%Y,%m,%d,%H,%M},{now.second + now.microsecond / 1e6:06.3f},"
+                    f"{channel},{limit},{len(self.alarm_queue) + 1}")
+        else:
+            return NOT_HANDLED
+        return None
+
+    def status_byte(self) -> int:
+        return 0x02 if self.alarm_queue and self.alarm_enable else 0
+
+    def wait_for_service_request(self, timeout: float) -> bool:
+        """依掃描間隔模擬定時掃描，直到出現警報或逾時"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                if self.alarm_queue and self.service_request_enable & 0x02:
+                    return True
+                if self.scanning and time.monotonic() - self._last_scan >= self.scan_interval:
+                    self._scan()
+                    continue
+                wait = self.scan_interval - (time.monotonic() - self._last_scan) if self.scanning else timeout
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(max(min(wait, remaining), 0.001))
+
+
+class SimulatedAFG3101C(SimulatedDevice):
+    idn = "TEKTRONIX,AFG3101C,SIM3101C,SCPI:99.0 FV:3.1.2"
+
+    def __init__(self, bench: SimulatedBench):
+        super().__init__(bench)
+        self.memories: Dict[str, np.ndarray] = {}
+
+    def handle(self, header: str, args: str) -> Response:
+        if header == 'SOURCE1:FREQUENCY:FIXED':
+            self.bench.afg_frequency = _number(args, 1000.0)
+        elif header == 'OUTPUT1:STATE':
+            self.bench.afg_output = args.strip().upper() in ('ON', '1')
+        elif header == 'DATA:COPY':
+            target, _, source = args.partition(',')
+            self.memories[target.strip().upper()] = self.memories.get(source.strip().upper(), np.empty(0))
+        else:
+            return NOT_HANDLED
+        return None
+
+    def execute_binary(self, command: str, values: np.ndarray):
+        if command.upper().startswith('DATA:DATA EMEMORY'):
+            with self.lock:
+                self.memories['EMEMORY'] = values.copy()
+
+
+# 最小的 1x1 PNG，作為模擬截圖
+def _placeholder_png() -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', 1, 1, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(b'\x00\x1e\x1e\x1e')) + chunk(b'IEND', b''))
+
+
+class SimulatedMSO54B(SimulatedDevice):
+    idn = "TEKTRONIX,MSO54B,SIM54B,CF:91.1CT FV:1.40"
+    measurement_prefixes = ("CURVE", "MEASUREMENT")
+
+    # 每格 25 個 int8 碼值 (10 格 = 250 碼值)
+    CODES_PER_DIVISION = 25
+
+    def __init__(self, bench: SimulatedBench):
+        super().__init__(bench)
+        self.settings.update({
+            'HORIZONTAL:RECORDLENGTH': '10000',
+            'HORIZONTAL:SCALE': '1e-4',
+            'HORIZONTAL:FASTFRAME:COUNT': '1',
+            'HORIZONTAL:FASTFRAME:STATE': 'OFF',
+            'DATA:SOURCE': 'CH1',
+            'DATA:WIDTH': '1',
+            'DATA:START': '1',
+            'DATA:STOP': '10000',
+            'DATA:FRAMESTART': '1',
+            'DATA:FRAMESTOP': '1',
+        })
+        self.files: Dict[str, bytes] = {}
+        self._acquisition: Dict[Tuple[int, int], np.ndarray] = {}
+        self._acquired_at = datetime.now()
+
+    def _int(self, key: str) -> int:
+        return int(_number(self.settings.get(key, '0')))
+
+    def _channel(self) -> int:
+        return int(re.sub(r'\D', '', self.settings.get('DATA:SOURCE', 'CH1')) or 1)
+
+    def _frames(self) -> int:
+        if self.settings.get('HORIZONTAL:FASTFRAME:STATE', 'OFF').upper() in ('ON', '1'):
+            return max(self._int('HORIZONTAL:FASTFRAME:COUNT'), 1)
+        return 1
+
+    def preamble(self, channel: int) -> Dict[str, float]:
+        record_length = self._int('HORIZONTAL:RECORDLENGTH')
+        scale = _number(self.settings.get('HORIZONTAL:SCALE', '1e-4'))
+        volts_per_division = _number(self.settings.get(f'CH{channel}:SCALE', '1.0'), 1.0)
+        codes_per_division = self.CODES_PER_DIVISION * (256 if self._int('DATA:WIDTH') == 2 else 1)
+        return {
+            'x_incr': scale * 10 / record_length,
+            'x_zero': -scale * 5,
+            'y_mult': volts_per_division / codes_per_division,
+            'y_off': 0.0,
+            'y_zero': _number(self.settings.get(f'CH{channel}:OFFSET', '0')),
+        }
+
+    def acquire(self, channel: int) -> np.ndarray:
+        """產生 (分段數, 記錄長度) 的電壓波形: CH1 為 AFG 輸出，其他通道為待測轉換器的 VOUT"""
+        preamble = self.preamble(channel)
+        frames = self._frames()
+        record_length = self._int('HORIZONTAL:RECORDLENGTH')
+        t = preamble['x_zero'] + np.arange(record_length) * preamble['x_incr']
+        bench = self.bench
+
+        if channel == 1:
+            if bench.afg_output:
+                phase = np.random.uniform(0, 1, (frames, 1))
+                volts = np.where((t * bench.afg_frequency + phase) % 1.0 < 0.5, 1.0, -1.0)
+            else:
+                volts = np.zeros((frames, record_length))
+        else:
+            volts = np.full((frames, record_length), bench.vout())
+            if bench.load_on and bench.load_dynamic:
+                # 負載步階 (t = 0) 後的阻尼振鈴
+                step = abs(bench.load_dynamic[1] - bench.load_dynamic[0])
+                after = t >= 0
+                ringing = -0.02 * step * np.exp(-t[after] / 20e-6) * np.cos(2 * np.pi * 100e3 * t[after])
+                volts[:, after] += ringing
+        return volts + np.random.normal(0.0, preamble['y_mult'] * 0.3, volts.shape)
+
+    def _codes(self, channel: int) -> np.ndarray:
+        """目前擷取的原始碼值 (同一次擷取分段下載時重複使用)"""
+        width = self._int('DATA:WIDTH')
+        codes = self._acquisition.get((channel, width))
+        if codes is None:
+            preamble = self.preamble(channel)
+            dtype = np.int16 if width == 2 else np.int8
+            info = np.iinfo(dtype)
+            volts = self.acquire(channel)
+            codes = np.rint((volts - preamble['y_zero']) / preamble['y_mult'] + preamble['y_off'])
+            codes = self._acquisition[(channel, width)] = np.clip(codes, info.min, info.max).astype(dtype)
+        return codes
+
+    def curve(self) -> np.ndarray:
+        codes = self._codes(self._channel())
+        start = max(self._int('DATA:START'), 1) - 1
+        stop = min(self._int('DATA:STOP'), codes.shape[1])
+        if self._frames() > 1:
+            first = max(self._int('DATA:FRAMESTART'), 1) - 1
+            last = min(self._int('DATA:FRAMESTOP'), codes.shape[0])
+            return codes[first:last, start:stop].ravel()
+        return codes[0, start:stop]
+
+    def measurement(self) -> str:
+        channel = int(re.sub(r'\D', '', self.settings.get('MEASUREMENT:IMMED:SOURCE', 'CH1')) or 1)
+        volts = self.acquire(channel)
+        kind = self.settings.get('MEASUREMENT:IMMED:TYPE', 'MEAN').upper()
+        values = {
+            'MEAN': volts[0].mean(),
+            'PK2PK': volts[0].max() - volts[0].min(),
+            'MAXIMUM': volts[0].max(),
+            'MINIMUM': volts[0].min(),
+            'RMS': np.sqrt(np.mean(volts[0] ** 2)),
+            'FREQUENCY': self.bench.afg_frequency if channel == 1 and self.bench.afg_output else 9.91E37,
+        }
+        return f"{values.get(kind, 9.91E37):.6E}"
+
+    def timestamps(self, args: str) -> str:
+        first, _, last = args.partition(',')
+        first, last = int(_number(first, 1)), int(_number(last, self._frames()))
+        # 事件間隔約為 AFG 週期
+        interval = 1.0 / self.bench.afg_frequency if self.bench.afg_output else 1e-3
+        stamps = []
+        for frame in range(first, last + 1):
+            moment = self._acquired_at + timedelta(seconds=(frame - 1) * interval)
+            stamps.append(f'"{frame}","{moment:%d %b %Y %H:%M:%S}.{moment.microsecond:06d}000000"')
+        return ','.join(stamps)
+
+    def handle(self, header: str, args: str) -> Response:
+        if header == 'ACQUIRE:STATE':
+            if args.strip().upper() in ('RUN', 'ON', '1'):
+                self._acquisition.clear()
+                self._acquired_at = datetime.now()
+            return NOT_HANDLED
+        if header == 'ACQUIRE:STATE?':
+            return '0' if self.settings.get('ACQUIRE:STATE', 'RUN').upper() in ('STOP', 'OFF', '0') else '1'
+        if header in ('HORIZONTAL:RECORDLENGTH', 'HORIZONTAL:SCALE', 'HORIZONTAL:FASTFRAME:COUNT',
+                      'HORIZONTAL:FASTFRAME:STATE') or re.match(r'CH\d:(SCALE|OFFSET)$', header):
+            self._acquisition.clear()
+            return NOT_HANDLED
+        if header.startswith('WFMOUTPRE:') and header.endswith('?'):
+            key = {'XINCR?': 'x_incr', 'XZERO?': 'x_zero', 'YMULT?': 'y_mult',
+                   'YOFF?': 'y_off', 'YZERO?': 'y_zero'}.get(header[10:])
+            return f"{self.preamble(self._channel())[key]:.6E}" if key else None
+        if header == 'CURVE?':
+            return self.curve()
+        if header == 'TRIGGER:STATE?':
+            return '1'
+        if header == 'MEASUREMENT:IMMED:VALUE?':
+            return self.measurement()
+        if header.startswith('HORIZONTAL:FASTFRAME:TIMESTAMP:ALL'):
+            return self.timestamps(args)
+        if header == 'SAVE:IMAGE':
+            self.files[_quoted(args)] = _placeholder_png()
+            return None
+        if header == 'SAVE:WAVEFORM':
+            volts = self.acquire(1)[0]
+            preamble = self.preamble(1)
+            times = preamble['x_zero'] + np.arange(volts.size) * preamble['x_incr']
+            lines = [f"{x:.6E},{y:.6E}" for x, y in zip(times, volts)]
+            self.files[_quoted(args)] = ("TIME,CH1\n" + "\n".join(lines) + "\n").encode()
+            return None
+        if header == 'FILESYSTEM:READFILE':
+            return self.files.get(_quoted(args))
+        if header == 'FILESYSTEM:DELETE':
+            self.files.pop(_quoted(args), None)
+            return None
+        return NOT_HANDLED
+
+
+class SimulatedSession:
+    """模擬的 VISA 連線，提供驅動程式使用到的 pyvisa Resource 介面"""
+
+    def __init__(self, device: SimulatedDevice, address: str, latency: LatencyModel):
+        self.device = device
+        self.resource_name = address
+        self.latency = latency
+        self.timeout = 2000
+        self.read_termination = '\n'
+        self.write_termination = '\n'
+        self._pending: Response = None
+
+    def _timeout_error(self):
+        return pyvisa.errors.VisaIOError(constants.StatusCode.error_timeout)
+
+    def write(self, command: str) -> int:
+        header = command.strip().partition(' ')[0].upper()
+        extra = self.device.measurement_latency if self.device.is_measurement(header) else 0.0
+        self.latency.delay(len(command), extra)
+        self._pending = self.device.execute(command)
+        return len(command)
+
+    def _take(self) -> Response:
+        response, self._pending = self._pending, None
+        if response is None:
+            raise self._timeout_error()
+        return response
+
+    def read_raw(self) -> bytes:
+        response = self._take()
+        data = response if isinstance(response, bytes) else str(response).encode()
+        self.latency.delay(len(data))
+        return data
+
+    def read(self) -> str:
+        response = self._take()
+        self.latency.delay(len(response))
+        return response if isinstance(response, str) else bytes(response).decode(errors='replace')
+
+    def query(self, command: str) -> str:
+        self.write(command)
+        return self.read()
+
+    def query_binary_values(self, command: str, datatype: str = 'f', is_big_endian: bool = False,
+                            container=list, **kwargs):
+        self.write(command)
+        values = np.asarray(self._take()).astype(np.dtype(datatype), copy=False)
+        self.latency.delay(values.nbytes)
+        return values if container is np.array else container(values.tolist())
+
+    def write_binary_values(self, command: str, values, datatype: str = 'f',
+                            is_big_endian: bool = False, **kwargs) -> int:
+        values = np.asarray(values, dtype=np.dtype(datatype))
+        self.latency.delay(len(command) + values.nbytes)
+        self.device.execute_binary(command, values)
+        return len(command) + values.nbytes
+
+    def read_stb(self) -> int:
+        self.latency.delay()
+        return self.device.status_byte()
+
+    def enable_event(self, event_type, mechanism, context=None):
+        pass
+
+    def disable_event(self, event_type, mechanism):
+        pass
+
+    def discard_events(self, event_type, mechanism):
+        pass
+
+    def wait_on_event(self, event_type, timeout: int):
+        if not self.device.wait_for_service_request(timeout / 1000):
+            raise self._timeout_error()
+
+    def clear(self):
+        self._pending = None
+
+    def close(self):
+        self._pending = None
+
+
+DEVICE_MODELS = {
+    "power-supply": SimulatedChroma62012P,
+    "eload": SimulatedChroma63206A,
+    "daq": SimulatedHP34970A,
+    "afg": SimulatedAFG3101C,
+    "scope": SimulatedMSO54B,
+}
+
+_default_bench: Optional[SimulatedBench] = None
+_default_bench_lock = threading.Lock()
+
+
+def get_default_bench() -> SimulatedBench:
+    """所有模擬資源管理器共用的測試台 (掃描時建立的資源管理器也看到相同的儀器狀態)"""
+    global _default_bench
+    with _default_bench_lock:
+        if _default_bench is None:
+            _default_bench = SimulatedBench()
+            for instrument_type, address in SIMULATED_ADDRESSES.items():
+                _default_bench.add_device(address, DEVICE_MODELS[instrument_type](_default_bench))
+        return _default_bench
+
+
+class SimulatedResourceManager:
+    """模擬的 VISA 資源管理器，可取代 pyvisa.ResourceManager 在沒有硬體的環境執行整個系統"""
+
+    def __init__(self, bench: Optional[SimulatedBench] = None, latency: Optional[LatencyModel] = None,
+                 latency_scale: float = 1.0):
+        """
+        Args:
+            bench: 模擬測試台，預設使用共用的測試台
+            latency: 延遲模型，預設為 GPIB 典型值
+            latency_scale: 延遲倍率 (latency 未指定時使用)
+        """
+        self.bench = bench or get_default_bench()
+        self.latency = latency or LatencyModel(scale=latency_scale)
+
+    def __str__(self) -> str:
+        return f"SimulatedResourceManager ({len(self.bench.devices)} 台模擬儀器)"
+
+    def list_resources(self, query: str = '?*::INSTR') -> Tuple[str, ...]:
+        return tuple(self.bench.devices)
+
+    def open_resource(self, address: str, **kwargs) -> SimulatedSession:
+        device = self.bench.devices.get(address)
+        if device is None:
+            raise pyvisa.errors.VisaIOError(constants.StatusCode.error_resource_not_found)
+        self.latency.delay()
+        return SimulatedSession(device, address, self.latency)
+
+    def close(self):
+        pass
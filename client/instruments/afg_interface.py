@@ -1,6 +1,21 @@
 from abc import ABC, abstractmethod
+from enum import Enum
 from typing import List, Dict, Union, Optional
+import numpy as np
 import pyvisa
+from .scpi_metrics import instrument_session
+
+class SweepSpacing(Enum):
+    LINEAR = "LIN"
+    LOGARITHMIC = "LOG"
+
+class SweepMode(Enum):
+    AUTO = "AUTO"
+    MANUAL = "MAN"
+
+class BurstMode(Enum):
+    TRIGGERED = "TRIG"
+    GATED = "GAT"
 
 class AFGInterface(ABC):
     """訊號產生器的抽象基類"""
@@ -13,7 +28,7 @@ class AFGInterface(ABC):
     def connect(self) -> bool:
         """連接到儀器"""
         try:
-            self.instrument = self.rm.open_resource(self.address)
+            self.instrument = instrument_session(self.rm.open_resource(self.address), self.address)
             self.instrument.timeout = 10000  # 10秒超時
             return True
         except Exception as e:
@@ -57,4 +72,69 @@ class AFGInterface(ABC):
         Args:
             channel: 通道編號
         """
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def configure_sweep(self, channel: int, start: float, stop: float, sweep_time: float,
+                        spacing: SweepSpacing = SweepSpacing.LINEAR,
+                        hold_time: float = 0.0, return_time: float = 0.0,
+                        mode: SweepMode = SweepMode.AUTO,
+                        trigger_interval: Optional[float] = None) -> bool:
+        """設定儀器內建的頻率掃描 (由硬體逐步改變頻率)
+
+        Args:
+            channel: 通道編號
+            start: 起始頻率 (Hz)
+            stop: 結束頻率 (Hz)
+            sweep_time: 掃描時間 (秒)
+            spacing: 線性或對數掃描
+            hold_time: 停留在結束頻率的時間 (秒)
+            return_time: 由結束頻率回到起始頻率的時間 (秒)
+            mode: AUTO 為連續重複掃描；MANUAL 為每次觸發掃描一次
+            trigger_interval: MANUAL 模式的內部觸發週期 (秒)，None 表示使用外部觸發或 trigger()
+        """
+        pass
+
+    @abstractmethod
+    def configure_burst(self, channel: int, cycles: Optional[int] = 1,
+                        mode: BurstMode = BurstMode.TRIGGERED,
+                        trigger_interval: Optional[float] = None, delay: float = 0.0) -> bool:
+        """設定叢發模式
+
+        Args:
+            channel: 通道編號
+            cycles: 每次觸發輸出的週期數，None 表示無限
+            mode: 觸發叢發或閘控叢發
+            trigger_interval: 內部觸發週期 (秒)，None 表示使用外部觸發
+            delay: 觸發延遲 (秒)
+        """
+        pass
+
+    @abstractmethod
+    def trigger(self) -> bool:
+        """送出軟體觸發 (開始一次掃描或叢發)"""
+        pass
+
+    @abstractmethod
+    def set_continuous(self, channel: int) -> bool:
+        """關閉掃描與叢發，回到連續輸出固定頻率
+
+        Args:
+            channel: 通道編號
+        """
+        pass
+
+    @abstractmethod
+    def upload_arbitrary_waveform(self, channel: int, samples: np.ndarray,
+                                  set_levels: bool = False, force: bool = False) -> bool:
+        """上傳任意波形並設定為指定通道的輸出波形
+
+        波形會正規化並量化為儀器 DAC 格式後以二進位區塊傳送；內容相同的波形已上傳過時不會再次傳送。
+
+        Args:
+            channel: 通道編號
+            samples: 波形取樣 (任意單位，只保留形狀)
+            set_levels: 是否以 samples 的最大/最小值設定輸出的高/低電壓 (samples 以伏特為單位時使用)
+            force: 忽略快取，強制重新上傳
+        """
+        pass
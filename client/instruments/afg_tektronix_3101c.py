@@ -1,6 +1,34 @@
-from .afg_interface import AFGInterface
+from collections import OrderedDict
+from typing import Dict, Optional
+import hashlib
+import numpy as np
+from .afg_interface import AFGInterface, SweepSpacing, SweepMode, BurstMode
 import pyvisa
 
+# 14 位元 DAC: 0 ~ 16382 (0x3FFE)
+DAC_MAX_CODE = 16382
+ARB_MIN_POINTS = 2
+ARB_MAX_POINTS = 131072
+USER_MEMORIES = ("USER1", "USER2", "USER3", "USER4")
+
+# 已上傳的波形: 儀器位址 -> {內容雜湊: 使用者記憶體}，依使用順序排列
+# (驅動程式實例在每次請求時重新建立，快取必須放在模組層級)
+_uploaded_waveforms: Dict[str, "OrderedDict[str, str]"] = {}
+
+
+def quantize_waveform(samples: np.ndarray) -> np.ndarray:
+    """將波形正規化到 DAC 全範圍並量化為 14 位元碼值 (向量運算)"""
+    samples = np.asarray(samples, dtype=np.float64).ravel()
+    if not ARB_MIN_POINTS <= samples.size <= ARB_MAX_POINTS:
+        raise ValueError(f"任意波形點數必須在 {ARB_MIN_POINTS} ~ {ARB_MAX_POINTS} 之間: {samples.size}")
+    if not np.all(np.isfinite(samples)):
+        raise ValueError("任意波形包含 NaN 或無限大")
+
+    low, high = samples.min(), samples.max()
+    if high == low:
+        return np.full(samples.size, DAC_MAX_CODE // 2, dtype=np.uint16)
+    return np.rint((samples - low) * (DAC_MAX_CODE / (high - low))).astype(np.uint16)
+
 class AFGTektronix3101C(AFGInterface):
     """Tektronix AFG3101C 訊號產生器的具體實現"""
 
@@ -37,4 +65,105 @@ class AFGTektronix3101C(AFGInterface):
             return True
         except pyvisa.errors.VisaIOError as e:
             print(f"關閉輸出失敗: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    def configure_sweep(self, channel: int, start: float, stop: float, sweep_time: float,
+                        spacing: SweepSpacing = SweepSpacing.LINEAR,
+                        hold_time: float = 0.0, return_time: float = 0.0,
+                        mode: SweepMode = SweepMode.AUTO,
+                        trigger_interval: Optional[float] = None) -> bool:
+        """設定儀器內建的頻率掃描"""
+        try:
+            self.instrument.write(f'SOURce{channel}:BURSt:STATe OFF')
+            self.instrument.write(f'SOURce{channel}:FREQuency:STARt {start}')
+            self.instrument.write(f'SOURce{channel}:FREQuency:STOP {stop}')
+            self.instrument.write(f'SOURce{channel}:SWEep:SPACing {spacing.value}')
+            self.instrument.write(f'SOURce{channel}:SWEep:TIME {sweep_time}')
+            self.instrument.write(f'SOURce{channel}:SWEep:HTIMe {hold_time}')
+            self.instrument.write(f'SOURce{channel}:SWEep:RTIMe {return_time}')
+            self.instrument.write(f'SOURce{channel}:SWEep:MODE {mode.value}')
+            if mode == SweepMode.MANUAL:
+                self._set_trigger_source(trigger_interval)
+            self.instrument.write(f'SOURce{channel}:FREQuency:MODE SWEep')
+            return True
+        except pyvisa.errors.VisaIOError as e:
+            print(f"設定頻率掃描失敗: {e}")
+            return False
+
+    def configure_burst(self, channel: int, cycles: Optional[int] = 1,
+                        mode: BurstMode = BurstMode.TRIGGERED,
+                        trigger_interval: Optional[float] = None, delay: float = 0.0) -> bool:
+        """設定叢發模式"""
+        try:
+            self.instrument.write(f'SOURce{channel}:FREQuency:MODE CW')
+            self.instrument.write(f'SOURce{channel}:BURSt:MODE {mode.value}')
+            self.instrument.write(f'SOURce{channel}:BURSt:NCYCles {"INFinity" if cycles is None else cycles}')
+            self.instrument.write(f'SOURce{channel}:BURSt:TDELay {delay}')
+            self._set_trigger_source(trigger_interval)
+            self.instrument.write(f'SOURce{channel}:BURSt:STATe ON')
+            return True
+        except pyvisa.errors.VisaIOError as e:
+            print(f"設定叢發模式失敗: {e}")
+            return False
+
+    def _set_trigger_source(self, trigger_interval: Optional[float]):
+        """內部計時觸發 (trigger_interval 秒) 或外部觸發；軟體觸發 (trigger()) 在兩者下都有效"""
+        if trigger_interval is not None:
+            self.instrument.write('TRIGger:SEQuence:SOURce TIMer')
+            self.instrument.write(f'TRIGger:SEQuence:TIMer {trigger_interval}')
+        else:
+            self.instrument.write('TRIGger:SEQuence:SOURce EXTernal')
+
+    def trigger(self) -> bool:
+        """送出軟體觸發"""
+        try:
+            self.instrument.write('TRIGger:SEQuence:IMMediate')
+            return True
+        except pyvisa.errors.VisaIOError as e:
+            print(f"觸發失敗: {e}")
+            return False
+
+    def set_continuous(self, channel: int) -> bool:
+        """回到連續輸出固定頻率"""
+        try:
+            self.instrument.write(f'SOURce{channel}:BURSt:STATe OFF')
+            self.instrument.write(f'SOURce{channel}:FREQuency:MODE CW')
+            return True
+        except pyvisa.errors.VisaIOError as e:
+            print(f"設定連續輸出失敗: {e}")
+            return False
+
+    def upload_arbitrary_waveform(self, channel: int, samples: np.ndarray,
+                                  set_levels: bool = False, force: bool = False) -> bool:
+        """上傳任意波形到使用者記憶體並設定為輸出波形"""
+        try:
+            codes = quantize_waveform(samples)
+            digest = hashlib.sha256(codes.tobytes()).hexdigest()
+            memories = _uploaded_waveforms.setdefault(self.address, OrderedDict())
+
+            if digest in memories and not force:
+                memory = memories[digest]
+                memories.move_to_end(digest)
+            else:
+                memories.pop(digest, None)
+                used = set(memories.values())
+                free = [m for m in USER_MEMORIES if m not in used]
+                memory = free[0] if free else memories.popitem(last=False)[1]
+
+                # 以 IEEE-488.2 二進位區塊 (16 位元 big-endian) 寫入編輯記憶體，再複製到使用者記憶體
+                self.instrument.write(f'DATA:DEFine EMEMory,{codes.size}')
+                self.instrument.write_binary_values('DATA:DATA EMEMory,', codes, datatype='H', is_big_endian=True)
+                self.instrument.write(f'DATA:COPY {memory},EMEMory')
+                memories[digest] = memory
+
+            self.instrument.write(f'SOURce{channel}:FUNCtion:SHAPe {memory}')
+            if set_levels:
+                values = np.asarray(samples, dtype=np.float64)
+                self.instrument.write(f'SOURce{channel}:VOLTage:LEVel:IMMediate:HIGH {values.max()}')
+                self.instrument.write(f'SOURce{channel}:VOLTage:LEVel:IMMediate:LOW {values.min()}')
+            return True
+        except (pyvisa.errors.VisaIOError, ValueError) as e:
+            # 上傳中斷時記憶體內容未知，清除此儀器的快取
+            _uploaded_waveforms.pop(self.address, None)
+            print(f"上傳任意波形失敗: {e}")
+            return False
@@ -1,9 +1,22 @@
 from typing import List, Dict, Union, Optional
 import time
-from .daq_interface import DAQInterface
+import pyvisa
+from pyvisa import constants
+from .daq_interface import DAQInterface, DAQ_UNIT_FUNCTIONS
+
+# 狀態位元組 bit 1: 警報暫存器摘要
+ALARM_SUMMARY_BIT = 0x02
+# 警報暫存器: 警報 1~4 的高/低限 (bit 0~7)
+ALARM_REGISTER_MASK = 0xFF
+# 不支援 SRQ 時的狀態位元組輪詢間隔 (秒)
+STB_POLL_INTERVAL = 0.2
 
 class HP34970A(DAQInterface):
     """HP/Agilent 34970A 數據擷取器實現"""
+
+    def __init__(self, resource_manager: pyvisa.ResourceManager, address: str):
+        super().__init__(resource_manager, address)
+        self._srq_enabled = False
     
     def get_identification(self) -> str:
         try:
@@ -110,12 +123,7 @@ class HP34970A(DAQInterface):
                 continue
 
             # Map unit to SCPI
-            unit_map = {
-                "VOLT": "VOLT:DC",
-                "RES": "RES",
-                "TEMP": "TEMP"
-            }
-            scpi_unit = unit_map.get(unit, "VOLT:DC")
+            scpi_unit = DAQ_UNIT_FUNCTIONS.get(unit, "VOLT:DC")
 
             # Configure and read in one command
             try:
@@ -168,3 +176,87 @@ class HP34970A(DAQInterface):
         except Exception as e:
             print(f"設定警報失敗: {e}")
             return False
+
+    def set_scan_interval(self, interval: float, count: Optional[int] = None) -> bool:
+        try:
+            self.instrument.write('TRIG:SOUR TIM')
+            self.instrument.write(f'TRIG:TIM {interval}')
+            self.instrument.write(f'TRIG:COUN {count if count is not None else "INF"}')
+            return True
+        except Exception as e:
+            print(f"設定掃描間隔失敗: {e}")
+            return False
+
+    def enable_alarm_events(self) -> bool:
+        try:
+            self.instrument.write('*CLS')
+            self.instrument.write(f'STAT:ALAR:ENAB {ALARM_REGISTER_MASK}')
+            self.instrument.write(f'*SRE {ALARM_SUMMARY_BIT}')
+
+            # GPIB 支援 SRQ 事件；其他介面退回單一狀態位元組輪詢
+            try:
+                self.instrument.enable_event(constants.EventType.service_request,
+                                             constants.EventMechanism.queue)
+                self._srq_enabled = True
+            except Exception:
+                self._srq_enabled = False
+            return True
+        except Exception as e:
+            print(f"啟用警報事件失敗: {e}")
+            return False
+
+    def disable_alarm_events(self) -> bool:
+        try:
+            if self._srq_enabled:
+                self.instrument.disable_event(constants.EventType.service_request,
+                                              constants.EventMechanism.queue)
+                self._srq_enabled = False
+            self.instrument.write('*SRE 0')
+            self.instrument.write('STAT:ALAR:ENAB 0')
+            return True
+        except Exception as e:
+            print(f"停用警報事件失敗: {e}")
+            return False
+
+    def wait_for_alarm(self, timeout_ms: int) -> bool:
+        try:
+            if self._srq_enabled:
+                try:
+                    self.instrument.wait_on_event(constants.EventType.service_request, timeout_ms)
+                except pyvisa.errors.VisaIOError as e:
+                    if e.error_code == constants.StatusCode.error_timeout:
+                        return False
+                    raise
+                return bool(self.instrument.read_stb() & ALARM_SUMMARY_BIT)
+
+            deadline = time.monotonic() + timeout_ms / 1000
+            while True:
+                if self.instrument.read_stb() & ALARM_SUMMARY_BIT:
+                    return True
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(STB_POLL_INTERVAL)
+        except Exception as e:
+            print(f"等待警報事件失敗: {e}")
+            return False
+
+    def read_alarm_queue(self) -> List[Dict]:
+        alarms = []
+        try:
+            # 讀取事件暫存器以清除摘要位元
+            self.instrument.query('STAT:ALAR:EVEN?')
+
+            # 警報佇列格式: 讀值, 年,月,日, 時,分,秒, 通道, 限制 (0/1=LO/2=HI), 警報編號
+            while True:
+                fields = self.instrument.query('SYST:ALAR?').strip().split(',')
+                if len(fields) < 4 or int(fields[-3]) == 0:
+                    break
+                alarms.append({
+                    'channel': fields[-3].strip(),
+                    'value': float(fields[0].split()[0]),
+                    'limit': 'high' if int(fields[-2]) == 2 else 'low',
+                    'alarm': int(fields[-1]),
+                })
+        except Exception as e:
+            print(f"讀取警報佇列失敗: {e}")
+        return alarms
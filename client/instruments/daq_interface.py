@@ -1,6 +1,14 @@
 from abc import ABC, abstractmethod
 from typing import List, Dict, Union, Optional
 import pyvisa
+from .scpi_metrics import instrument_session
+
+# 單位 -> 測量功能 (SCPI) 對照表
+DAQ_UNIT_FUNCTIONS = {
+    "VOLT": "VOLT:DC",
+    "RES": "RES",
+    "TEMP": "TEMP"
+}
 
 class DAQInterface(ABC):
     """數據擷取器的抽象基類"""
@@ -13,7 +21,7 @@ class DAQInterface(ABC):
     def connect(self) -> bool:
         """連接到儀器"""
         try:
-            self.instrument = self.rm.open_resource(self.address)
+            self.instrument = instrument_session(self.rm.open_resource(self.address), self.address)
             self.instrument.timeout = 10000  # 10秒超時
             return True
         except Exception as e:
@@ -91,3 +99,41 @@ class DAQInterface(ABC):
                  low_limit: Optional[float] = None) -> bool:
         """設定通道警報限制"""
         pass
+
+    @abstractmethod
+    def set_scan_interval(self, interval: float, count: Optional[int] = None) -> bool:
+        """設定定時掃描 (警報僅在掃描時判定)
+
+        Args:
+            interval: 掃描間隔 (秒)
+            count: 掃描次數，None 表示持續掃描直到停止
+        """
+        pass
+
+    @abstractmethod
+    def enable_alarm_events(self) -> bool:
+        """啟用警報事件回報 (警報暫存器 -> 狀態位元組 -> SRQ)"""
+        pass
+
+    @abstractmethod
+    def disable_alarm_events(self) -> bool:
+        """停用警報事件回報"""
+        pass
+
+    @abstractmethod
+    def wait_for_alarm(self, timeout_ms: int) -> bool:
+        """等待警報事件 (SRQ 或狀態位元組輪詢)
+
+        Returns:
+            bool: 在逾時前發生警報則返回 True
+        """
+        pass
+
+    @abstractmethod
+    def read_alarm_queue(self) -> List[Dict]:
+        """讀取並清空警報佇列
+
+        Returns:
+            A list of alarms, e.g., [{'channel': '101', 'value': 85.2, 'limit': 'high', 'alarm': 1}]
+        """
+        pass
@@ -1,6 +1,10 @@
+from typing import Dict, List
 from .eload_interface import LoadInterface
 import time
 
+# 63206A 程序最多 10 個序列
+MAX_PROGRAM_SEQUENCES = 10
+
 class Chroma63206A(LoadInterface):
     """Chroma 63206A 電子負載機實現"""
     
@@ -28,13 +32,14 @@ class Chroma63206A(LoadInterface):
     
     def set_mode(self, mode: str):
         """設定工作模式
-        mode: 'CC', 'CV', 'CR', 或 'CP'
+        mode: 'CC', 'CV', 'CR', 'CP' 或 'CCD' (CC動態)
         """
         mode_map = {
             'CC': 'CURR',
             'CV': 'VOLT',
             'CR': 'RES',
-            'CP': 'POW'
+            'CP': 'POW',
+            'CCD': 'CCDH'
         }
         if mode.upper() in mode_map:
             self.instrument.write(f'MODE {mode_map[mode.upper()]}')
@@ -60,7 +65,10 @@ class Chroma63206A(LoadInterface):
             'CURR': 'CC',
             'VOLT': 'CV',
             'RES': 'CR',
-            'POW': 'CP'
+            'POW': 'CP',
+            'CCDH': 'CCD',
+            'CCDM': 'CCD',
+            'CCDL': 'CCD'
         }
         return mode_map.get(mode, 'UNKNOWN')
 
@@ -87,3 +95,83 @@ class Chroma63206A(LoadInterface):
                 'power': 0,
                 'mode': 'UNKNOWN',
             }
+
+    def configure_dynamic(self, level1: float, level2: float, t1: float, t2: float,
+                          rise: float, fall: float, repeat: int = 0) -> bool:
+        try:
+            self.set_mode('CCD')
+            self.instrument.write(f'CURR:DYN:L1 {level1}')
+            self.instrument.write(f'CURR:DYN:L2 {level2}')
+            self.instrument.write(f'CURR:DYN:T1 {t1}')
+            self.instrument.write(f'CURR:DYN:T2 {t2}')
+            self.instrument.write(f'CURR:DYN:RISE {rise}')
+            self.instrument.write(f'CURR:DYN:FALL {fall}')
+            self.instrument.write(f'CURR:DYN:REP {repeat}')
+            return True
+        except Exception as e:
+            print(f"設定動態負載失敗: {e}")
+            return False
+
+    def get_dynamic_settings(self) -> Dict:
+        try:
+            settings = {}
+            for key, cmd in (('level1', 'L1'), ('level2', 'L2'), ('t1', 'T1'),
+                             ('t2', 'T2'), ('rise', 'RISE'), ('fall', 'FALL')):
+                settings[key] = float(self.instrument.query(f'CURR:DYN:{cmd}?'))
+            return settings
+        except Exception as e:
+            print(f"讀取動態負載設定失敗: {e}")
+            return {}
+
+    def configure_program(self, program: int, sequences: List[Dict], repeat: int = 0) -> bool:
+        try:
+            if not 0 < len(sequences) <= MAX_PROGRAM_SEQUENCES:
+                print(f"程序序列數量必須為 1~{MAX_PROGRAM_SEQUENCES}: {len(sequences)}")
+                return False
+
+            self.instrument.write(f'PROG:FILE {program}')
+            for index, sequence in enumerate(sequences, start=1):
+                self.instrument.write(f'PROG:SEQ {index}')
+                self.instrument.write(f'PROG:SEQ:MODE {sequence.get("mode", "AUTO")}')
+                self.instrument.write(f'PROG:SEQ:MEM {sequence["memory"]}')
+                self.instrument.write(f'PROG:SEQ:TIME:ON {sequence.get("on_time", 0.1)}')
+                self.instrument.write(f'PROG:SEQ:TIME:OFF {sequence.get("off_time", 0.0)}')
+                self.instrument.write(f'PROG:SEQ:TIME:PF {sequence.get("pf_delay", 0.0)}')
+            # 未使用的序列設為 SKIP
+            for index in range(len(sequences) + 1, MAX_PROGRAM_SEQUENCES + 1):
+                self.instrument.write(f'PROG:SEQ {index}')
+                self.instrument.write('PROG:SEQ:MODE SKIP')
+            self.instrument.write(f'PROG:REP {repeat}')
+            return True
+        except Exception as e:
+            print(f"設定程序失敗: {e}")
+            return False
+
+    def run_program(self, program: int) -> bool:
+        try:
+            self.instrument.write(f'PROG:FILE {program}')
+            self.instrument.write('PROG:RUN ON')
+            return True
+        except Exception as e:
+            print(f"執行程序失敗: {e}")
+            return False
+
+    def stop_program(self) -> bool:
+        try:
+            self.instrument.write('PROG:RUN OFF')
+            return True
+        except Exception as e:
+            print(f"停止程序失敗: {e}")
+            return False
+
+    def measure_extremes(self) -> Dict:
+        try:
+            return {
+                'voltage_max': float(self.instrument.query('MEAS:VOLT:MAX?')),
+                'voltage_min': float(self.instrument.query('MEAS:VOLT:MIN?')),
+                'current_max': float(self.instrument.query('MEAS:CURR:MAX?')),
+                'current_min': float(self.instrument.query('MEAS:CURR:MIN?')),
+            }
+        except Exception as e:
+            print(f"讀取峰值失敗: {e}")
+            return {}
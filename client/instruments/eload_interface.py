@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 import pyvisa
-from typing import Dict
+from .scpi_metrics import instrument_session
+from typing import Dict, List
 
 class LoadInterface(ABC):
     """電子負載機的抽象基類"""
@@ -13,7 +14,7 @@ class LoadInterface(ABC):
     def connect(self):
         """連接到儀器"""
         try:
-            self.instrument = self.rm.open_resource(self.address)
+            self.instrument = instrument_session(self.rm.open_resource(self.address), self.address)
             self.instrument.timeout = 10000  # 10秒超時
             return True
         except Exception as e:
@@ -73,4 +74,60 @@ class LoadInterface(ABC):
         Returns:
             Dict: e.g., {'output': 'ON', 'current': 1.2}
         """
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def configure_dynamic(self, level1: float, level2: float, t1: float, t2: float,
+                          rise: float, fall: float, repeat: int = 0) -> bool:
+        """設定動態負載 (CC動態模式)，負載切換由儀器硬體計時
+
+        Args:
+            level1: L1 電流 (A)
+            level2: L2 電流 (A)
+            t1: L1 持續時間 (秒)
+            t2: L2 持續時間 (秒)
+            rise: 上升斜率 (A/µs)
+            fall: 下降斜率 (A/µs)
+            repeat: 重複次數，0 表示持續切換
+        """
+        pass
+
+    @abstractmethod
+    def get_dynamic_settings(self) -> Dict:
+        """讀取動態負載設定
+
+        Returns:
+            Dict: e.g., {'level1': 1.0, 'level2': 5.0, 't1': 0.001, 't2': 0.001, 'rise': 2.5, 'fall': 2.5}
+        """
+        pass
+
+    @abstractmethod
+    def configure_program(self, program: int, sequences: List[Dict], repeat: int = 0) -> bool:
+        """設定程序 (Program) 模式
+
+        Args:
+            program: 程序編號
+            sequences: 各序列的設定，e.g., [{'memory': 1, 'on_time': 0.5, 'off_time': 0.0, 'pf_delay': 0.0}]，
+                       memory 為預先儲存的負載狀態
+            repeat: 程序重複次數
+        """
+        pass
+
+    @abstractmethod
+    def run_program(self, program: int) -> bool:
+        """執行程序"""
+        pass
+
+    @abstractmethod
+    def stop_program(self) -> bool:
+        """停止程序"""
+        pass
+
+    @abstractmethod
+    def measure_extremes(self) -> Dict:
+        """讀取動態/程序執行期間由儀器記錄的峰值
+
+        Returns:
+            Dict: e.g., {'voltage_max': 5.1, 'voltage_min': 4.9, 'current_max': 5.0, 'current_min': 1.0}
+        """
+        pass
@@ -1,7 +1,7 @@
 from typing import Optional, Type
 import pyvisa
 from .oscilloscope_interface import OscilloscopeInterface
-from .tektronix_mso54b import TektronixMSO54B
+from .oscilloscope_tektronix_mso54b import TektronixMSO54B
 
 class OscilloscopeFactory:
     """示波器工廠類"""
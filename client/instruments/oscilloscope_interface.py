@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Union, Optional, Tuple
+from typing import Callable, List, Dict, Union, Optional, Tuple
+import numpy as np
 import pyvisa
+from .scpi_metrics import instrument_session
 from enum import Enum
 
 class TriggerMode(Enum):
@@ -30,7 +32,7 @@ class OscilloscopeInterface(ABC):
     def connect(self) -> bool:
         """連接到示波器"""
         try:
-            self.instrument = self.rm.open_resource(self.address)
+            self.instrument = instrument_session(self.rm.open_resource(self.address), self.address)
             self.instrument.timeout = 10000  # 10秒超時
             return True
         except Exception as e:
@@ -137,6 +139,69 @@ class OscilloscopeInterface(ABC):
         """
         pass
     
+    @abstractmethod
+    def get_waveform_raw(self, channel: int) -> Tuple[np.ndarray, Dict[str, float]]:
+        """獲取原始波形數據 (不轉換為電壓)
+
+        Returns:
+            Tuple[np.ndarray, Dict[str, float]]: (原始整數取樣, 刻度資訊)
+            刻度資訊包含 'x_incr', 'x_zero', 'y_mult', 'y_off', 'y_zero'；
+            電壓 = (原始值 - y_off) * y_mult + y_zero，時間 = x_zero + i * x_incr
+        """
+        pass
+
+    @abstractmethod
+    def stream_waveform_to_file(self, channel: int, filepath: str, chunk_points: int = 1_000_000,
+                                width: int = 1,
+                                on_progress: Optional[Callable[[int, int], None]] = None,
+                                cancel: Optional[Callable[[], bool]] = None) -> Dict:
+        """分段下載長記錄波形，直接寫入磁碟上的記憶體映射檔案 (記憶體用量與記錄長度無關)
+
+        擷取執行中時先停止擷取 (所有分段來自同一次觸發)，結束後恢復；
+        未完整下載 (取消或失敗) 時刪除檔案。
+
+        Args:
+            channel: 通道編號
+            filepath: 輸出檔案路徑 (原始整數取樣，little-endian)
+            chunk_points: 每段傳輸的取樣點數
+            width: 每個取樣的位元組數 (1 = int8, 2 = int16)
+            on_progress: 進度回呼 (已下載點數, 總點數)
+            cancel: 返回 True 時停止下載
+
+        Returns:
+            Dict: {'points': 已下載點數, 'record_length': 記錄長度, 'dtype': 'int8'/'int16',
+                   'complete': 是否完整下載, 'preamble': 刻度資訊}，失敗時為空 dict
+        """
+        pass
+
+    @abstractmethod
+    def configure_fastframe(self, frames: int) -> bool:
+        """啟用分段記憶體擷取 (FastFrame)，每次單次擷取連續記錄 frames 個觸發事件
+
+        Args:
+            frames: 分段數量，0 表示停用
+        """
+        pass
+
+    @abstractmethod
+    def get_fastframe_raw(self, channel: int, width: int = 1) -> Tuple[np.ndarray, np.ndarray, Dict[str, float]]:
+        """一次下載所有分段的原始取樣與觸發時間戳記
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, Dict[str, float]]: (形狀為 (分段數, 記錄長度) 的原始取樣,
+            每個分段相對於第一個分段的觸發時間 (秒), 刻度資訊)；失敗時為空陣列與空 dict
+        """
+        pass
+
+    @abstractmethod
+    def wait_for_acquisition(self, timeout: float) -> bool:
+        """等待單次擷取完成
+
+        Args:
+            timeout: 最長等待時間 (秒)
+        """
+        pass
+
     @abstractmethod
     def get_measurement(self, channel: int, measurement_type: str) -> float:
         """獲取測量值 (Vpp, Frequency, Period等)"""
@@ -151,6 +216,20 @@ class OscilloscopeInterface(ABC):
     def save_screenshot(self, filepath: str) -> bool:
         """保存螢幕截圖"""
         pass
+
+    @abstractmethod
+    def read_file(self, filepath: str) -> bytes:
+        """透過同一個 VISA 連線讀回示波器檔案系統上的檔案 (例如 save_screenshot/save_waveform 的結果)
+
+        Returns:
+            bytes: 檔案內容，失敗時為 b''
+        """
+        pass
+
+    @abstractmethod
+    def delete_file(self, filepath: str) -> bool:
+        """刪除示波器檔案系統上的檔案"""
+        pass
     
     @abstractmethod
     def set_math_function(self, expression: str) -> bool:
@@ -1,5 +1,9 @@
-from typing import List, Dict, Union, Optional, Tuple
+from datetime import datetime
+from typing import Callable, List, Dict, Union, Optional, Tuple
+import os
+import re
 import time
+import numpy as np
 from .oscilloscope_interface import (
     OscilloscopeInterface,
     TriggerMode,
@@ -7,6 +11,12 @@ from .oscilloscope_interface import (
     AcquisitionMode
 )
 
+# DATA:WIDTH -> NumPy dtype (SRIBINARY 為 little-endian 有號整數)
+WAVEFORM_DTYPES = {1: np.int8, 2: np.int16}
+
+# FastFrame 時間戳記格式，e.g., "02 Mar 2024 14:05:31.123456789012"
+FASTFRAME_TIMESTAMP = re.compile(r'(\d{1,2} \w{3} \d{4}) (\d{2}):(\d{2}):(\d{2}(?:\.\d+)?)')
+
 class TektronixMSO54B(OscilloscopeInterface):
     """Tektronix MSO54B 示波器實現"""
     
@@ -150,29 +160,168 @@ class TektronixMSO54B(OscilloscopeInterface):
     
     def get_waveform_data(self, channel: int) -> Tuple[List[float], List[float]]:
         try:
-            # 設定波形數據格式
-            self.instrument.write('DATA:SOURCE CH{channel}')
-            self.instrument.write('DATA:ENCDG SRIBINARY')
-            self.instrument.write('DATA:WIDTH 1')
-            self.instrument.write('DATA:START 1')
-            
-            # 獲取水平和垂直刻度資訊
-            x_inc = float(self.instrument.query('WFMOUTPRE:XINCR?'))
-            y_mult = float(self.instrument.query('WFMOUTPRE:YMULT?'))
-            y_off = float(self.instrument.query('WFMOUTPRE:YOFF?'))
-            y_zero = float(self.instrument.query('WFMOUTPRE:YZERO?'))
-            
-            # 讀取波形數據
-            raw_data = self.instrument.query_binary_values('CURVE?', datatype='b')
-            
+            raw_data, preamble = self.get_waveform_raw(channel)
+            if raw_data.size == 0:
+                return [], []
+
             # 轉換數據
-            voltages = [(x - y_off) * y_mult + y_zero for x in raw_data]
-            times = [i * x_inc for i in range(len(raw_data))]
+            voltages = (raw_data - preamble['y_off']) * preamble['y_mult'] + preamble['y_zero']
+            times = preamble['x_zero'] + np.arange(raw_data.size) * preamble['x_incr']
             
-            return times, voltages
+            return times.tolist(), voltages.tolist()
         except Exception as e:
             print(f"獲取波形數據失敗: {e}")
             return [], []
+
+    def _configure_waveform_source(self, channel: int, width: int) -> Tuple[int, Dict[str, float]]:
+        """設定波形數據格式，返回 (記錄長度, 刻度資訊)"""
+        self.instrument.write(f'DATA:SOURCE CH{channel}')
+        self.instrument.write('DATA:ENCDG SRIBINARY')
+        self.instrument.write(f'DATA:WIDTH {width}')
+        record_length = int(self.instrument.query('HORIZONTAL:RECORDLENGTH?'))
+        self.instrument.write('DATA:START 1')
+        self.instrument.write(f'DATA:STOP {record_length}')
+
+        # 獲取水平和垂直刻度資訊
+        preamble = {
+            'x_incr': float(self.instrument.query('WFMOUTPRE:XINCR?')),
+            'x_zero': float(self.instrument.query('WFMOUTPRE:XZERO?')),
+            'y_mult': float(self.instrument.query('WFMOUTPRE:YMULT?')),
+            'y_off': float(self.instrument.query('WFMOUTPRE:YOFF?')),
+            'y_zero': float(self.instrument.query('WFMOUTPRE:YZERO?')),
+        }
+        return record_length, preamble
+
+    def _read_curve(self, width: int) -> np.ndarray:
+        """讀取目前 DATA:START~STOP 範圍的波形 (直接放入 NumPy 陣列)"""
+        return self.instrument.query_binary_values(
+            'CURVE?',
+            datatype='b' if width == 1 else 'h',
+            is_big_endian=False,
+            container=np.array
+        )
+
+    def get_waveform_raw(self, channel: int) -> Tuple[np.ndarray, Dict[str, float]]:
+        try:
+            _, preamble = self._configure_waveform_source(channel, 1)
+            return self._read_curve(1), preamble
+        except Exception as e:
+            print(f"獲取波形數據失敗: {e}")
+            return np.array([], dtype=np.int8), {}
+
+    def stream_waveform_to_file(self, channel: int, filepath: str, chunk_points: int = 1_000_000,
+                                width: int = 1,
+                                on_progress: Optional[Callable[[int, int], None]] = None,
+                                cancel: Optional[Callable[[], bool]] = None) -> Dict:
+        was_running = False
+        try:
+            # 執行中 (RUN) 時每個 CURVE? 可能來自不同的觸發，分段下載前先停止擷取，結束後恢復
+            was_running = self.instrument.query('ACQUIRE:STATE?').strip().upper() in ('1', 'RUN', 'ON')
+            if was_running:
+                self.instrument.write('ACQUIRE:STATE STOP')
+                self.instrument.query('*OPC?')
+
+            dtype = WAVEFORM_DTYPES[width]
+            record_length, preamble = self._configure_waveform_source(channel, width)
+            samples = np.memmap(filepath, dtype=dtype, mode='w+', shape=(record_length,))
+
+            points = 0
+            try:
+                while points < record_length:
+                    if cancel and cancel():
+                        break
+                    # DATA:START/STOP 以 1 為起點且包含結束點
+                    stop = min(points + chunk_points, record_length)
+                    self.instrument.write(f'DATA:START {points + 1}')
+                    self.instrument.write(f'DATA:STOP {stop}')
+                    chunk = self._read_curve(width)
+                    samples[points:points + chunk.size] = chunk
+                    points += chunk.size
+                    if chunk.size == 0:
+                        break
+                    if on_progress:
+                        on_progress(points, record_length)
+            finally:
+                samples.flush()
+                del samples
+
+            if points < record_length:
+                os.remove(filepath)
+            return {
+                'points': points,
+                'record_length': record_length,
+                'dtype': np.dtype(dtype).name,
+                'complete': points == record_length,
+                'preamble': preamble,
+            }
+        except Exception as e:
+            print(f"分段下載波形失敗: {e}")
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            return {}
+        finally:
+            if was_running:
+                try:
+                    self.instrument.write('ACQUIRE:STATE RUN')
+                except Exception as e:
+                    print(f"恢復擷取失敗: {e}")
+
+    def configure_fastframe(self, frames: int) -> bool:
+        try:
+            if frames > 0:
+                self.instrument.write(f'HORIZONTAL:FASTFRAME:COUNT {frames}')
+                self.instrument.write('HORIZONTAL:FASTFRAME:STATE ON')
+            else:
+                self.instrument.write('HORIZONTAL:FASTFRAME:STATE OFF')
+            return True
+        except Exception as e:
+            print(f"設定FastFrame失敗: {e}")
+            return False
+
+    @staticmethod
+    def _parse_fastframe_timestamps(response: str) -> np.ndarray:
+        """將時間戳記轉為相對於第一個分段的秒數 (整數秒與小數秒分開相減以保留皮秒精度)"""
+        stamps = FASTFRAME_TIMESTAMP.findall(response)
+        if not stamps:
+            return np.empty(0)
+        first_day = datetime.strptime(stamps[0][0], '%d %b %Y')
+        whole = np.array([(datetime.strptime(day, '%d %b %Y') - first_day).days * 86400
+                          + int(h) * 3600 + int(m) * 60 + int(sec.split('.')[0])
+                          for day, h, m, sec in stamps])
+        fraction = np.array([float('0.' + sec.partition('.')[2]) if '.' in sec else 0.0
+                             for _, _, _, sec in stamps])
+        return (whole - whole[0]) + (fraction - fraction[0])
+
+    def get_fastframe_raw(self, channel: int, width: int = 1) -> Tuple[np.ndarray, np.ndarray, Dict[str, float]]:
+        try:
+            frames = int(self.instrument.query('HORIZONTAL:FASTFRAME:COUNT?'))
+            record_length, preamble = self._configure_waveform_source(channel, width)
+            self.instrument.write('DATA:FRAMESTART 1')
+            self.instrument.write(f'DATA:FRAMESTOP {frames}')
+
+            # 所有分段以單一二進位區塊傳回，依序排列
+            raw_data = self._read_curve(width)
+            frames = raw_data.size // record_length
+            raw_data = raw_data[:frames * record_length].reshape(frames, record_length)
+
+            timestamps = self._parse_fastframe_timestamps(
+                self.instrument.query(f'HORIZONTAL:FASTFRAME:TIMESTAMP:ALL:CH{channel}? 1,{frames}'))
+            return raw_data, timestamps, preamble
+        except Exception as e:
+            print(f"下載FastFrame波形失敗: {e}")
+            return np.empty((0, 0), dtype=WAVEFORM_DTYPES.get(width, np.int8)), np.empty(0), {}
+
+    def wait_for_acquisition(self, timeout: float) -> bool:
+        previous_timeout = self.instrument.timeout
+        try:
+            # 單次擷取模式下 *OPC? 會等到擷取完成才回應
+            self.instrument.timeout = int(timeout * 1000)
+            return int(self.instrument.query('*OPC?')) == 1
+        except Exception as e:
+            print(f"等待擷取完成失敗: {e}")
+            return False
+        finally:
+            self.instrument.timeout = previous_timeout
     
     def get_measurement(self, channel: int, measurement_type: str) -> float:
         try:
@@ -192,6 +341,8 @@ class TektronixMSO54B(OscilloscopeInterface):
             self.instrument.write(f'SAVE:WAVEFORM:FILEFORMAT SPREADSHEET')
             self.instrument.write(f'SAVE:WAVEFORM:SOURCELIST {channel_list}')
             self.instrument.write(f'SAVE:WAVEFORM "{filepath}"')
+            # 等待檔案寫入完成，之後才能以 read_file 讀回
+            self.instrument.query('*OPC?')
             return True
         except Exception as e:
             print(f"保存波形失敗: {e}")
@@ -201,10 +352,33 @@ class TektronixMSO54B(OscilloscopeInterface):
         try:
             self.instrument.write('SAVE:IMAGE:FILEFORMAT PNG')
             self.instrument.write(f'SAVE:IMAGE "{filepath}"')
+            self.instrument.query('*OPC?')
             return True
         except Exception as e:
             print(f"保存截圖失敗: {e}")
             return False
+
+    def read_file(self, filepath: str) -> bytes:
+        previous_termination = self.instrument.read_termination
+        try:
+            # 檔案內容以原始位元組傳回 (無區塊標頭)，讀到 EOI 為止；
+            # 二進位檔案中可能出現換行字元，讀取期間停用結束字元
+            self.instrument.read_termination = None
+            self.instrument.write(f'FILESYSTEM:READFILE "{filepath}"')
+            return self.instrument.read_raw()
+        except Exception as e:
+            print(f"讀取檔案失敗: {e}")
+            return b''
+        finally:
+            self.instrument.read_termination = previous_termination
+
+    def delete_file(self, filepath: str) -> bool:
+        try:
+            self.instrument.write(f'FILESYSTEM:DELETE "{filepath}"')
+            return True
+        except Exception as e:
+            print(f"刪除檔案失敗: {e}")
+            return False
     
     def set_math_function(self, expression: str) -> bool:
         try:
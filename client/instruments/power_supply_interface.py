@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import List, Dict, Union, Optional, Tuple
 import pyvisa
+from .scpi_metrics import instrument_session
 from enum import Enum
 
 class OutputTrackingMode(Enum):
@@ -21,7 +22,7 @@ class DCSourceInterface(ABC):
     def connect(self) -> bool:
         """連接到電源供應器"""
         try:
-            self.instrument = self.rm.open_resource(self.address)
+            self.instrument = instrument_session(self.rm.open_resource(self.address), self.address)
             self.instrument.timeout = 10000  # 10秒超時
             return True
         except Exception as e:
@@ -0,0 +1,232 @@
+import random
+import re
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 延遲直方圖的區間上限 (秒)，涵蓋 GPIB 短指令 (~1ms) 到長時間量測/檔案傳輸
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 指令標頭中的數字 (通道、記憶體編號等) 以 # 代替，避免每個通道各佔一列
+_HEADER_NUMBER = re.compile(r"\d+")
+
+
+def command_header(command: str) -> str:
+    """
+    取得 SCPI 指令的標頭作為統計分類，e.g., 'CH1:SCALE 0.5' -> 'CH#:SCALE',
+    'MEAS:VOLT? (@101)' -> 'MEAS:VOLT?'
+    """
+    header = command.strip().split(None, 1)[0] if command.strip() else ""
+    return _HEADER_NUMBER.sub("#", header.split(";", 1)[0].upper())
+
+
+class CommandStats:
+    """單一指令的呼叫次數、錯誤、傳輸位元組與延遲直方圖"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.sampled = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, elapsed: float):
+        self.sampled += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """由直方圖估計分位數 (區間內線性內插)"""
+        if not self.sampled:
+            return None
+        rank = q * self.sampled
+        cumulative = 0
+        for index, count in enumerate(self.buckets):
+            if count and cumulative + count >= rank:
+                lower = LATENCY_BUCKETS[index - 1] if index > 0 else 0.0
+                upper = LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else self.max_time
+                return min(lower + (upper - lower) * (rank - cumulative) / count, self.max_time)
+            cumulative += count
+        return self.max_time
+
+    def to_dict(self) -> Dict:
+        mean = self.total_time / self.sampled if self.sampled else None
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "sampled": self.sampled,
+            "total_time": self.total_time,
+            "mean": mean,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max_time if self.sampled else None,
+            "buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], self.buckets)),
+        }
+
+
+class ScpiMetrics:
+    """依儀器位址與指令標頭彙總的 SCPI 統計
+
+    呼叫次數、錯誤與位元組數每次都記錄；延遲只記錄取樣的呼叫 (sample_rate 為取樣比例)，
+    在高頻率輪詢時可降低計時與加鎖的開銷。
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], CommandStats] = {}
+        self._since = time.time()
+
+    def should_sample(self) -> bool:
+        return self.sample_rate >= 1.0 or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def record(self, address: str, command: str, elapsed: Optional[float], bytes_out: int = 0,
+               bytes_in: int = 0, error: bool = False):
+        """記錄一次呼叫，elapsed 為 None 表示未取樣"""
+        key = (address, command)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = CommandStats()
+            stats.count += 1
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+            if error:
+                stats.errors += 1
+            if elapsed is not None:
+                stats.observe(elapsed)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._since = time.time()
+
+    def snapshot(self, address: Optional[str] = None) -> Dict:
+        """
+        返回統計資料 (時間單位為秒)
+
+        Returns:
+            Dict: {'since', 'sample_rate', 'instruments': {位址: {指令: 統計}}}，
+            每台儀器的指令依累計時間由多到少排列
+        """
+        with self._lock:
+            entries = [(key, stats.to_dict()) for key, stats in self._stats.items()
+                       if address is None or key[0] == address]
+            since = self._since
+
+        instruments: Dict[str, Dict[str, Dict]] = {}
+        for (instrument, command), stats in sorted(entries, key=lambda entry: -entry[1]["total_time"]):
+            instruments.setdefault(instrument, {})[command] = stats
+        return {"since": since, "sample_rate": self.sample_rate, "instruments": instruments}
+
+
+# 客戶端共用的統計 (所有儀器介面基類的連線都記錄到這裡)
+scpi_metrics = ScpiMetrics()
+
+
+def _payload_size(values) -> int:
+    nbytes = getattr(values, "nbytes", None)
+    return int(nbytes) if nbytes is not None else len(values)
+
+
+class InstrumentedSession:
+    """包裝 pyvisa 連線，記錄每個 SCPI 指令的延遲、位元組數與錯誤
+
+    驅動程式照常使用 write/query 等方法；其他屬性 (timeout、read_termination、
+    wait_on_event ...) 直接轉給原本的連線。
+    """
+
+    def __init__(self, session, address: str, metrics: ScpiMetrics = scpi_metrics):
+        object.__setattr__(self, "_session", session)
+        object.__setattr__(self, "_address", address)
+        object.__setattr__(self, "_metrics", metrics)
+        # read/read_raw 的延遲歸給最後一個寫出的指令
+        object.__setattr__(self, "_last_command", "")
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._session, name, value)
+
+    @property
+    def session(self):
+        """原本的 pyvisa 連線"""
+        return self._session
+
+    def _call(self, command: str, bytes_out: int, method, *args, **kwargs):
+        sampled = self._metrics.should_sample()
+        start = time.perf_counter() if sampled else 0.0
+        try:
+            result = method(*args, **kwargs)
+        except Exception:
+            self._metrics.record(self._address, command,
+                                 time.perf_counter() - start if sampled else None, bytes_out, error=True)
+            raise
+        if isinstance(result, (str, bytes)):
+            bytes_in = len(result)
+        elif isinstance(result, (int, tuple)) or result is None:
+            bytes_in = 0
+        else:
+            bytes_in = _payload_size(result)
+        self._metrics.record(self._address, command,
+                             time.perf_counter() - start if sampled else None, bytes_out, bytes_in)
+        return result
+
+    def write(self, command: str, *args, **kwargs):
+        header = command_header(command)
+        object.__setattr__(self, "_last_command", header)
+        return self._call(header, len(command), self._session.write, command, *args, **kwargs)
+
+    def query(self, command: str, *args, **kwargs):
+        header = command_header(command)
+        object.__setattr__(self, "_last_command", header)
+        return self._call(header, len(command), self._session.query, command, *args, **kwargs)
+
+    def query_binary_values(self, command: str, *args, **kwargs):
+        header = command_header(command)
+        object.__setattr__(self, "_last_command", header)
+        return self._call(header, len(command), self._session.query_binary_values, command, *args, **kwargs)
+
+    def write_binary_values(self, command: str, values, *args, **kwargs):
+        header = command_header(command)
+        object.__setattr__(self, "_last_command", header)
+        datatype = kwargs.get("datatype", args[0] if args else "f")
+        size = len(command) + len(values) * struct.calcsize(datatype)
+        return self._call(header, size, self._session.write_binary_values, command, values, *args, **kwargs)
+
+    def read(self, *args, **kwargs):
+        return self._call(f"{self._last_command} <read>", 0, self._session.read, *args, **kwargs)
+
+    def read_raw(self, *args, **kwargs):
+        return self._call(f"{self._last_command} <read>", 0, self._session.read_raw, *args, **kwargs)
+
+    def read_stb(self):
+        return self._call("<STB>", 0, self._session.read_stb)
+
+
+def instrument_session(session, address: str) -> InstrumentedSession:
+    """以客戶端共用的統計包裝 pyvisa 連線 (供各儀器介面基類的 connect 使用)"""
+    return InstrumentedSession(session, address)
+
+
+def slowest_commands(limit: int = 20, metrics: ScpiMetrics = scpi_metrics) -> List[Dict]:
+    """依累計時間列出最耗時的指令 (跨所有儀器)"""
+    rows = []
+    for address, commands in metrics.snapshot()["instruments"].items():
+        for command, stats in commands.items():
+            rows.append({"address": address, "command": command, **stats})
+    rows.sort(key=lambda row: -row["total_time"])
+    return rows[:limit]
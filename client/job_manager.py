@@ -0,0 +1,220 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 進度事件的最短發布間隔（秒），狀態改變 (開始、完成、失敗、取消) 一律立即發布
+JOB_PROGRESS_INTERVAL = 0.1
+
+# 完成事件中直接附帶結果的大小上限 (位元組)，超過時只通知完成，由瀏覽器以 GET /jobs/{id} 讀取
+JOB_EVENT_RESULT_LIMIT = 256 * 1024
+
+# 保留的已結束工作數量
+MAX_FINISHED_JOBS = 100
+
+JOB_STATES = ("queued", "running", "done", "error", "cancelled")
+
+
+def to_json_safe(value: Any) -> Any:
+    """轉為可序列化的 JSON 值 (NumPy 陣列/數值轉為原生型別；NaN/Inf 不是合法 JSON，轉為 null)"""
+    return json.loads(json.dumps(value, default=_json_default), parse_constant=lambda _: None)
+
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+class JobCancelled(Exception):
+    """工作被取消 (執行函數可在檢查點拋出)"""
+
+
+class Job:
+    """一個在背景執行緒中執行的長時間操作"""
+
+    def __init__(self, kind: str, params: Dict, publish: Callable[[Dict], None]):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.state = "queued"
+        self.progress: Optional[float] = None
+        self.message = ""
+        self.result: Any = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._publish = publish
+        self._cancel_event = threading.Event()
+        self._cancel_callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._last_progress_time = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def cancel_event(self) -> threading.Event:
+        return self._cancel_event
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "error", "cancelled")
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """登記取消時呼叫的函數 (e.g., EfficiencySweep.cancel)，已取消時立即呼叫"""
+        with self._lock:
+            if not self._cancel_event.is_set():
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            if self._cancel_event.is_set() or self.finished:
+                return
+            self._cancel_event.set()
+            callbacks, self._cancel_callbacks = self._cancel_callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"⚠️ 取消工作 {self.id} 時發生錯誤: {e}")
+
+    def report(self, progress: Optional[float] = None, message: Optional[str] = None, **data):
+        """
+        回報進度與部分結果 (從執行函數的執行緒呼叫)
+
+        Args:
+            progress: 0~1 的完成比例
+            message: 進度說明
+            data: 部分結果 (e.g., 剛完成的量測點)，隨進度事件送出
+        """
+        if progress is not None:
+            self.progress = float(progress)
+        if message is not None:
+            self.message = message
+        now = time.monotonic()
+        if now - self._last_progress_time < JOB_PROGRESS_INTERVAL and not data:
+            return
+        self._last_progress_time = now
+        self._emit(data=data or None)
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        job = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "progress": self.progress,
+            "message": self.message,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_result:
+            job["result"] = to_json_safe(self.result)
+        return job
+
+    def _emit(self, data: Optional[Dict] = None, with_result: bool = False):
+        event = {"type": "job", **self.to_dict(include_result=False)}
+        if data:
+            event["data"] = to_json_safe(data)
+        if with_result and self.result is not None:
+            encoded = json.dumps(self.result, default=_json_default)
+            if len(encoded) <= JOB_EVENT_RESULT_LIMIT:
+                event["result"] = json.loads(encoded, parse_constant=lambda _: None)
+            else:
+                event["result_omitted"] = True
+        try:
+            self._publish(event)
+        except Exception as e:
+            logger.warning(f"⚠️ 工作事件發布失敗: {e}")
+
+    def _run(self, runner: Callable[["Job"], Any]):
+        self.state = "running"
+        self.started_at = time.time()
+        self._emit()
+        try:
+            self.result = runner(self)
+            if self.cancelled:
+                self.state = "cancelled"
+                self.message = self.message or "已取消"
+            elif isinstance(self.result, dict) and self.result.get("success") is False:
+                self.state = "error"
+                self.message = self.result.get("message", "執行失敗")
+            else:
+                self.state = "done"
+                self.progress = 1.0
+                self.message = self.result.get("message", "") if isinstance(self.result, dict) else ""
+        except JobCancelled:
+            self.state = "cancelled"
+            self.message = "已取消"
+        except Exception as e:
+            logger.error(f"❌ 工作 {self.kind} ({self.id}) 失敗: {e}")
+            self.state = "error"
+            self.message = str(e)
+        finally:
+            self.finished_at = time.time()
+            with self._lock:
+                self._cancel_callbacks.clear()
+            self._emit(with_result=True)
+
+
+class JobManager:
+    """客戶端的背景工作管理
+
+    每個工作在自己的執行緒中執行，提交後立即返回工作編號；狀態變化與進度以
+    {'type': 'job', ...} 事件經 publish 送出 (由服務器以 SSE 推送給瀏覽器)。
+    """
+
+    def __init__(self, publish: Callable[[Dict], None], max_finished: int = MAX_FINISHED_JOBS):
+        self.publish = publish
+        self.max_finished = max_finished
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, params: Dict, runner: Callable[[Job], Any]) -> Job:
+        job = Job(kind, params, self.publish)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        threading.Thread(target=job._run, args=(runner,), name=f"job-{kind}-{job.id}", daemon=True).start()
+        logger.info(f"🧵 已提交工作 {kind} ({job.id})")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def active(self, kind: str) -> Optional[Job]:
+        """返回該類型尚未結束 (且未被取消) 的工作"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.kind == kind and not job.finished and not job.cancelled:
+                    return job
+        return None
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.get(job_id)
+        if job:
+            job.cancel()
+        return job
+
+    def cancel_all(self):
+        for job in self.list():
+            job.cancel()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job_id]
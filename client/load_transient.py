@@ -0,0 +1,164 @@
+import logging
+import threading
+from typing import Callable, Dict, Optional, Union
+import numpy as np
+from instruments.eload_interface import LoadInterface
+from instruments.oscilloscope_interface import OscilloscopeInterface, TriggerMode, TriggerSlope
+from waveform_analysis import to_volts
+
+logger = logging.getLogger(__name__)
+
+# 每次負載步階輸出的特性參數
+TRANSIENT_METRICS = ("overshoot", "undershoot", "recovery_time", "ringing_frequency")
+
+
+def analyze_transient(voltage: np.ndarray, x_incr: float, trigger_index: int,
+                      band: float, settle_fraction: float = 0.1) -> Dict[str, float]:
+    """
+    以向量運算分析負載步階的 VOUT 響應
+
+    Args:
+        voltage: VOUT 波形 (V)
+        x_incr: 取樣間隔 (秒)
+        trigger_index: 觸發點 (負載步階) 的取樣位置
+        band: 判定恢復的誤差帶 (V)，VOUT 回到最終值 ±band 內視為恢復
+        settle_fraction: 以記錄尾端多少比例的平均值作為最終值
+
+    Returns:
+        Dict[str, float]: 'baseline', 'final', 'overshoot', 'undershoot' (V),
+        'recovery_time' (秒), 'ringing_frequency' (Hz，無振鈴時為 NaN)
+    """
+    trigger_index = int(np.clip(trigger_index, 1, voltage.size - 1))
+    pre = voltage[:trigger_index]
+    post = voltage[trigger_index:]
+
+    baseline = float(pre.mean())
+    tail = max(int(post.size * settle_fraction), 1)
+    final = float(post[-tail:].mean())
+
+    deviation = post - final
+    outside = np.flatnonzero(np.abs(deviation) > band)
+    recovery_samples = int(outside[-1]) + 1 if outside.size else 0
+
+    # 振鈴頻率: 對恢復前的偏差做加窗 FFT，取最大的非直流頻率成分
+    ringing_frequency = float("nan")
+    if recovery_samples >= 8:
+        segment = deviation[:recovery_samples]
+        spectrum = np.abs(np.fft.rfft((segment - segment.mean()) * np.hanning(segment.size)))
+        peak_bin = int(np.argmax(spectrum[1:])) + 1
+        if spectrum[peak_bin] > 0:
+            ringing_frequency = peak_bin / (segment.size * x_incr)
+
+    return {
+        "baseline": baseline,
+        "final": final,
+        "overshoot": max(float(post.max()) - max(baseline, final), 0.0),
+        "undershoot": max(min(baseline, final) - float(post.min()), 0.0),
+        "recovery_time": recovery_samples * x_incr,
+        "ringing_frequency": ringing_frequency,
+    }
+
+
+def aggregate_metrics(metrics: Dict[str, np.ndarray]) -> Dict[str, Dict[str, float]]:
+    """計算每個特性參數的統計值 (忽略 NaN)"""
+    statistics = {}
+    for name, values in metrics.items():
+        valid = values[~np.isnan(values)]
+        statistics[name] = {
+            "mean": float(valid.mean()) if valid.size else float("nan"),
+            "std": float(valid.std()) if valid.size else float("nan"),
+            "min": float(valid.min()) if valid.size else float("nan"),
+            "max": float(valid.max()) if valid.size else float("nan"),
+            "count": int(valid.size),
+        }
+    return statistics
+
+
+class LoadTransientTest:
+    """負載暫態特性量測
+
+    由電子負載的動態模式產生硬體計時的負載步階，示波器以單次擷取觸發在步階上，
+    下載 VOUT 後在客戶端以向量運算計算過衝、下衝、恢復時間與振鈴頻率。
+    """
+
+    def __init__(self, load: LoadInterface, scope: OscilloscopeInterface, vout_channel: int,
+                 trigger_source: Union[int, str], trigger_level: float,
+                 trigger_slope: TriggerSlope = TriggerSlope.RISING,
+                 on_step: Optional[Callable[[Dict], None]] = None):
+        """
+        Args:
+            load, scope: 已連接的儀器實例
+            vout_channel: 量測 VOUT 的示波器通道
+            trigger_source: 觸發源，通常為量測負載電流的通道
+            trigger_level: 觸發電平
+            trigger_slope: 觸發斜率 (RISING 對應負載上升步階)
+            on_step: 每完成一次擷取的回呼函數
+        """
+        self.load = load
+        self.scope = scope
+        self.vout_channel = vout_channel
+        self.trigger_source = trigger_source
+        self.trigger_level = trigger_level
+        self.trigger_slope = trigger_slope
+        self.on_step = on_step
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """要求在目前擷取完成後停止"""
+        self._cancel_event.set()
+
+    def configure(self, level1: float, level2: float, t1: float, t2: float,
+                  rise: float, fall: float) -> bool:
+        """設定動態負載步階與示波器觸發"""
+        return (self.load.configure_dynamic(level1, level2, t1, t2, rise, fall)
+                and self.scope.set_trigger_source(self.trigger_source)
+                and self.scope.set_trigger_level(self.trigger_level)
+                and self.scope.set_trigger_slope(self.trigger_slope)
+                and self.scope.set_trigger_mode(TriggerMode.NORMAL))
+
+    def capture_step(self, band: float, timeout: float = 10.0) -> Dict[str, float]:
+        """單次擷取一個負載步階並分析"""
+        if not self.scope.single_acquisition() or not self.scope.wait_for_acquisition(timeout):
+            raise TimeoutError(f"示波器在 {timeout} 秒內未觸發")
+
+        raw_data, preamble = self.scope.get_waveform_raw(self.vout_channel)
+        if raw_data.size < 2:
+            raise ValueError("無法讀取 VOUT 波形")
+
+        voltage = to_volts(raw_data, preamble, dtype=np.float64)
+        trigger_index = int(round(-preamble["x_zero"] / preamble["x_incr"]))
+        return analyze_transient(voltage, preamble["x_incr"], trigger_index, band)
+
+    def run(self, steps: int, band: float, timeout: float = 10.0) -> Dict:
+        """
+        重複擷取多個負載步階並彙總統計
+
+        Args:
+            steps: 擷取次數
+            band: 恢復誤差帶 (V)
+            timeout: 每次擷取的最長等待時間 (秒)
+
+        Returns:
+            Dict: {'metrics': {名稱: np.ndarray}, 'statistics': {名稱: {'mean', 'std', 'min', 'max', 'count'}}}
+        """
+        metrics = {name: np.full(steps, np.nan) for name in TRANSIENT_METRICS}
+        self.load.turn_on()
+        try:
+            for index in range(steps):
+                if self._cancel_event.is_set():
+                    break
+                try:
+                    result = self.capture_step(band, timeout)
+                except (TimeoutError, ValueError) as e:
+                    logger.warning(f"⚠️ 第 {index + 1} 次負載步階擷取失敗: {e}")
+                    continue
+
+                for name in TRANSIENT_METRICS:
+                    metrics[name][index] = result[name]
+                if self.on_step:
+                    self.on_step({"index": index, "progress": (index + 1) / steps, **result})
+        finally:
+            self.load.turn_off()
+            self.scope.start_acquisition()
+
+        return {"metrics": metrics, "statistics": aggregate_metrics(metrics)}
@@ -0,0 +1,248 @@
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_FILENAME = "schema.json"
+
+# 欄位名稱 -> (檔名, 磁碟上的資料型別, 記憶體緩衝區的 array 型別碼)
+COLUMNS = {
+    "timestamp": ("timestamp.f8", "<f8", "d"),
+    "series": ("series.u2", "<u2", "H"),
+    "value": ("value.f8", "<f8", "d"),
+}
+
+# 每個 session 最多的量測序列數 (series 欄位為 uint16)
+MAX_SERIES = 65535
+
+
+class MeasurementLogger:
+    """串流量測記錄器
+
+    每筆讀值以 (時間, 序列編號, 數值) 附加到一個 session 目錄中的三個欄位檔
+    (timestamp.f8、series.u2、value.f8，little-endian 原始陣列)；序列編號對應的來源與名稱
+    記錄在 schema.json 中。讀值先累積在記憶體，由背景執行緒批次寫入，並依排程 fsync，
+    呼叫 log() 的量測執行緒不需等待磁碟。讀取時以 numpy.memmap 直接載入，不需解析文字
+    (見 read_measurements / to_dataframe)。
+    """
+
+    def __init__(self, root: str, batch_size: int = 4096, flush_interval: float = 1.0,
+                 fsync_interval: float = 10.0):
+        """
+        Args:
+            root: 記錄目錄 (每次啟動建立一個以時間命名的 session 子目錄)
+            batch_size: 累積到此筆數時立即寫入
+            flush_interval: 最長寫入間隔（秒）
+            fsync_interval: fsync 間隔（秒），當機時最多遺失這段時間的讀值
+        """
+        self.root = root
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.session = time.strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(root, self.session)
+        self.records = 0
+        self.last_flush: Optional[float] = None
+        self.last_fsync: Optional[float] = None
+
+        self._lock = threading.Lock()
+        self._buffers = self._new_buffers()
+        # (來源, 名稱) -> 序列編號
+        self._series: Dict[Tuple[str, str], int] = {}
+        self._schema_written = 0
+        self._files = {}
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _new_buffers() -> Dict[str, array]:
+        return {name: array(typecode) for name, (_, _, typecode) in COLUMNS.items()}
+
+    def start(self):
+        # 同一秒內重新啟動時不附加到前一個 session (序列編號不同)
+        suffix = 1
+        while os.path.exists(self.path):
+            self.path = os.path.join(self.root, f"{self.session}-{suffix}")
+            suffix += 1
+        self.session = os.path.basename(self.path)
+        os.makedirs(self.path)
+        self._files = {name: open(os.path.join(self.path, filename), "ab")
+                       for name, (filename, _, _) in COLUMNS.items()}
+        self._write_schema()
+        self._thread = threading.Thread(target=self._run, name="measurement-logger", daemon=True)
+        self._thread.start()
+        logger.info(f"📝 量測記錄: {self.path}")
+
+    def stop(self):
+        """寫入剩餘的讀值、fsync 並關閉檔案"""
+        self._stop_event.set()
+        self._flush_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def log(self, source: str, values: Dict[str, object], timestamp: Optional[float] = None):
+        """
+        記錄一組讀值 (可從任何執行緒呼叫，不做磁碟 I/O)
+
+        Args:
+            source: 讀值來源，e.g., 'daq:GPIB0::10::INSTR'
+            values: 名稱 -> 數值 (bool 記為 0/1，非數值的欄位略過)
+            timestamp: 讀取時間 (預設為現在)
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            for name, value in values.items():
+                if not isinstance(value, (int, float, np.number)):
+                    continue
+                key = (source, str(name))
+                series = self._series.get(key)
+                if series is None:
+                    if len(self._series) >= MAX_SERIES:
+                        continue
+                    series = self._series[key] = len(self._series)
+                self._buffers["timestamp"].append(timestamp)
+                self._buffers["series"].append(series)
+                self._buffers["value"].append(float(value))
+            pending = len(self._buffers["value"])
+        if pending >= self.batch_size:
+            self._flush_event.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            pending = len(self._buffers["value"])
+            series = len(self._series)
+        return {
+            "session": self.session,
+            "path": self.path,
+            "records": self.records,
+            "pending": pending,
+            "series": series,
+            "last_flush": self.last_flush,
+            "last_fsync": self.last_fsync,
+        }
+
+    def _run(self):
+        last_fsync = time.monotonic()
+        while not self._stop_event.is_set():
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            try:
+                self._flush()
+                if time.monotonic() - last_fsync >= self.fsync_interval:
+                    self._fsync()
+                    last_fsync = time.monotonic()
+            except OSError as e:
+                logger.error(f"❌ 量測記錄寫入失敗: {e}")
+        self._flush()
+        self._fsync()
+
+    def _flush(self):
+        with self._lock:
+            buffers, self._buffers = self._buffers, self._new_buffers()
+            series_count = len(self._series)
+        count = len(buffers["value"])
+        if not count:
+            return
+
+        # 新序列先寫入 schema，讀取時不會遇到未知的序列編號
+        if series_count > self._schema_written:
+            self._write_schema()
+        for name, (_, dtype, _) in COLUMNS.items():
+            column = np.frombuffer(buffers[name], dtype=np.dtype(dtype).newbyteorder("="))
+            self._files[name].write(column.astype(dtype, copy=False).tobytes())
+            self._files[name].flush()
+        self.records += count
+        self.last_flush = time.time()
+
+    def _fsync(self):
+        for f in self._files.values():
+            os.fsync(f.fileno())
+        self.last_fsync = time.time()
+
+    def _write_schema(self):
+        with self._lock:
+            series = sorted(self._series.items(), key=lambda item: item[1])
+        schema = {
+            "format": "ate-measurements",
+            "version": 1,
+            "session": self.session,
+            "columns": [{"name": name, "file": filename, "dtype": dtype}
+                        for name, (filename, dtype, _) in COLUMNS.items()],
+            "series": [{"id": series_id, "source": source, "name": name}
+                       for (source, name), series_id in series],
+        }
+        temp_path = os.path.join(self.path, SCHEMA_FILENAME + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(schema, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, os.path.join(self.path, SCHEMA_FILENAME))
+        self._schema_written = len(series)
+
+
+def list_sessions(root: str) -> List[Dict]:
+    """列出記錄目錄中的 session (新的在前)"""
+    if not os.path.isdir(root):
+        return []
+    sessions = []
+    for session in sorted(os.listdir(root), reverse=True):
+        path = os.path.join(root, session)
+        if not os.path.isfile(os.path.join(path, SCHEMA_FILENAME)):
+            continue
+        sizes = {name: os.path.getsize(os.path.join(path, filename))
+                 for name, (filename, _, _) in COLUMNS.items()
+                 if os.path.exists(os.path.join(path, filename))}
+        records = min((size // np.dtype(COLUMNS[name][1]).itemsize for name, size in sizes.items()), default=0)
+        sessions.append({"session": session, "path": path, "records": records, "bytes": sum(sizes.values())})
+    return sessions
+
+
+def read_measurements(path: str) -> Tuple[Dict[str, np.ndarray], List[Dict]]:
+    """
+    以唯讀記憶體映射載入一個 session
+
+    Returns:
+        Tuple: ({'timestamp', 'series', 'value'} 欄位陣列, schema 中的序列列表)。
+        當機時各欄位可能只寫入部分，一律截斷到最短欄位的完整筆數。
+    """
+    with open(os.path.join(path, SCHEMA_FILENAME), encoding="utf-8") as f:
+        schema = json.load(f)
+
+    columns = {}
+    for column in schema["columns"]:
+        filepath = os.path.join(path, column["file"])
+        dtype = np.dtype(column["dtype"])
+        size = os.path.getsize(filepath) // dtype.itemsize if os.path.exists(filepath) else 0
+        columns[column["name"]] = (np.memmap(filepath, dtype=dtype, mode="r", shape=(size,))
+                                   if size else np.empty(0, dtype=dtype))
+    records = min(column.size for column in columns.values())
+    return {name: column[:records] for name, column in columns.items()}, schema["series"]
+
+
+def to_dataframe(path: str):
+    """
+    載入一個 session 為 pandas DataFrame (time, source, name, value)
+
+    source/name 為 Categorical，不會為每筆讀值複製字串。
+    """
+    import pandas as pd
+
+    columns, series = read_measurements(path)
+    series = sorted(series, key=lambda s: s["id"])
+    frame = {"time": pd.to_datetime(columns["timestamp"], unit="s")}
+    for field in ("source", "name"):
+        categories, series_codes = np.unique([s[field] for s in series], return_inverse=True)
+        frame[field] = pd.Categorical.from_codes(series_codes[columns["series"]], categories)
+    frame["value"] = columns["value"]
+    return pd.DataFrame(frame)
@@ -0,0 +1,282 @@
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+import pyvisa
+from instrument_manager import create_instrument, locked_instruments
+from settling import wait_until_stable
+
+logger = logging.getLogger(__name__)
+
+# 不允許在腳本中直接呼叫的儀器方法 (連線由引擎管理)
+RESERVED_METHODS = {"connect", "disconnect"}
+
+
+class SequenceError(Exception):
+    """測試腳本定義或執行錯誤"""
+    pass
+
+
+class SequenceEngine:
+    """客戶端本地測試序列引擎
+
+    在儀器所在的客戶端直接執行宣告式測試腳本 (recipe)，
+    每台儀器只建立一次連線，步驟之間不經過 HTTP。
+
+    Recipe 範例:
+        {
+            "instruments": {
+                "psu": {"type": "power-supply", "address": "GPIB0::6::INSTR"},
+                "daq": {"type": "daq", "address": "GPIB0::10::INSTR"}
+            },
+            "steps": [
+                {"op": "set", "instrument": "psu", "method": "set_voltage", "args": [1, 12.0]},
+                {"op": "loop", "var": "vin", "values": [10, 12, 14], "steps": [
+                    {"op": "set", "instrument": "psu", "method": "set_voltage", "args": [1, "$vin"]},
+                    {"op": "wait_settle", "instrument": "daq", "method": "read_channel",
+                     "args": ["101"], "tolerance": 0.005, "name": "vout"},
+                    {"op": "if_limit", "value": "vout", "low": 4.9, "high": 5.1,
+                     "else": [{"op": "abort", "message": "VOUT 超出範圍"}]}
+                ]}
+            ]
+        }
+
+    支援的步驟 (op): set, measure, wait_settle, delay, loop, if_limit, abort
+    """
+
+    def __init__(self, resource_manager: pyvisa.ResourceManager, recipe: Dict,
+                 on_event: Optional[Callable[[Dict], None]] = None):
+        self.rm = resource_manager
+        self.recipe = recipe
+        self.on_event = on_event
+        self.variables: Dict[str, Any] = dict(recipe.get("variables", {}))
+        self.measurements: List[Dict] = []
+        self.step_timings: List[Dict] = []
+        self._instruments: Dict[str, Any] = {}
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """要求停止執行 (在目前步驟完成後生效)"""
+        self._cancel_event.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def run(self) -> Dict:
+        """執行整個腳本
+
+        Returns:
+            Dict: {'success', 'message', 'measurements', 'timing', 'duration'}
+        """
+        start_time = time.perf_counter()
+        self._emit({"type": "start", "steps": len(self.recipe.get("steps", []))})
+
+        # 執行期間佔用腳本中的儀器，狀態輪詢與控制指令不會插入其他指令
+        addresses = [config.get("address") for config in self.recipe.get("instruments", {}).values()]
+        with locked_instruments(addresses):
+            try:
+                self._connect_instruments()
+                self._run_steps(self.recipe.get("steps", []), path="")
+                success, message = True, "測試序列執行完成"
+            except SequenceError as e:
+                success, message = False, str(e)
+            except Exception as e:
+                logger.error(f"❌ 測試序列執行失敗: {e}")
+                success, message = False, f"測試序列執行失敗: {str(e)}"
+            finally:
+                self._disconnect_instruments()
+
+        if success and self.is_cancelled:
+            success, message = False, "測試序列已取消"
+
+        result = {
+            "success": success,
+            "message": message,
+            "measurements": self.measurements,
+            "timing": self.timing_summary(),
+            "duration": round(time.perf_counter() - start_time, 6),
+        }
+        self._emit({"type": "done" if success else "error", **result})
+        return result
+
+    def timing_summary(self) -> List[Dict]:
+        """以步驟路徑彙總執行時間 (迴圈內的步驟會累計多次)"""
+        summary: Dict[str, Dict] = {}
+        for timing in self.step_timings:
+            entry = summary.setdefault(timing["path"], {
+                "path": timing["path"],
+                "op": timing["op"],
+                "count": 0,
+                "total": 0.0,
+                "max": 0.0,
+            })
+            entry["count"] += 1
+            entry["total"] += timing["duration"]
+            entry["max"] = max(entry["max"], timing["duration"])
+
+        for entry in summary.values():
+            entry["mean"] = entry["total"] / entry["count"]
+        return list(summary.values())
+
+    def _emit(self, event: Dict):
+        if self.on_event:
+            try:
+                self.on_event(event)
+            except Exception as e:
+                logger.warning(f"⚠️ 事件回呼失敗: {e}")
+
+    def _connect_instruments(self):
+        for name, config in self.recipe.get("instruments", {}).items():
+            instrument = create_instrument(self.rm, config.get("type"), config.get("address"))
+            if not instrument:
+                raise SequenceError(f"不支持的儀器 {name}: {config}")
+            if not instrument.connect():
+                raise SequenceError(f"無法連接到儀器 {name} at {config.get('address')}")
+            self._instruments[name] = instrument
+
+    def _disconnect_instruments(self):
+        for instrument in self._instruments.values():
+            try:
+                instrument.disconnect()
+            except Exception as e:
+                logger.warning(f"⚠️ 斷開儀器失敗: {e}")
+        self._instruments.clear()
+
+    def _run_steps(self, steps: List[Dict], path: str):
+        for index, step in enumerate(steps):
+            if self.is_cancelled:
+                return
+            step_path = f"{path}{index}"
+            op = step.get("op")
+            handler = getattr(self, f"_op_{op}", None)
+            if not handler:
+                raise SequenceError(f"不支持的步驟 {step_path}: {op}")
+
+            start_time = time.perf_counter()
+            result = handler(step, step_path)
+            duration = time.perf_counter() - start_time
+
+            # 巢狀步驟自行回報時間，避免 loop/if_limit 事件淹沒進度串流
+            if op in ("loop", "if_limit"):
+                continue
+
+            self.step_timings.append({"path": step_path, "op": op, "duration": duration})
+            self._emit({
+                "type": "step",
+                "path": step_path,
+                "op": op,
+                "duration": round(duration, 6),
+                "result": result,
+                "variables": dict(self.variables),
+            })
+
+    def _resolve(self, value: Any) -> Any:
+        if isinstance(value, str) and value.startswith("$"):
+            name = value[1:]
+            if name not in self.variables:
+                raise SequenceError(f"未定義的變數: {name}")
+            return self.variables[name]
+        if isinstance(value, list):
+            return [self._resolve(v) for v in value]
+        return value
+
+    def _call(self, step: Dict, step_path: str) -> Any:
+        name = step.get("instrument")
+        method_name = step.get("method", "")
+        instrument = self._instruments.get(name)
+        if instrument is None:
+            raise SequenceError(f"步驟 {step_path} 使用了未宣告的儀器: {name}")
+        if method_name.startswith("_") or method_name in RESERVED_METHODS:
+            raise SequenceError(f"步驟 {step_path} 不允許呼叫方法: {method_name}")
+
+        method = getattr(instrument, method_name, None)
+        if not callable(method):
+            raise SequenceError(f"儀器 {name} 不支持方法: {method_name}")
+
+        args = self._resolve(step.get("args", []))
+        kwargs = {k: self._resolve(v) for k, v in step.get("kwargs", {}).items()}
+        return method(*args, **kwargs)
+
+    def _op_set(self, step: Dict, step_path: str):
+        result = self._call(step, step_path)
+        # 驅動以 False 或 (False, 訊息) 表示失敗
+        if result is False or (isinstance(result, tuple) and result and result[0] is False):
+            message = result[1] if isinstance(result, tuple) and len(result) > 1 else "設定失敗"
+            raise SequenceError(f"步驟 {step_path} 失敗: {message}")
+        return result
+
+    def _op_measure(self, step: Dict, step_path: str):
+        value = self._call(step, step_path)
+        self._record(step, value)
+        return value
+
+    def _op_wait_settle(self, step: Dict, step_path: str):
+        settle = wait_until_stable(
+            lambda: float(self._call(step, step_path)),
+            tolerance=float(step.get("tolerance", 0.01)),
+            relative=bool(step.get("relative", False)),
+            samples=int(step.get("samples", 3)),
+            interval=float(step.get("interval", 0.05)),
+            timeout=float(step.get("timeout", 5.0)),
+            cancel=lambda: self.is_cancelled,
+        )
+        if not settle["settled"] and step.get("required", False):
+            raise SequenceError(f"步驟 {step_path} 在 {settle['elapsed']:.2f} 秒內未穩定")
+        self._record(step, settle["value"])
+        return settle
+
+    def _op_delay(self, step: Dict, step_path: str):
+        self._cancel_event.wait(float(self._resolve(step.get("seconds", 0))))
+        return None
+
+    def _op_loop(self, step: Dict, step_path: str):
+        if "values" in step:
+            values = self._resolve(step["values"])
+        elif "count" in step:
+            values = range(int(self._resolve(step["count"])))
+        else:
+            start = float(self._resolve(step.get("start", 0)))
+            stop = float(self._resolve(step.get("stop", 0)))
+            increment = float(self._resolve(step.get("step", 1)))
+            if increment == 0:
+                raise SequenceError(f"步驟 {step_path} 的 step 不可為 0")
+            count = int(math.floor((stop - start) / increment + 1e-9)) + 1
+            values = [start + i * increment for i in range(max(count, 0))]
+
+        var = step.get("var", "i")
+        for value in values:
+            if self.is_cancelled:
+                break
+            self.variables[var] = value
+            self._run_steps(step.get("steps", []), path=f"{step_path}.")
+        return None
+
+    def _op_if_limit(self, step: Dict, step_path: str):
+        value = self._resolve(f"${step.get('value')}")
+        low, high = step.get("low"), step.get("high")
+        passed = isinstance(value, (int, float)) and not math.isnan(value)
+        if passed and low is not None:
+            passed = value >= float(self._resolve(low))
+        if passed and high is not None:
+            passed = value <= float(self._resolve(high))
+
+        branch = "then" if passed else "else"
+        self._run_steps(step.get(branch, []), path=f"{step_path}.{branch}.")
+        return passed
+
+    def _op_abort(self, step: Dict, step_path: str):
+        raise SequenceError(step.get("message", f"測試序列於步驟 {step_path} 中止"))
+
+    def _record(self, step: Dict, value: Any):
+        name = step.get("name")
+        if not name:
+            return
+        self.variables[name] = value
+        self.measurements.append({
+            "name": name,
+            "value": value,
+            "timestamp": time.time(),
+            "variables": {k: v for k, v in self.variables.items() if k != name},
+        })
@@ -0,0 +1,189 @@
+import asyncio
+import base64
+import json
+import logging
+from typing import Dict, Optional
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+logger = logging.getLogger(__name__)
+
+# 回應內容每段的最大位元組數 (大型 JSON 或檔案分段傳送)
+TUNNEL_CHUNK_SIZE = 1024 * 1024
+
+# 重新連線的最長等待時間（秒）
+MAX_RECONNECT_DELAY = 30
+
+# 目前已建立的通道與其事件迴圈 (供其他執行緒送出事件)
+active_connection: Optional["TunnelConnection"] = None
+
+
+class TunnelConnection:
+    """在通道上執行服務器送來的 HTTP 請求
+
+    每個請求在自己的工作中直接呼叫本地的 ASGI 應用，回應標頭與內容一產生就送回服務器，
+    因此多個請求可同時進行，串流回應 (NDJSON 進度、檔案下載) 也不需要等到結束。
+    """
+
+    def __init__(self, app, websocket):
+        self.app = app
+        self.websocket = websocket
+        self.loop = asyncio.get_running_loop()
+        self._send_lock = asyncio.Lock()
+        # 請求編號 -> 服務器取消請求時設定的事件 (對 ASGI 應用而言是 http.disconnect)
+        self._disconnects: Dict[int, asyncio.Event] = {}
+        self._tasks = set()
+
+    async def _send(self, message: Dict):
+        async with self._send_lock:
+            await self.websocket.send(json.dumps(message))
+
+    async def send_event(self, event: Dict):
+        """主動送出事件 (DAQ警報、工作進度)，由服務器轉發給瀏覽器"""
+        try:
+            async with self._send_lock:
+                await self.websocket.send(json.dumps({"type": "event", "event": event}, default=str))
+        except ConnectionClosed:
+            logger.warning(f"⚠️ 通道已斷線，事件未送出: {event.get('type')}")
+
+    async def run(self):
+        try:
+            async for raw in self.websocket:
+                message = json.loads(raw)
+                if message["type"] == "request":
+                    self._disconnects[message["id"]] = asyncio.Event()
+                    task = asyncio.create_task(self.serve(message))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                elif message["type"] == "cancel" and message["id"] in self._disconnects:
+                    self._disconnects[message["id"]].set()
+        finally:
+            # 通道斷線: 讓進行中的串流回應收到 http.disconnect 並停止
+            for disconnect in self._disconnects.values():
+                disconnect.set()
+
+    async def serve(self, message: Dict):
+        request_id = message["id"]
+        disconnect = self._disconnects[request_id]
+        body = base64.b64decode(message["body"])
+        body_sent = False
+        started = False
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(event):
+            nonlocal started
+            if disconnect.is_set():
+                return
+            if event["type"] == "http.response.start":
+                started = True
+                await self._send({
+                    "id": request_id,
+                    "type": "start",
+                    "status": event["status"],
+                    "headers": [[name.decode("latin-1"), value.decode("latin-1")]
+                                for name, value in event.get("headers", [])]
+                })
+            elif event["type"] == "http.response.body":
+                content = event.get("body", b"")
+                more = event.get("more_body", False)
+                for offset in range(0, max(len(content), 1), TUNNEL_CHUNK_SIZE):
+                    chunk = content[offset:offset + TUNNEL_CHUNK_SIZE]
+                    await self._send({
+                        "id": request_id,
+                        "type": "body",
+                        "body": base64.b64encode(chunk).decode(),
+                        "more": more or offset + TUNNEL_CHUNK_SIZE < len(content)
+                    })
+
+        path = message["path"]
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": message["method"],
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": message.get("query", "").encode(),
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                        for name, value in message.get("headers", [])],
+            "client": ("tunnel", 0),
+            "server": ("tunnel", 0),
+        }
+        try:
+            await self.app(scope, receive, send)
+        except ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.error(f"❌ 通道請求 {message['method']} {path} 失敗: {e}")
+            if not started:
+                try:
+                    await send({"type": "http.response.start", "status": 500,
+                                "headers": [(b"content-type", b"application/json")]})
+                    await send({"type": "http.response.body",
+                                "body": json.dumps({"detail": str(e)}).encode()})
+                except ConnectionClosed:
+                    pass
+        finally:
+            self._disconnects.pop(request_id, None)
+
+
+async def serve_tunnel(app, url: str, ping_interval: float = 20):
+    """
+    維持與服務器的通道 (斷線後自動重新連線)
+
+    Args:
+        app: 在通道上執行請求的 ASGI 應用 (客戶端本身)
+        url: 服務器的通道位址，e.g., ws://192.168.0.10:8000/api/tunnel
+        ping_interval: WebSocket ping 間隔（秒），用於偵測斷線
+    """
+    global active_connection
+    delay = 1
+    while True:
+        try:
+            async with connect(url, ping_interval=ping_interval, ping_timeout=ping_interval,
+                               max_size=None) as websocket:
+                logger.info(f"🔗 已建立服務器通道: {url}")
+                delay = 1
+                active_connection = TunnelConnection(app, websocket)
+                try:
+                    await active_connection.run()
+                finally:
+                    active_connection = None
+            logger.warning("⚠️ 服務器通道已關閉，重新連線中...")
+        except (OSError, ConnectionClosed, asyncio.TimeoutError) as e:
+            logger.debug(f"💔 服務器通道連線失敗: {e}")
+        except Exception as e:
+            logger.warning(f"⚠️ 服務器通道錯誤: {e}")
+
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+def send_tunnel_event(event: Dict) -> bool:
+    """
+    經由通道送出事件 (可從任何執行緒呼叫，不等待送出完成；事件依呼叫順序送出)
+
+    Returns:
+        bool: 通道未建立時返回 False (呼叫者改用 HTTP 推送)
+    """
+    connection = active_connection
+    if connection is None:
+        return False
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is connection.loop:
+        connection.loop.create_task(connection.send_event(event))
+    else:
+        asyncio.run_coroutine_threadsafe(connection.send_event(event), connection.loop)
+    return True
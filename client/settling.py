@@ -0,0 +1,66 @@
+import time
+from typing import Callable, Dict, Optional, Sequence, Union
+import numpy as np
+
+Reading = Union[float, Sequence[float], np.ndarray]
+
+
+def is_within_tolerance(previous: Reading, current: Reading, tolerance: float,
+                        relative: bool = False, floor: float = 0.0) -> bool:
+    """判斷兩次讀值 (單一值或多個值) 的差異是否都在容許範圍內
+
+    Args:
+        tolerance: 容許差異 (絕對值，或 relative=True 時為比例)
+        relative: 是否使用相對容許差異
+        floor: 容許差異下限，避免讀值接近 0 時相對容許差異過小
+    """
+    previous = np.asarray(previous, dtype=float)
+    current = np.asarray(current, dtype=float)
+    limit = tolerance * np.abs(previous) if relative else np.full_like(previous, tolerance)
+    # NaN 比較結果為 False，未讀到有效值視為未穩定
+    return bool(np.all(np.abs(current - previous) <= np.maximum(limit, floor)))
+
+
+def wait_until_stable(read: Callable[[], Reading], tolerance: float, relative: bool = False,
+                      samples: int = 3, interval: float = 0.05, timeout: float = 5.0,
+                      cancel: Optional[Callable[[], bool]] = None, floor: float = 0.0) -> Dict:
+    """
+    重複讀取直到連續讀值穩定，取代固定延遲
+
+    Args:
+        read: 讀取函數，返回單一值或多個值 (多個值時全部穩定才算穩定)
+        tolerance: 容許差異 (絕對值，或 relative=True 時為比例)
+        relative: 是否使用相對容許差異
+        samples: 需要連續穩定的讀值數量
+        interval: 讀取間隔 (秒)
+        timeout: 最長等待時間 (秒)
+        cancel: 返回 True 時立即停止等待
+        floor: 容許差異下限
+
+    Returns:
+        Dict: {'value': 最後讀值, 'settled': 是否穩定, 'reads': 讀取次數, 'elapsed': 耗時(秒)}
+    """
+    start_time = time.monotonic()
+    value = read()
+    reads = 1
+    stable_count = 1
+
+    while stable_count < samples:
+        if time.monotonic() - start_time >= timeout or (cancel and cancel()):
+            break
+        if interval > 0:
+            time.sleep(interval)
+        current = read()
+        reads += 1
+        if is_within_tolerance(value, current, tolerance, relative, floor):
+            stable_count += 1
+        else:
+            stable_count = 1
+        value = current
+
+    return {
+        "value": value,
+        "settled": stable_count >= samples,
+        "reads": reads,
+        "elapsed": time.monotonic() - start_time,
+    }
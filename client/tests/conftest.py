@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+# 測試直接匯入客戶端的模組 (與 app_client.py 在同一個目錄執行時相同)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app_client  # noqa: E402
+
+# 模擬儀器的地址 (見 instrument_simulator.py)
+PSU_ADDRESS = "GPIB0::6::INSTR"
+LOAD_ADDRESS = "GPIB0::7::INSTR"
+DAQ_ADDRESS = "GPIB0::10::INSTR"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """以模擬儀器 (不延遲) 啟動的客戶端程式"""
+    monkeypatch.setitem(app_client.CLIENT_CONFIG, "simulate", True)
+    monkeypatch.setitem(app_client.CLIENT_CONFIG, "sim_latency_scale", 0.0)
+    monkeypatch.setitem(app_client.CLIENT_CONFIG, "measurement_dir", str(tmp_path / "measurements"))
+    # 服務器不存在，通道只會在背景重試
+    monkeypatch.setitem(app_client.CLIENT_CONFIG, "server_host", "127.0.0.1")
+    monkeypatch.setitem(app_client.CLIENT_CONFIG, "server_port", 9)
+    monkeypatch.setattr(app_client, "measurement_logger", None)
+    with TestClient(app_client.app) as test_client:
+        yield test_client
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import app_client
+from conftest import DAQ_ADDRESS, PSU_ADDRESS
+from instrument_manager import instrument_lock
+
+ALARM_CHANNELS = [{"channel": "101", "unit": "V", "high": 100.0, "low": None}]
+
+
+def control(client, **request):
+    response = client.post("/control", json=request)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_alarm_monitor_start_and_stop(client):
+    started = control(client, instrument_type="daq", address=DAQ_ADDRESS,
+                      action="start_alarm_monitor", value=ALARM_CHANNELS, scan_interval=0.1)
+    assert started["success"], started["message"]
+    assert list(client.get("/status").json()["alarm_monitors"]) == [DAQ_ADDRESS]
+
+    stopped = control(client, instrument_type="daq", address=DAQ_ADDRESS, action="stop_alarm_monitor")
+    assert stopped["success"], stopped["message"]
+    assert client.get("/status").json()["alarm_monitors"] == {}
+
+
+def test_daq_read_does_not_silence_alarm_monitor(client, monkeypatch):
+    events = []
+    monkeypatch.setattr(app_client, "push_event_to_server", events.append)
+
+    # 上限低於 VOUT (輸出關閉時約 0 V)，每次掃描都發出警報
+    channels = [{"channel": "101", "unit": "V", "high": -1.0, "low": None}]
+    assert control(client, instrument_type="daq", address=DAQ_ADDRESS,
+                   action="start_alarm_monitor", value=channels, scan_interval=0.05)["success"]
+    try:
+        read = control(client, instrument_type="daq", address=DAQ_ADDRESS, action="read",
+                       value=[{"channel": "102", "unit": "V"}])
+        assert read["success"], read["message"]
+
+        # MEASure? 中止了掃描，監控重新設定後繼續發出警報
+        events.clear()
+        time.sleep(0.6)
+        alarms = [event for event in events if event["type"] == "alarm"]
+        assert len(alarms) >= 3
+
+        monitor = client.get("/status").json()["alarm_monitors"][DAQ_ADDRESS]
+        assert monitor["state"] == "armed"
+        assert monitor["rearms"] >= 1
+    finally:
+        control(client, instrument_type="daq", address=DAQ_ADDRESS, action="stop_alarm_monitor")
+
+    assert events[-1] == {"type": "alarm_monitor", "address": DAQ_ADDRESS, "state": "stopped",
+                          "rearms": monitor["rearms"]}
+
+
+def test_control_waits_for_busy_instrument_off_the_event_loop(client):
+    lock = instrument_lock(PSU_ADDRESS)
+    lock_held, release = threading.Event(), threading.Event()
+
+    def hold_instrument():
+        with lock:
+            lock_held.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold_instrument)
+    holder.start()
+    lock_held.wait()
+    try:
+        pending = {}
+        waiter = threading.Thread(target=lambda: pending.update(result=control(
+            client, instrument_type="power-supply", address=PSU_ADDRESS, action="set_voltage", value="5")))
+        waiter.start()
+        time.sleep(0.2)
+
+        # 控制指令等待儀器期間，其他請求照常回應
+        start = time.monotonic()
+        assert client.get("/jobs").status_code == 200
+        assert time.monotonic() - start < 0.5
+
+        waiter.join()
+        assert not pending["result"]["success"]
+        assert "正在執行其他操作" in pending["result"]["message"]
+    finally:
+        release.set()
+        holder.join()
+
+    assert control(client, instrument_type="power-supply", address=PSU_ADDRESS,
+                   action="set_voltage", value="5")["success"]
@@ -0,0 +1,28 @@
+import asyncio
+import os
+
+from single_flight import SingleFlight
+
+CLIENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_client_and_server_copies_are_identical():
+    with open(os.path.join(CLIENT_DIR, "single_flight.py"), "rb") as client_copy, \
+            open(os.path.join(CLIENT_DIR, os.pardir, "server", "single_flight.py"), "rb") as server_copy:
+        assert client_copy.read() == server_copy.read()
+
+
+def test_concurrent_requests_share_one_operation():
+    flight = SingleFlight()
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def run_both():
+        return await asyncio.gather(flight.run("key", operation), flight.run("key", operation))
+
+    assert asyncio.run(run_both()) == [1, 1]
+    assert len(calls) == 1
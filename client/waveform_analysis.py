@@ -0,0 +1,291 @@
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+# 上升/下降時間的參考位準 (相對於 base~top)
+LOW_REFERENCE = 0.1
+HIGH_REFERENCE = 0.9
+MID_REFERENCE = 0.5
+
+# 直方圖分段大小：bincount 內部會轉成 intp，分段處理可留在 CPU 快取內
+HISTOGRAM_CHUNK = 1 << 16
+
+
+def _check_raw(raw: np.ndarray) -> np.ndarray:
+    raw = np.asarray(raw)
+    if raw.dtype.kind not in "iu" or raw.dtype.itemsize > 2:
+        raise TypeError(f"僅支援 8/16 位元整數波形緩衝區: {raw.dtype}")
+    if raw.size == 0:
+        raise ValueError("波形緩衝區為空")
+    return raw
+
+
+def to_volts(raw: np.ndarray, preamble: Dict[str, float], dtype=np.float32) -> np.ndarray:
+    """將原始取樣轉為電壓 (僅在需要完整電壓陣列時使用)"""
+    raw = _check_raw(raw)
+    scale = dtype(preamble["y_mult"])
+    offset = dtype(preamble["y_zero"] - preamble["y_off"] * preamble["y_mult"])
+    return raw.astype(dtype) * scale + offset
+
+
+def min_max_decimate(raw: np.ndarray, max_points: int) -> Tuple[np.ndarray, float]:
+    """
+    將波形抽取為最多 max_points 點用於繪圖：每段只保留最小與最大值 (窄脈衝與突波不會被抽掉)
+
+    Returns:
+        Tuple[np.ndarray, float]: (抽取後的原始取樣, 相鄰兩點間隔的原始取樣數)
+    """
+    raw = _check_raw(raw)
+    if max_points <= 0 or raw.size <= max_points:
+        return raw, 1.0
+    block = -(-raw.size // max(max_points // 2, 1))
+    blocks = raw[:raw.size // block * block].reshape(-1, block)
+    decimated = np.empty(blocks.shape[0] * 2, dtype=raw.dtype)
+    decimated[0::2] = blocks.min(axis=1)
+    decimated[1::2] = blocks.max(axis=1)
+    return decimated, block / 2
+
+
+def code_histogram(raw: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    計算原始碼值直方圖 (int8 只有 256 個碼值，int16 只有 65536 個，
+    平均、RMS、位準等統計量都可由直方圖算出，不需轉換整段記錄)
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (碼值, 出現次數)，只包含出現過的碼值，依碼值排序
+    """
+    raw = _check_raw(raw)
+    unsigned = np.dtype(f"u{raw.dtype.itemsize}")
+    unsigned_raw = raw.view(unsigned)
+    counts = np.zeros(1 << (8 * raw.dtype.itemsize), dtype=np.int64)
+    for start in range(0, unsigned_raw.size, HISTOGRAM_CHUNK):
+        counts += np.bincount(unsigned_raw[start:start + HISTOGRAM_CHUNK], minlength=counts.size)
+    codes = np.arange(counts.size, dtype=unsigned).view(raw.dtype)
+
+    present = counts > 0
+    codes, counts = codes[present], counts[present]
+    order = np.argsort(codes, kind="stable")
+    return codes[order].astype(np.int64), counts[order]
+
+
+def _to_volts_scalar(code, preamble: Dict[str, float]):
+    return (code - preamble["y_off"]) * preamble["y_mult"] + preamble["y_zero"]
+
+
+def amplitude_levels(codes: np.ndarray, counts: np.ndarray) -> Tuple[float, float]:
+    """以直方圖眾數法求 base/top 碼值 (方波的低/高位準)"""
+    middle = (codes[0] + codes[-1]) / 2
+    lower = codes <= middle
+    upper = ~lower
+    base = codes[lower][np.argmax(counts[lower])] if lower.any() else codes[0]
+    top = codes[upper][np.argmax(counts[upper])] if upper.any() else codes[-1]
+    return float(base), float(top)
+
+
+def _zone_transitions(zone: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """返回 (進入區域的第一個取樣, 離開區域前的最後一個取樣) 位置"""
+    step = np.diff(zone.view(np.int8))
+    enter = np.flatnonzero(step == 1) + 1
+    leave = np.flatnonzero(step == -1)
+    if zone[0]:
+        enter = np.concatenate(([0], enter))
+    return enter, leave
+
+
+def find_edges(raw: np.ndarray, low_code: float, high_code: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    以遲滯比較找出上升/下降邊緣 (雜訊在單一門檻附近來回不會產生多餘邊緣)
+
+    只處理進入/離開高低區域的位置，不會為整段記錄建立索引陣列。
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (上升邊緣, 下降邊緣)，每列為
+        [最後一個 <= low 的取樣位置, 第一個 >= high 的取樣位置] (下降邊緣則相反)
+    """
+    high_enter, high_leave = _zone_transitions(raw >= high_code)
+    low_enter, low_leave = _zone_transitions(raw <= low_code)
+
+    # 依位置合併進入事件，只保留區域真正改變 (低 -> 高 或 高 -> 低) 的事件
+    positions = np.concatenate((high_enter, low_enter))
+    is_high = np.concatenate((np.ones(high_enter.size, bool), np.zeros(low_enter.size, bool)))
+    order = np.argsort(positions, kind="stable")
+    positions, is_high = positions[order], is_high[order]
+    changed = np.flatnonzero(is_high[1:] != is_high[:-1]) + 1
+    if changed.size == 0:
+        empty = np.empty((0, 2), dtype=np.int64)
+        return empty, empty
+
+    entries = positions[changed]
+    rising = is_high[changed]
+    # 每個進入事件之前最後一個位於相反區域的取樣
+    previous_low = low_leave[np.searchsorted(low_leave, entries[rising]) - 1]
+    previous_high = high_leave[np.searchsorted(high_leave, entries[~rising]) - 1]
+
+    return (np.stack([previous_low, entries[rising]], axis=1),
+            np.stack([previous_high, entries[~rising]], axis=1))
+
+
+def _crossing_positions(raw: np.ndarray, start: np.ndarray, level: float) -> np.ndarray:
+    """在 start 與 start+1 之間線性內插門檻穿越的位置 (取樣單位)"""
+    if start.size == 0:
+        return start.astype(float)
+    start = np.clip(start, 0, raw.size - 2)
+    y0 = raw[start].astype(float)
+    y1 = raw[start + 1].astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(y1 != y0, (level - y0) / (y1 - y0), 0.0)
+    return start + np.clip(fraction, 0.0, 1.0)
+
+
+def transition_times(raw: np.ndarray, edges: np.ndarray, low_code: float, high_code: float,
+                     rising: bool) -> np.ndarray:
+    """計算每個邊緣的 10%-90% (或 90%-10%) 轉換時間 (取樣單位)"""
+    if edges.size == 0:
+        return np.empty(0)
+    first_level, second_level = (low_code, high_code) if rising else (high_code, low_code)
+    first = _crossing_positions(raw, edges[:, 0], first_level)
+    second = _crossing_positions(raw, edges[:, 1] - 1, second_level)
+    return second - first
+
+
+def analyze_waveform(raw: np.ndarray, preamble: Dict[str, float]) -> Dict[str, float]:
+    """
+    計算常用波形參數
+
+    Args:
+        raw: 原始整數取樣 (get_waveform_raw 的結果)
+        preamble: 刻度資訊 ('x_incr', 'y_mult', 'y_off', 'y_zero')
+
+    Returns:
+        Dict[str, float]: 'min', 'max', 'pk2pk', 'mean', 'rms', 'ac_rms', 'base', 'top', 'amplitude' (V),
+        'rise_time', 'fall_time', 'period' (秒), 'frequency' (Hz), 'duty_cycle' (0~1)；
+        無法判定的參數為 NaN
+    """
+    raw = _check_raw(raw)
+    x_incr = preamble["x_incr"]
+    y_mult = preamble["y_mult"]
+    codes, counts = code_histogram(raw)
+    total = counts.sum()
+
+    # 由直方圖計算統計量 (電壓 = a * 碼值 + b)
+    a = y_mult
+    b = preamble["y_zero"] - preamble["y_off"] * y_mult
+    code_mean = np.dot(codes, counts) / total
+    code_mean_square = np.dot(codes * codes, counts) / total
+    mean = a * code_mean + b
+    mean_square = a * a * code_mean_square + 2 * a * b * code_mean + b * b
+    code_variance = max(code_mean_square - code_mean * code_mean, 0.0)
+
+    base, top = amplitude_levels(codes, counts)
+    # y_mult 為負 (反相通道) 時最小碼值對應最高電壓，轉換後再取大小
+    low_volts, high_volts = sorted(float(_to_volts_scalar(code, preamble)) for code in (codes[0], codes[-1]))
+    base_volts, top_volts = sorted(float(_to_volts_scalar(code, preamble)) for code in (base, top))
+    result = {
+        "min": low_volts,
+        "max": high_volts,
+        "pk2pk": float((codes[-1] - codes[0]) * abs(y_mult)),
+        "mean": float(mean),
+        "rms": float(np.sqrt(max(mean_square, 0.0))),
+        "ac_rms": float(abs(a) * np.sqrt(code_variance)),
+        "base": base_volts,
+        "top": top_volts,
+        "amplitude": float((top - base) * abs(y_mult)),
+        "rise_time": float("nan"),
+        "fall_time": float("nan"),
+        "period": float("nan"),
+        "frequency": float("nan"),
+        "duty_cycle": float("nan"),
+    }
+    if top <= base:
+        return result
+
+    # y_mult 為負時碼值與電壓方向相反，邊緣方向也要對調
+    low_code = base + LOW_REFERENCE * (top - base)
+    high_code = base + HIGH_REFERENCE * (top - base)
+    rising_edges, falling_edges = find_edges(raw, low_code, high_code)
+    if y_mult < 0:
+        rising_edges, falling_edges = falling_edges, rising_edges
+
+    rise = transition_times(raw, rising_edges, low_code, high_code, rising=y_mult > 0)
+    fall = transition_times(raw, falling_edges, low_code, high_code, rising=y_mult < 0)
+    if rise.size:
+        result["rise_time"] = float(np.median(rise) * x_incr)
+    if fall.size:
+        result["fall_time"] = float(np.median(fall) * x_incr)
+
+    if rising_edges.shape[0] >= 2:
+        mid_code = base + MID_REFERENCE * (top - base)
+        rising_mid = _crossing_positions(raw, rising_edges[:, 0], mid_code)
+        cycles = rising_mid.size - 1
+        span = rising_mid[-1] - rising_mid[0]
+        if span > 0:
+            result["period"] = float(span / cycles * x_incr)
+            result["frequency"] = float(cycles / (span * x_incr))
+
+            # 在完整週期內計算高於中間位準的時間比例
+            window = raw[int(np.ceil(rising_mid[0])):int(np.ceil(rising_mid[-1]))]
+            above = np.count_nonzero(window >= mid_code) / window.size
+            result["duty_cycle"] = float(above if y_mult > 0 else 1.0 - above)
+
+    return result
+
+
+def spectrum(raw: np.ndarray, preamble: Dict[str, float], window: str = "hann",
+             nfft: Optional[int] = None, remove_dc: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    計算單邊振幅頻譜
+
+    Args:
+        raw: 原始整數取樣
+        preamble: 刻度資訊
+        window: 'hann' 或 'rect'
+        nfft: 只使用前 nfft 點 (預設使用全部)
+        remove_dc: 是否先移除直流成分
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (頻率 Hz, 振幅 V peak)
+    """
+    raw = _check_raw(raw)
+    samples = raw[:nfft] if nfft else raw
+    data = samples.astype(np.float32)
+    if remove_dc:
+        data -= data.mean(dtype=np.float64)
+
+    if window == "hann":
+        taper = np.hanning(data.size).astype(np.float32)
+        data *= taper
+        gain = taper.sum(dtype=np.float64)
+    elif window == "rect":
+        gain = float(data.size)
+    else:
+        raise ValueError(f"不支持的窗函數: {window}")
+
+    magnitude = np.abs(np.fft.rfft(data)) * (2.0 * abs(preamble["y_mult"]) / gain)
+    magnitude[0] /= 2.0
+    frequencies = np.fft.rfftfreq(data.size, d=preamble["x_incr"])
+    return frequencies, magnitude
+
+
+def frame_statistics(frames: np.ndarray, preamble: Dict[str, float]) -> Dict[str, np.ndarray]:
+    """
+    計算 FastFrame 每個分段的統計量 (沿記錄方向一次向量運算)
+
+    Args:
+        frames: 形狀為 (分段數, 記錄長度) 的原始取樣
+        preamble: 刻度資訊
+
+    Returns:
+        Dict[str, np.ndarray]: 'min', 'max', 'pk2pk', 'mean' (V)，每個分段一個值
+    """
+    frames = np.asarray(frames)
+    if frames.ndim != 2:
+        raise ValueError(f"FastFrame 緩衝區必須是 2-D: {frames.shape}")
+    _check_raw(frames)
+    low = frames.min(axis=1).astype(np.float64)
+    high = frames.max(axis=1).astype(np.float64)
+    lowest, highest = (low, high) if preamble["y_mult"] > 0 else (high, low)
+    return {
+        "min": _to_volts_scalar(lowest, preamble),
+        "max": _to_volts_scalar(highest, preamble),
+        "pk2pk": (high - low) * abs(preamble["y_mult"]),
+        "mean": _to_volts_scalar(frames.mean(axis=1, dtype=np.float64), preamble),
+    }
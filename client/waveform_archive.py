@@ -0,0 +1,151 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+INDEX_FILENAME = "index.sqlite"
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id TEXT PRIMARY KEY,
+    captured_at REAL NOT NULL,
+    instrument TEXT NOT NULL,
+    channel INTEGER NOT NULL,
+    dtype TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    preamble TEXT NOT NULL,
+    tags TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS captures_time ON captures (captured_at);
+CREATE INDEX IF NOT EXISTS captures_source ON captures (instrument, channel, captured_at);
+"""
+
+
+class WaveformArchive:
+    """客戶端波形資料庫
+
+    原始取樣以二進位檔 (<id>.bin) 儲存，讀取時以唯讀記憶體映射載入，不複製資料；
+    時間、儀器、通道、刻度資訊與標籤記錄在 SQLite 索引中，即使有數千筆記錄也能快速查詢。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, INDEX_FILENAME), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(INDEX_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def path(self, capture_id: str) -> str:
+        return os.path.join(self.root, f"{capture_id}.bin")
+
+    def reserve(self) -> Tuple[str, str]:
+        """分配新的記錄編號，返回 (編號, 檔案路徑)，供直接寫入檔案的下載使用"""
+        capture_id = uuid.uuid4().hex
+        return capture_id, self.path(capture_id)
+
+    def register(self, capture_id: str, dtype: str, points: int, preamble: Dict[str, float],
+                 instrument: str, channel: int, tags: Optional[Sequence[str]] = None,
+                 captured_at: Optional[float] = None) -> Dict:
+        """將已寫入 reserve() 路徑的檔案加入索引"""
+        entry = {
+            "id": capture_id,
+            "captured_at": captured_at if captured_at is not None else time.time(),
+            "instrument": instrument,
+            "channel": int(channel),
+            "dtype": np.dtype(dtype).name,
+            "points": int(points),
+            "preamble": preamble,
+            "tags": list(tags or []),
+        }
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO captures VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (entry["id"], entry["captured_at"], entry["instrument"], entry["channel"],
+                 entry["dtype"], entry["points"], json.dumps(entry["preamble"]), json.dumps(entry["tags"]))
+            )
+        return entry
+
+    def store(self, raw: np.ndarray, preamble: Dict[str, float], instrument: str, channel: int,
+              tags: Optional[Sequence[str]] = None, captured_at: Optional[float] = None) -> Dict:
+        """儲存一筆原始取樣 (get_waveform_raw 的結果)"""
+        capture_id, filepath = self.reserve()
+        np.ascontiguousarray(raw).tofile(filepath)
+        return self.register(capture_id, raw.dtype.name, raw.size, preamble, instrument, channel,
+                             tags, captured_at)
+
+    @staticmethod
+    def _to_entry(row: sqlite3.Row) -> Dict:
+        entry = dict(row)
+        entry["preamble"] = json.loads(entry["preamble"])
+        entry["tags"] = json.loads(entry["tags"])
+        return entry
+
+    def get(self, capture_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM captures WHERE id = ?", (capture_id,)).fetchone()
+        return self._to_entry(row) if row else None
+
+    def load(self, capture_id: str) -> Tuple[np.ndarray, Dict]:
+        """
+        以唯讀記憶體映射載入記錄 (不讀取整個檔案，只有實際存取的部分會由作業系統載入)
+
+        Returns:
+            Tuple[np.ndarray, Dict]: (原始取樣, 索引資料)
+
+        Raises:
+            KeyError: 記錄不存在
+        """
+        entry = self.get(capture_id)
+        if not entry:
+            raise KeyError(capture_id)
+        if entry["points"] == 0:
+            return np.empty(0, dtype=entry["dtype"]), entry
+        raw = np.memmap(self.path(capture_id), dtype=entry["dtype"], mode="r", shape=(entry["points"],))
+        return raw, entry
+
+    def query(self, instrument: Optional[str] = None, channel: Optional[int] = None,
+              tag: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+              limit: int = 100) -> List[Dict]:
+        """依條件查詢記錄 (依時間由新到舊)"""
+        conditions, params = [], []
+        if instrument is not None:
+            conditions.append("instrument = ?")
+            params.append(instrument)
+        if channel is not None:
+            conditions.append("channel = ?")
+            params.append(int(channel))
+        if since is not None:
+            conditions.append("captured_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("captured_at <= ?")
+            params.append(until)
+        if tag is not None:
+            conditions.append("EXISTS (SELECT 1 FROM json_each(captures.tags) WHERE value = ?)")
+            params.append(tag)
+
+        sql = "SELECT * FROM captures"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY captured_at DESC LIMIT ?"
+        params.append(int(limit))
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [self._to_entry(row) for row in rows]
+
+    def delete(self, capture_id: str) -> bool:
+        with self._lock, self._db:
+            deleted = self._db.execute("DELETE FROM captures WHERE id = ?", (capture_id,)).rowcount
+        if os.path.exists(self.path(capture_id)):
+            os.remove(self.path(capture_id))
+        return deleted > 0
@@ -1,5 +1,5 @@
-from fastapi import FastAPI, Request, HTTPException, Depends
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, HTTPException, Depends, WebSocket
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 import httpx
@@ -8,7 +8,16 @@ from typing import Dict, List, Optional
 import logging
 from datetime import datetime, timedelta
 import os
-import uuid
+import json
+import tempfile
+import ipaddress
+from server_metrics import MetricsMiddleware, server_metrics
+import client_tunnel
+from client_tunnel import ClientTunnel, LOCAL_TUNNEL_OWNER, client_tunnels, start_tunnel_relay, upstream_client
+from state_store import create_state_store
+from single_flight import SingleFlight
+from page_bundle import PageBundle
+from static_assets import StaticAssets
 
 # 設置日誌
 logging.basicConfig(level=logging.INFO)
@@ -23,16 +32,87 @@ templates = Jinja2Templates(directory=os.path.join(current_dir, "templates"))
 app.mount("/static", StaticFiles(directory=os.path.join(current_dir, "static")),
             name="static")
 
+# 含內容雜湊檔名的預先壓縮靜態檔案 (模板以 asset_url() 引用)
+static_assets = StaticAssets(os.path.join(current_dir, "static"))
+static_assets.build()
+templates.env.globals["asset_url"] = static_assets.url
 
-# 儲存客戶端信息 - 以客戶端IP為key
-clients: Dict[str, Dict] = {}
+# 主頁面與儀器面板 (依顯示順序) 組合為單一文件
+PANEL_COMPONENTS = [
+    "_panel_power_supply.html",
+    "_panel_eload.html",
+    "_panel_daq.html",
+    "_panel_scope.html",
+    "_panel_afg.html",
+]
+index_page = PageBundle(templates.env, "index.html", os.path.join(current_dir, "templates"),
+                        os.path.join(current_dir, "static", "components"), PANEL_COMPONENTS)
+
+
+# 客戶端註冊表與事件的儲存 (環境變數 ATE_STATE_STORE: memory 或 sqlite:<檔案路徑>，
+# 使用多個 worker 時必須設定為 sqlite 讓所有 worker 共用)
+# 請求處理中的單筆查詢與更新 (touch_client、update_client 等) 直接在事件迴圈上執行：
+# 以主鍵存取本機 WAL 檔案只需數十微秒，比切換執行緒更快；讀寫多筆記錄的操作
+# (清理過期客戶端、讀取事件、保存與加總統計快照) 在背景執行緒中執行，每次只在儲存的鎖內執行一次查詢，
+# 不會讓事件迴圈上的請求長時間等待
+state_store = create_state_store()
 
 # 客戶端會話超時時間（分鐘）
 SESSION_TIMEOUT = 30
 
+# 清理過期客戶端的間隔（秒）
+CLIENT_SWEEP_INTERVAL = 60
+
+# 儀器狀態的快取時間（秒），0 表示不快取 (仍會合併同時送出的相同請求)
+STATUS_CACHE_TTL = float(os.environ.get("ATE_STATUS_CACHE_TTL", "1.0"))
+
+# 同一個客戶端同時送出的偵測請求只執行一次掃描，狀態查詢另外短暫快取
+detect_flight = SingleFlight()
+status_flight = SingleFlight(ttl=STATUS_CACHE_TTL)
+
+# 多個 worker 共用狀態時，輪詢其他 worker 發布的事件的間隔（秒）
+EVENT_POLL_INTERVAL = 0.25
+
+# 多個 worker 共用狀態時，保存本行程請求統計快照的間隔（秒），/metrics 加總所有 worker 的快照
+METRICS_SYNC_INTERVAL = 5.0
+
+# 事件訂閱者 (本行程的瀏覽器 SSE 連線) - 以客戶端IP為key
+event_subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+# 每個客戶端保留的最近警報數量
+MAX_RECENT_ALARMS = 50
+
+# 效率掃描、負載暫態量測等長時間操作的轉發逾時（秒）
+LONG_OPERATION_TIMEOUT = 600
+
+# SSE 保活間隔（秒）
+EVENT_KEEPALIVE_INTERVAL = 15
+
+# 通道開啟期間更新客戶端最後見到時間的間隔（秒），閒置的客戶端不會因為超過 SESSION_TIMEOUT 而被清理
+TUNNEL_TOUCH_INTERVAL = 60
+
+# 多個 worker 共用狀態時，各 worker 通道轉送端點 (Unix socket) 所在的目錄
+WORKER_SOCKET_DIR = os.environ.get("ATE_WORKER_SOCKET_DIR", os.path.join(tempfile.gettempdir(), "ate-workers"))
+
+# 可信任的反向代理 (環境變數 ATE_TRUSTED_PROXIES: 以逗號分隔的 IP 或網段)，
+# 只有直接連線的來源是這些代理時才採用 X-Forwarded-For / X-Real-IP，避免其他主機冒用客戶端IP (例如搶走客戶端的通道)
+TRUSTED_PROXIES = [ipaddress.ip_network(proxy.strip(), strict=False)
+                   for proxy in os.environ.get("ATE_TRUSTED_PROXIES", "").split(",") if proxy.strip()]
+
+def is_trusted_proxy(host: Optional[str]) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except (TypeError, ValueError):
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
 def get_client_ip(request: Request) -> str:
-    """獲取客戶端真實IP地址"""
-    # 檢查是否通過代理
+    """獲取客戶端真實IP地址 (HTTP 請求與 WebSocket 通道使用相同的規則)"""
+    peer = request.client.host
+    # 檢查是否通過可信任的代理
+    if not is_trusted_proxy(peer):
+        return peer
+
     forwarded_for = request.headers.get("X-Forwarded-For")
     if forwarded_for:
         return forwarded_for.split(",")[0].strip()
@@ -41,59 +121,128 @@ def get_client_ip(request: Request) -> str:
     if real_ip:
         return real_ip
     
-    return request.client.host
+    return peer
 
-def cleanup_expired_clients():
-    """清理過期的客戶端"""
-    current_time = datetime.now()
-    expired_clients = []
-    
-    for client_ip, client_info in clients.items():
-        last_seen = client_info.get("last_seen")
-        if last_seen and (current_time - last_seen).total_seconds() > SESSION_TIMEOUT * 60:
-            expired_clients.append(client_ip)
-    
-    for client_ip in expired_clients:
-        del clients[client_ip]
+app.add_middleware(MetricsMiddleware, client_ip=get_client_ip)
+
+server_metrics.gauge("ate_clients", "已註冊 (未過期) 的客戶端數", lambda: state_store.count_clients())
+server_metrics.gauge("ate_connected_clients", "最近一次檢查時客戶端程式在運行的客戶端數",
+                     lambda: state_store.count_clients("connected"))
+server_metrics.gauge("ate_client_tunnels", "已建立通道的客戶端程式數", lambda: len(client_tunnels),
+                     per_process=True)
+server_metrics.gauge("ate_event_subscribers", "瀏覽器 SSE 連線數",
+                     lambda: sum(len(queues) for queues in event_subscribers.values()), per_process=True)
+
+async def cleanup_expired_clients():
+    """清理過期的客戶端 (狀態儲存依最後見到時間索引，只會處理已過期的記錄)"""
+    expired = await asyncio.to_thread(state_store.expire_clients,
+                                      datetime.now() - timedelta(minutes=SESSION_TIMEOUT))
+    for client_ip in expired:
         logger.info(f"清理過期客戶端: {client_ip}")
+    server_metrics.remove_clients(expired)
+
+async def sweep_expired_clients():
+    """定期清理過期的客戶端 (取代每個請求都掃描一次)"""
+    while True:
+        await asyncio.sleep(CLIENT_SWEEP_INTERVAL)
+        await cleanup_expired_clients()
+        if state_store.shared:
+            # 其他 worker 清理的客戶端不會出現在本行程的 expire_clients 結果中
+            clients = await asyncio.to_thread(state_store.list_clients)
+            server_metrics.sync_clients(client_info["ip"] for client_info in clients)
+
+async def relay_shared_events():
+    """讀取其他 worker 發布的事件，推送給本行程的 SSE 連線"""
+    last_event_id = await asyncio.to_thread(state_store.latest_event_id)
+    while True:
+        await asyncio.sleep(EVENT_POLL_INTERVAL)
+        if not event_subscribers:
+            # 沒有訂閱者時只推進讀取位置，不解析事件內容
+            last_event_id = await asyncio.to_thread(state_store.latest_event_id)
+            continue
+        last_event_id, events = await asyncio.to_thread(state_store.events_since, last_event_id)
+        for client_ip, event in events:
+            deliver_event(client_ip, event)
+
+async def save_metrics_snapshots():
+    """定期保存本行程的請求統計，讓抓取落在其他 worker 時也能加總"""
+    while True:
+        await asyncio.sleep(METRICS_SYNC_INTERVAL)
+        await asyncio.to_thread(state_store.save_metrics, server_metrics.snapshot())
+
+def tunnel_owner(client_ip: str) -> Optional[str]:
+    """持有該客戶端通道的 worker (轉送端點的 socket 路徑)"""
+    client_info = state_store.get_client(client_ip)
+    return client_info.get("tunnel") if client_info else None
+
+@app.on_event("startup")
+async def startup_event():
+    asyncio.create_task(sweep_expired_clients())
+    if state_store.shared:
+        asyncio.create_task(relay_shared_events())
+        asyncio.create_task(save_metrics_snapshots())
+        # 通道只存在於接受連線的 worker，其他 worker 經由轉送端點使用
+        await start_tunnel_relay(os.path.join(WORKER_SOCKET_DIR, f"worker-{os.getpid()}.sock"), tunnel_owner)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if client_tunnel.tunnel_relay is not None:
+        await client_tunnel.tunnel_relay.stop()
+    if state_store.shared:
+        state_store.save_metrics(server_metrics.snapshot())
+    state_store.close()
 
 async def check_client_connection(client_ip: str) -> bool:
     """檢查客戶端程序是否真的在運行"""
     client_url = f"http://{client_ip}:8001"
     try:
-        async with httpx.AsyncClient(timeout=2.0) as client:
+        async with upstream_client(timeout=2.0) as client:
             response = await client.get(f"{client_url}/status")
             return response.status_code == 200
     except:
         return False
 
 def get_client_info(request: Request) -> Dict:
-    """獲取當前客戶端信息"""
+    """獲取當前客戶端信息 (不存在時建立新記錄，初始狀態為 disconnected)"""
     client_ip = get_client_ip(request)
-    cleanup_expired_clients()
-    
-    if client_ip not in clients:
-        # 創建新的客戶端記錄，初始狀態為 disconnected
-        clients[client_ip] = {
-            "ip": client_ip,
-            "status": "disconnected",
-            "instruments": [],
-            "last_seen": datetime.now(),
-            "session_id": str(uuid.uuid4())[:8]
-        }
+    client_info, created = state_store.touch_client(client_ip)
+    server_metrics.register_client(client_ip)
+    if created:
         logger.info(f"新客戶端連接: {client_ip}")
-    else:
-        # 更新最後見到時間
-        clients[client_ip]["last_seen"] = datetime.now()
-    
-    return clients[client_ip]
+    return client_info
+
+def deliver_event(client_ip: str, event: Dict):
+    """將事件推送給本行程中該客戶端所有的瀏覽器訂閱者"""
+    for queue in event_subscribers.get(client_ip, []):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning(f"事件佇列已滿，丟棄事件: {client_ip}")
+
+def publish_event(client_ip: str, event: Dict):
+    """將事件推送給該客戶端所有的瀏覽器訂閱者 (包括連在其他 worker 上的)"""
+    state_store.publish_event(client_ip, event)
+    deliver_event(client_ip, event)
 
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
-    """返回主頁面"""
+    """返回主頁面 (已包含所有儀器面板，內容未變更時返回 304)"""
     # 確保客戶端記錄存在
     get_client_info(request)
-    return templates.TemplateResponse("index.html", {"request": request})
+    body, etag = index_page.render()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(body, headers=headers)
+
+@app.get("/assets/{asset_path:path}")
+async def get_static_asset(request: Request, asset_path: str):
+    """提供預先壓縮的靜態檔案 (檔名含內容雜湊，可永久快取)"""
+    response = static_assets.response(asset_path, request.headers.get("accept-encoding", ""),
+                                      request.headers.get("if-none-match"))
+    if response is None:
+        raise HTTPException(status_code=404, detail=f"找不到靜態檔案 {asset_path}")
+    return response
 
 @app.get("/api/my-status")
 async def get_my_status(request: Request):
@@ -104,36 +253,42 @@ async def get_my_status(request: Request):
     # 檢查客戶端程序是否真的在運行
     is_connected = await check_client_connection(client_ip)
     client_info["status"] = "connected" if is_connected else "disconnected"
+    state_store.update_client(client_ip, status=client_info["status"])
+    # 通道擁有者 (worker 的 socket 路徑) 只供服務器內部轉送使用
+    client_info.pop("tunnel", None)
     
     return client_info
 
-@app.post("/api/detect")
-async def detect_instruments(request: Request):
-    """偵測當前客戶端的儀器"""
-    client_info = get_client_info(request)
-    client_ip = client_info["ip"]
-    
+async def forward_detect(client_ip: str) -> Dict:
+    """請客戶端掃描儀器並更新儀器列表"""
     # 檢查客戶端是否有對應的控制程式在運行
     client_url = f"http://{client_ip}:8001"
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with upstream_client(timeout=30.0) as client:
             response = await client.post(f"{client_url}/detect")
             result = response.json()
             
             if result.get("success"):
                 # 更新客戶端的儀器列表
-                clients[client_ip]["instruments"] = result.get("instruments", [])
-                clients[client_ip]["last_seen"] = datetime.now()
+                state_store.update_client(client_ip, instruments=result.get("instruments", []))
                 return result
             else:
                 raise HTTPException(status_code=500, detail=result.get("message", "偵測失敗"))
                 
     except httpx.RequestError as e:
         logger.error(f"連接客戶端 {client_ip} 失敗: {e}")
-        error_msg = "無法連接到您的控制程式，請確認：\n1. app_client.py 正在運行\n2. 防火牆允許8001端口\n3. 網路連接正常"
+        error_msg = ("無法連接到您的控制程式，請確認：\n1. app_client.py 正在運行\n"
+                     "2. 客戶端記錄顯示「已建立服務器通道」(服務器地址與端口設定正確)\n3. 網路連接正常")
         raise HTTPException(status_code=500, detail=error_msg)
 
+@app.post("/api/detect")
+async def detect_instruments(request: Request):
+    """偵測當前客戶端的儀器 (多個分頁同時偵測時共用同一次掃描)"""
+    client_info = get_client_info(request)
+    client_ip = client_info["ip"]
+    return await detect_flight.run(client_ip, lambda: forward_detect(client_ip))
+
 @app.post("/api/control")
 async def control_instrument(request: Request):
     """控制當前客戶端的儀器"""
@@ -144,12 +299,14 @@ async def control_instrument(request: Request):
     client_url = f"http://{client_ip}:8001"
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with upstream_client(timeout=30.0) as client:
             response = await client.post(f"{client_url}/control", json=data)
             result = response.json()
             
             if result.get("success"):
-                clients[client_ip]["last_seen"] = datetime.now()
+                state_store.touch_client(client_ip)
+                # 儀器狀態已改變，之後的狀態查詢需重新讀取
+                status_flight.invalidate(lambda key: key[0] == client_ip)
                 return result
             else:
                 raise HTTPException(status_code=500, detail=result.get("message", "控制失敗"))
@@ -159,15 +316,227 @@ async def control_instrument(request: Request):
         error_msg = "無法連接到您的控制程式，請確認 app_client.py 正在運行"
         raise HTTPException(status_code=500, detail=error_msg)
 
-@app.get("/api/status")
-async def get_instrument_status(request: Request, instrument_type: str, address: str):
-    """獲取儀器的即時狀態"""
+async def relay_stream(request: Request, path: str) -> StreamingResponse:
+    """將請求轉發給當前客戶端，並轉發其 NDJSON 進度串流"""
+    client_info = get_client_info(request)
+    client_ip = client_info["ip"]
+    data = await request.json()
+    client_url = f"http://{client_ip}:8001"
+
+    client = upstream_client(timeout=httpx.Timeout(30.0, read=None))
+    try:
+        upstream = await client.send(
+            client.build_request("POST", f"{client_url}{path}", json=data),
+            stream=True
+        )
+    except httpx.RequestError as e:
+        await client.aclose()
+        logger.error(f"連接客戶端 {client_ip} 失敗: {e}")
+        raise HTTPException(status_code=500, detail="無法連接到您的控制程式，請確認 app_client.py 正在運行")
+
+    async def relay():
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            await upstream.aclose()
+            await client.aclose()
+
+    return StreamingResponse(relay(), status_code=upstream.status_code,
+                             media_type="application/x-ndjson")
+
+@app.post("/api/sequence")
+async def run_sequence(request: Request):
+    """在當前客戶端執行測試序列，並轉發進度串流"""
+    return await relay_stream(request, "/sequence")
+
+@app.post("/api/scope/record")
+async def record_scope_waveform(request: Request):
+    """在當前客戶端分段下載示波器長記錄波形，並轉發下載進度串流"""
+    return await relay_stream(request, "/scope/record")
+
+async def forward_long_operation(request: Request, path: str, failure_message: str) -> Dict:
+    """將長時間操作 (效率掃描、負載暫態量測等) 轉發給當前客戶端"""
     client_info = get_client_info(request)
     client_ip = client_info["ip"]
+    data = await request.json()
+    client_url = f"http://{client_ip}:8001"
+
+    try:
+        async with upstream_client(timeout=LONG_OPERATION_TIMEOUT) as client:
+            response = await client.post(f"{client_url}{path}", json=data)
+            result = response.json()
+
+            if result.get("success"):
+                state_store.touch_client(client_ip)
+                return result
+            else:
+                raise HTTPException(status_code=500, detail=result.get("message", failure_message))
+
+    except httpx.RequestError as e:
+        logger.error(f"連接客戶端 {client_ip} 失敗: {e}")
+        error_msg = "無法連接到您的控制程式，請確認 app_client.py 正在運行"
+        raise HTTPException(status_code=500, detail=error_msg)
+
+@app.post("/api/sweep/efficiency")
+async def efficiency_sweep(request: Request):
+    """在當前客戶端執行效率掃描"""
+    return await forward_long_operation(request, "/sweep/efficiency", "效率掃描失敗")
+
+@app.post("/api/transient")
+async def load_transient(request: Request):
+    """在當前客戶端執行負載暫態量測"""
+    return await forward_long_operation(request, "/transient", "負載暫態量測失敗")
+
+@app.post("/api/scope/analyze")
+async def analyze_scope_waveform(request: Request):
+    """在當前客戶端下載並分析示波器波形"""
+    return await forward_long_operation(request, "/scope/analyze", "波形分析失敗")
+
+@app.post("/api/scope/fastframe")
+async def fastframe_capture(request: Request):
+    """在當前客戶端執行 FastFrame 分段擷取"""
+    return await forward_long_operation(request, "/scope/fastframe", "FastFrame擷取失敗")
+
+@app.post("/api/scope/screenshot")
+async def scope_screenshot(request: Request):
+    """在當前客戶端擷取示波器截圖"""
+    return await forward_long_operation(request, "/scope/screenshot", "示波器截圖失敗")
+
+@app.post("/api/scope/files")
+async def fetch_scope_file(request: Request):
+    """由當前客戶端讀回示波器上的檔案"""
+    return await forward_long_operation(request, "/scope/files", "讀取示波器檔案失敗")
+
+async def relay_binary(request: Request, path: str) -> StreamingResponse:
+    """串流轉發客戶端的二進位回應 (檔案、波形)，並轉發 ETag 與 X-Waveform-* 等描述標頭"""
+    client_info = get_client_info(request)
+    client_url = f"http://{client_info['ip']}:8001"
+    forward_headers = {}
+    if "if-none-match" in request.headers:
+        forward_headers["If-None-Match"] = request.headers["if-none-match"]
+
+    client = upstream_client(timeout=httpx.Timeout(30.0, read=None))
+    try:
+        upstream = await client.send(
+            client.build_request("GET", f"{client_url}{path}", params=request.query_params,
+                                 headers=forward_headers),
+            stream=True
+        )
+    except httpx.RequestError as e:
+        await client.aclose()
+        logger.error(f"連接客戶端 {client_info['ip']} 失敗: {e}")
+        raise HTTPException(status_code=500, detail="無法連接到您的控制程式，請確認 app_client.py 正在運行")
+
+    headers = {name: value for name, value in upstream.headers.items()
+               if name in ("etag", "cache-control", "content-length") or name.startswith("x-waveform-")}
+
+    async def relay():
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            await upstream.aclose()
+            await client.aclose()
+
+    return StreamingResponse(relay(), status_code=upstream.status_code, headers=headers,
+                             media_type=upstream.headers.get("content-type"))
+
+@app.get("/api/scope/files/{file_id}")
+async def get_scope_file(request: Request, file_id: str):
+    """串流轉發客戶端快取的檔案，並轉發 ETag 讓瀏覽器重複檢視時不需再次下載"""
+    return await relay_binary(request, f"/scope/files/{file_id}")
+
+@app.get("/api/scope/waveform")
+async def get_scope_waveform(request: Request):
+    """下載當前客戶端示波器的波形 (float32 二進位，時間軸在 X-Waveform-* 標頭)"""
+    return await relay_binary(request, "/scope/waveform")
+
+async def forward_client_request(request: Request, method: str, path: str, failure_message: str):
+    """將一般的查詢/管理請求 (含查詢參數與 JSON 內容) 轉發給當前客戶端"""
+    client_info = get_client_info(request)
+    client_url = f"http://{client_info['ip']}:8001"
+    body = await request.json() if method == "POST" else None
+
+    try:
+        async with upstream_client(timeout=30.0) as client:
+            response = await client.request(method, f"{client_url}{path}", params=request.query_params, json=body)
+    except httpx.RequestError as e:
+        logger.error(f"連接客戶端 {client_info['ip']} 失敗: {e}")
+        raise HTTPException(status_code=500, detail="無法連接到您的控制程式，請確認 app_client.py 正在運行")
+
+    result = response.json()
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=result.get("detail", failure_message))
+    return result
+
+@app.get("/api/waveforms")
+async def list_waveforms(request: Request):
+    """查詢當前客戶端的波形資料庫"""
+    return await forward_client_request(request, "GET", "/waveforms", "波形資料庫操作失敗")
+
+@app.get("/api/waveforms/{capture_id}")
+async def get_waveform(request: Request, capture_id: str):
+    """載入當前客戶端儲存的波形"""
+    return await forward_client_request(request, "GET", f"/waveforms/{capture_id}", "波形資料庫操作失敗")
+
+@app.get("/api/waveforms/{capture_id}/binary")
+async def get_waveform_binary(request: Request, capture_id: str):
+    """以二進位載入當前客戶端儲存的波形 (繪圖用)"""
+    return await relay_binary(request, f"/waveforms/{capture_id}/binary")
+
+@app.delete("/api/waveforms/{capture_id}")
+async def delete_waveform(request: Request, capture_id: str):
+    """刪除當前客戶端儲存的波形"""
+    return await forward_client_request(request, "DELETE", f"/waveforms/{capture_id}", "波形資料庫操作失敗")
+
+@app.get("/api/metrics/scpi")
+async def get_scpi_metrics(request: Request):
+    """查詢當前客戶端的 SCPI 指令延遲統計"""
+    return await forward_client_request(request, "GET", "/metrics/scpi", "無法取得 SCPI 統計")
+
+@app.delete("/api/metrics/scpi")
+async def reset_scpi_metrics(request: Request):
+    """清除當前客戶端的 SCPI 指令延遲統計"""
+    return await forward_client_request(request, "DELETE", "/metrics/scpi", "無法清除 SCPI 統計")
+
+@app.get("/api/measurements")
+async def get_measurements(request: Request):
+    """查詢當前客戶端的量測記錄"""
+    return await forward_client_request(request, "GET", "/measurements", "無法取得量測記錄")
+
+@app.post("/api/jobs")
+async def submit_job(request: Request):
+    """在當前客戶端提交背景工作，立即返回工作編號 (進度與結果以 SSE 'job' 事件推送)"""
+    body = await request.json()
+    if body.get("kind") == "detect":
+        # 多個分頁同時提交偵測工作時只轉發一次，共用同一個工作編號
+        client_ip = get_client_info(request)["ip"]
+        return await detect_flight.run((client_ip, "job"),
+                                       lambda: forward_client_request(request, "POST", "/jobs", "提交工作失敗"))
+    return await forward_client_request(request, "POST", "/jobs", "提交工作失敗")
+
+@app.get("/api/jobs")
+async def list_jobs(request: Request):
+    """列出當前客戶端進行中與最近完成的工作"""
+    return await forward_client_request(request, "GET", "/jobs", "無法取得工作列表")
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(request: Request, job_id: str):
+    """查詢當前客戶端的工作狀態與結果"""
+    return await forward_client_request(request, "GET", f"/jobs/{job_id}", "無法取得工作狀態")
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(request: Request, job_id: str):
+    """取消當前客戶端的工作"""
+    return await forward_client_request(request, "DELETE", f"/jobs/{job_id}", "取消工作失敗")
+
+async def forward_status(client_ip: str, instrument_type: str, address: str) -> Dict:
+    """向客戶端查詢儀器狀態"""
     client_url = f"http://{client_ip}:8001"
 
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
+        async with upstream_client(timeout=5.0) as client:
             response = await client.get(
                 f"{client_url}/status", 
                 params={"instrument_type": instrument_type, "address": address}
@@ -179,10 +548,118 @@ async def get_instrument_status(request: Request, instrument_type: str, address:
         # This error is silent on the UI to avoid spamming, but logged here.
         raise HTTPException(status_code=503, detail="無法連接到客戶端控制程式")
 
+@app.get("/api/status")
+async def get_instrument_status(request: Request, instrument_type: str, address: str):
+    """獲取儀器的即時狀態 (相同的查詢合併執行，結果快取 STATUS_CACHE_TTL 秒)"""
+    client_info = get_client_info(request)
+    client_ip = client_info["ip"]
+    return await status_flight.run((client_ip, instrument_type, address),
+                                   lambda: forward_status(client_ip, instrument_type, address))
+
+def handle_client_event(client_ip: str, event: Dict):
+    """處理客戶端程式推送的事件 (經由通道或 HTTP) 並轉發給瀏覽器"""
+    if event.get("type") == "alarm":
+        state_store.append_alarm(client_ip, event, MAX_RECENT_ALARMS)
+        logger.warning(f"🚨 客戶端 {client_ip} 警報: {event}")
+    elif event.get("type") == "job" and event.get("state") == "done":
+        state_store.touch_client(client_ip)
+        if event.get("kind") == "detect" and "result" in event:
+            # 更新客戶端的儀器列表
+            state_store.update_client(client_ip, instruments=event["result"].get("instruments", []))
+
+    publish_event(client_ip, event)
+
+@app.post("/api/client-events")
+async def receive_client_event(request: Request):
+    """接收客戶端程式推送的事件 (如DAQ警報) 並轉發給瀏覽器"""
+    client_info = get_client_info(request)
+    handle_client_event(client_info["ip"], await request.json())
+    return {"success": True}
+
+@app.get("/api/events")
+async def stream_events(request: Request):
+    """以 Server-Sent Events 推送當前客戶端的事件"""
+    client_info = get_client_info(request)
+    client_ip = client_info["ip"]
+    queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+    event_subscribers.setdefault(client_ip, []).append(queue)
+
+    async def event_generator():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENT_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event.get('type', 'message')}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscribers = event_subscribers.get(client_ip, [])
+            if queue in subscribers:
+                subscribers.remove(queue)
+            if not subscribers:
+                event_subscribers.pop(client_ip, None)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus 格式的服務器統計 (請求數、各路由/各客戶端延遲、上游延遲、錯誤與活躍客戶端數)"""
+    if state_store.shared:
+        # 先保存本行程的最新數值，再加總所有 worker 的快照
+        clients = await asyncio.to_thread(state_store.list_clients)
+        server_metrics.sync_clients(client_info["ip"] for client_info in clients)
+        await asyncio.to_thread(state_store.save_metrics, server_metrics.snapshot())
+        body = server_metrics.render(await asyncio.to_thread(state_store.load_metrics))
+    else:
+        body = server_metrics.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+async def keep_tunnel_client_alive(tunnel: ClientTunnel, owner: str):
+    """通道開啟期間定期更新最後見到時間 (沒有瀏覽器操作時客戶端記錄與警報仍保留)"""
+    client_ip = tunnel.client_ip
+    while True:
+        await asyncio.sleep(TUNNEL_TOUCH_INTERVAL)
+        if client_tunnels.get(client_ip) is not tunnel:
+            return
+        _, created = state_store.touch_client(client_ip)
+        if created:
+            # 記錄已被清理，重新標記持有通道的 worker
+            server_metrics.register_client(client_ip)
+            state_store.update_client(client_ip, status="connected", tunnel=owner)
+
+@app.websocket("/api/tunnel")
+async def client_tunnel_endpoint(websocket: WebSocket):
+    """客戶端程式主動建立的持久通道，服務器經由此通道送出控制請求 (不需要連線到客戶端的 8001 端口)"""
+    client_ip = get_client_ip(websocket)
+    await websocket.accept()
+
+    tunnel = ClientTunnel(websocket, client_ip, on_event=handle_client_event)
+    client_tunnels[client_ip] = tunnel
+    # 記錄持有通道的 worker，其他 worker 的請求會轉送過來
+    relay = client_tunnel.tunnel_relay
+    owner = relay.address if relay is not None else LOCAL_TUNNEL_OWNER
+    state_store.touch_client(client_ip)
+    server_metrics.register_client(client_ip)
+    state_store.update_client(client_ip, status="connected", tunnel=owner)
+    logger.info(f"🔗 客戶端 {client_ip} 已建立通道")
+    touch_task = asyncio.create_task(keep_tunnel_client_alive(tunnel, owner))
+    try:
+        await tunnel.run()
+    finally:
+        # 客戶端重新連線時新的通道 (可能在其他 worker) 會取代舊的，只有仍是目前通道時才標記為離線
+        if client_tunnels.get(client_ip) is tunnel:
+            del client_tunnels[client_ip]
+            state_store.release_tunnel(client_ip, owner)
+        touch_task.cancel()
+        logger.info(f"🔌 客戶端 {client_ip} 通道已關閉")
+
 @app.get("/api/admin/clients")
 async def get_all_clients():
     """管理員接口：獲取所有客戶端（僅供調試使用）"""
-    cleanup_expired_clients()
+    await cleanup_expired_clients()
+    clients = await asyncio.to_thread(state_store.list_clients)
     return {
         "total_clients": len(clients),
         "clients": [
@@ -192,7 +669,7 @@ async def get_all_clients():
                 "instruments_count": len(info["instruments"]),
                 "last_seen": info["last_seen"].isoformat()
             }
-            for info in clients.values()
+            for info in clients
         ]
     }
 
@@ -201,4 +678,5 @@ if __name__ == "__main__":
     print("🚀 啟動多客戶端GPIB儀器控制服務器...")
     print("📱 請在瀏覽器中打開: http://localhost:8000")
     print("🔧 管理員接口: http://localhost:8000/api/admin/clients")
+    print("📊 統計資料: http://localhost:8000/metrics")
     uvicorn.run(app, host="0.0.0.0", port=8000)
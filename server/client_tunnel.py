@@ -0,0 +1,319 @@
+import asyncio
+import base64
+import contextlib
+import itertools
+import logging
+import os
+from typing import Callable, Dict, Optional
+import httpx
+import uvicorn
+from fastapi import WebSocket
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from starlette.websockets import WebSocketDisconnect
+from server_metrics import UpstreamTimingTransport
+
+logger = logging.getLogger(__name__)
+
+# 通道斷線時放入回應佇列的標記
+_DISCONNECTED = object()
+
+
+class ClientTunnel:
+    """客戶端程式主動建立的 WebSocket 通道
+
+    服務器以請求編號在同一條連線上同時送出多個 HTTP 請求，客戶端程式在本地的
+    FastAPI 應用上執行後以相同編號分段回傳 (回應標頭、一或多段內容)，因此 NDJSON
+    進度串流與檔案下載也能經由通道轉發。
+
+    通道訊息 (JSON，內容以 base64 編碼):
+        服務器 -> 客戶端: {'id', 'type': 'request', 'method', 'path', 'query', 'headers', 'body'}
+                          {'id', 'type': 'cancel'}
+        客戶端 -> 服務器: {'id', 'type': 'start', 'status', 'headers'}
+                          {'id', 'type': 'body', 'body', 'more'}
+                          {'type': 'event', 'event'} (客戶端主動推送的事件，交給 on_event 處理)
+    """
+
+    def __init__(self, websocket: WebSocket, client_ip: str,
+                 on_event: Optional[Callable[[str, Dict], None]] = None):
+        self.websocket = websocket
+        self.client_ip = client_ip
+        self.on_event = on_event
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Queue] = {}
+        self._closed = False
+
+    async def run(self):
+        """接收客戶端的回應直到斷線"""
+        try:
+            while True:
+                message = await self.websocket.receive_json()
+                if message.get("type") == "event":
+                    if self.on_event:
+                        self.on_event(self.client_ip, message["event"])
+                    continue
+                queue = self._pending.get(message.get("id"))
+                if queue is not None:
+                    queue.put_nowait(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._closed = True
+            for queue in self._pending.values():
+                queue.put_nowait(_DISCONNECTED)
+
+    async def _send(self, message: Dict):
+        try:
+            await self.websocket.send_json(message)
+        except (WebSocketDisconnect, RuntimeError) as e:
+            raise httpx.WriteError(f"客戶端通道已斷線: {e}")
+
+    async def _receive(self, request_id: int, timeout: Optional[float]) -> Dict:
+        try:
+            message = await asyncio.wait_for(self._pending[request_id].get(), timeout)
+        except asyncio.TimeoutError:
+            raise httpx.ReadTimeout(f"等待客戶端 {self.client_ip} 回應逾時")
+        if message is _DISCONNECTED:
+            raise httpx.ReadError(f"客戶端 {self.client_ip} 通道已斷線")
+        return message
+
+    async def handle_request(self, request: httpx.Request) -> httpx.Response:
+        """經由通道送出一個 HTTP 請求，收到回應標頭後返回 (內容以串流讀取)"""
+        if self._closed:
+            raise httpx.ConnectError(f"客戶端 {self.client_ip} 通道已斷線")
+
+        timeout = request.extensions.get("timeout", {}).get("read")
+        request_id = next(self._ids)
+        self._pending[request_id] = asyncio.Queue()
+        body = await request.aread()
+        try:
+            await self._send({
+                "id": request_id,
+                "type": "request",
+                "method": request.method,
+                "path": request.url.path,
+                "query": request.url.query.decode(),
+                "headers": [[name, value] for name, value in request.headers.items()
+                            if name not in ("host", "content-length", "transfer-encoding")],
+                "body": base64.b64encode(body).decode()
+            })
+            start = await self._receive(request_id, timeout)
+        except BaseException:
+            self._pending.pop(request_id, None)
+            raise
+
+        return httpx.Response(
+            start["status"],
+            headers=start["headers"],
+            stream=TunnelByteStream(self, request_id, timeout),
+            request=request
+        )
+
+    async def cancel(self, request_id: int):
+        """串流未讀完就關閉時通知客戶端 (相當於中斷 HTTP 連線)"""
+        if self._pending.pop(request_id, None) is not None and not self._closed:
+            try:
+                await self._send({"id": request_id, "type": "cancel"})
+            except httpx.WriteError:
+                pass
+
+
+class TunnelByteStream(httpx.AsyncByteStream):
+    """從通道讀取一個回應的內容"""
+
+    def __init__(self, tunnel: ClientTunnel, request_id: int, timeout: Optional[float]):
+        self.tunnel = tunnel
+        self.request_id = request_id
+        self.timeout = timeout
+        self._finished = False
+
+    async def __aiter__(self):
+        while not self._finished:
+            message = await self.tunnel._receive(self.request_id, self.timeout)
+            self._finished = not message.get("more")
+            if message.get("body"):
+                yield base64.b64decode(message["body"])
+        self.tunnel._pending.pop(self.request_id, None)
+
+    async def aclose(self):
+        if not self._finished:
+            self._finished = True
+            await self.tunnel.cancel(self.request_id)
+
+
+# 本行程中已建立通道的客戶端 - 以客戶端IP為key
+client_tunnels: Dict[str, ClientTunnel] = {}
+
+# 單一行程 (未啟用轉送) 時記錄在狀態儲存中的通道擁有者
+LOCAL_TUNNEL_OWNER = "local"
+
+# 轉送請求的讀取逾時（秒）與轉送結果的標頭
+RELAY_TIMEOUT_HEADER = "x-ate-relay-timeout"
+RELAY_MISSING_HEADER = "x-ate-relay-missing"
+RELAY_ERROR_HEADER = "x-ate-relay-error"
+
+# 轉送請求時不複製的標頭
+_HOP_HEADERS = ("host", "content-length", "transfer-encoding", "connection")
+
+
+async def _relay_endpoint(request: Request) -> Response:
+    """經由本行程的通道送出其他 worker 轉送來的請求，並串流回傳回應"""
+    client_ip = request.path_params["client_ip"]
+    tunnel = client_tunnels.get(client_ip)
+    if tunnel is None:
+        return Response(status_code=404, headers={RELAY_MISSING_HEADER: "1"})
+
+    timeout = request.headers.get(RELAY_TIMEOUT_HEADER)
+    url = f"http://{client_ip}:8001/{request.path_params['path']}"
+    if request.url.query:
+        url += f"?{request.url.query}"
+    upstream_request = httpx.Request(
+        request.method, url,
+        headers=[(name, value) for name, value in request.headers.items()
+                 if name not in _HOP_HEADERS and not name.startswith("x-ate-relay-")],
+        content=await request.body(),
+        extensions={"timeout": {"read": float(timeout) if timeout else None}}
+    )
+    try:
+        upstream = await tunnel.handle_request(upstream_request)
+    except httpx.HTTPError as e:
+        return Response(str(e), status_code=502, headers={RELAY_ERROR_HEADER: type(e).__name__})
+
+    async def body():
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            await upstream.aclose()
+
+    headers = {name: value for name, value in upstream.headers.items() if name not in ("transfer-encoding", "connection")}
+    return StreamingResponse(body(), status_code=upstream.status_code, headers=headers)
+
+
+relay_app = Starlette(routes=[
+    Route("/{client_ip}/{path:path}", _relay_endpoint, methods=["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD"])
+])
+
+
+class _RelayServer(uvicorn.Server):
+    """與主服務器共用事件迴圈的轉送服務，訊號由主服務器處理"""
+
+    @contextlib.contextmanager
+    def capture_signals(self):
+        yield
+
+
+class TunnelRelay:
+    """多個 worker 時，將請求轉送給持有該客戶端通道的 worker
+
+    WebSocket 通道只存在於接受連線的 worker 中。每個 worker 在本機的 Unix socket 上提供轉送端點，
+    建立通道時把 socket 路徑記錄在共用的狀態儲存 (客戶端記錄的 'tunnel')；其他 worker 找不到本地通道時
+    查詢擁有者並經由該 socket 轉送，不會退回連線到客戶端的 8001 端口。
+    """
+
+    def __init__(self, address: str, lookup_owner: Callable[[str], Optional[str]]):
+        """
+        Args:
+            address: 本 worker 轉送端點的 Unix socket 路徑
+            lookup_owner: 客戶端IP -> 持有通道的 worker 的 socket 路徑 (無通道時為 None)
+        """
+        self.address = address
+        self.lookup_owner = lookup_owner
+        self._transports: Dict[str, httpx.AsyncHTTPTransport] = {}
+        self._server: Optional[_RelayServer] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        os.makedirs(os.path.dirname(self.address), exist_ok=True)
+        config = uvicorn.Config(relay_app, uds=self.address, lifespan="off", log_level="warning",
+                                access_log=False, ws="none")
+        self._server = _RelayServer(config)
+        self._task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            if self._task.done():
+                # 啟動失敗時拋出原本的例外
+                self._task.result()
+                raise RuntimeError(f"通道轉送服務未能啟動: {self.address}")
+            await asyncio.sleep(0.01)
+        logger.info(f"🔀 通道轉送端點: {self.address}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            await self._task
+        for transport in self._transports.values():
+            await transport.aclose()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.address)
+
+    async def forward(self, request: httpx.Request) -> Optional[httpx.Response]:
+        """
+        將請求轉送給持有通道的 worker
+
+        Returns:
+            Optional[httpx.Response]: 回應 (內容以串流讀取)；沒有其他 worker 持有通道時為 None
+        """
+        client_ip = request.url.host
+        owner = self.lookup_owner(client_ip)
+        if not owner or owner in (self.address, LOCAL_TUNNEL_OWNER):
+            return None
+
+        transport = self._transports.get(owner)
+        if transport is None:
+            transport = self._transports[owner] = httpx.AsyncHTTPTransport(uds=owner)
+        timeout = request.extensions.get("timeout", {})
+        headers = [(name, value) for name, value in request.headers.multi_items() if name not in _HOP_HEADERS]
+        if timeout.get("read") is not None:
+            headers.append((RELAY_TIMEOUT_HEADER, str(timeout["read"])))
+        relay_request = httpx.Request(
+            request.method, f"http://worker/{client_ip}{request.url.raw_path.decode()}",
+            headers=headers, content=await request.aread(), extensions={"timeout": timeout}
+        )
+        try:
+            response = await transport.handle_async_request(relay_request)
+        except httpx.ConnectError:
+            # 持有通道的 worker 已結束 (客戶端重新連線後會記錄新的擁有者)
+            return None
+
+        if response.headers.get(RELAY_MISSING_HEADER):
+            await response.aclose()
+            return None
+        error = response.headers.get(RELAY_ERROR_HEADER)
+        if error:
+            message = (await response.aread()).decode(errors="replace")
+            await response.aclose()
+            raise (httpx.ReadTimeout if error == "ReadTimeout" else httpx.ReadError)(message)
+        return response
+
+
+# 本行程的通道轉送 (多個 worker 共用狀態時由 app_server 啟動)
+tunnel_relay: Optional[TunnelRelay] = None
+
+
+async def start_tunnel_relay(address: str, lookup_owner: Callable[[str], Optional[str]]) -> TunnelRelay:
+    global tunnel_relay
+    relay = TunnelRelay(address, lookup_owner)
+    await relay.start()
+    tunnel_relay = relay
+    return relay
+
+
+class TunnelTransport(httpx.AsyncHTTPTransport):
+    """有通道時經由通道送出請求 (通道在其他 worker 時經由該 worker 轉送)，否則照舊連線到客戶端程式的 8001 端口"""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        tunnel = client_tunnels.get(request.url.host)
+        if tunnel is not None:
+            return await tunnel.handle_request(request)
+        if tunnel_relay is not None:
+            response = await tunnel_relay.forward(request)
+            if response is not None:
+                return response
+        return await super().handle_async_request(request)
+
+
+def upstream_client(**kwargs) -> httpx.AsyncClient:
+    """建立轉發到客戶端程式用的 httpx 連線 (優先使用通道，並記錄上游延遲)"""
+    return httpx.AsyncClient(transport=UpstreamTimingTransport(TunnelTransport()), **kwargs)
@@ -0,0 +1,52 @@
+import hashlib
+import logging
+import os
+from typing import List, Tuple
+from jinja2 import Environment
+
+logger = logging.getLogger(__name__)
+
+
+class PageBundle:
+    """將儀器面板元件組合進主頁面，只在檔案變更時重新產生
+
+    瀏覽器只需要下載一次主頁面就能開始操作 (不再逐一下載 _panel_*.html)；
+    頁面內容的雜湊作為 ETag，未變更時返回 304。
+    """
+
+    def __init__(self, env: Environment, template_name: str, template_dir: str,
+                 components_dir: str, components: List[str]):
+        """
+        Args:
+            env: 主頁面模板所在的 Jinja 環境
+            template_name: 主頁面模板名稱
+            template_dir: 主頁面模板所在目錄 (檢查檔案變更用)
+            components_dir: 面板元件目錄
+            components: 依顯示順序排列的面板元件檔名
+        """
+        self.env = env
+        self.template_name = template_name
+        self.paths = [os.path.join(template_dir, template_name)] + \
+                     [os.path.join(components_dir, name) for name in components]
+        self.components = self.paths[1:]
+        self._mtimes: Tuple[float, ...] = ()
+        self._body = b""
+        self._etag = ""
+
+    def _current_mtimes(self) -> Tuple[float, ...]:
+        return tuple(os.stat(path).st_mtime_ns for path in self.paths)
+
+    def render(self) -> Tuple[bytes, str]:
+        """返回組合後的頁面內容與 ETag (檔案有變更時重新產生)"""
+        mtimes = self._current_mtimes()
+        if mtimes != self._mtimes:
+            panels = []
+            for path in self.components:
+                with open(path, encoding="utf-8") as f:
+                    panels.append(f.read())
+            html = self.env.get_template(self.template_name).render(panels="".join(panels))
+            self._body = html.encode("utf-8")
+            self._etag = f'"{hashlib.sha256(self._body).hexdigest()[:16]}"'
+            self._mtimes = mtimes
+            logger.info(f"📦 已組合主頁面 ({len(self.components)} 個面板，{len(self._body)} bytes)")
+        return self._body, self._etag
@@ -0,0 +1,282 @@
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import httpx
+from starlette.requests import Request
+
+# 延遲直方圖的區間上限 (秒)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 120.0, 600.0)
+
+# 其他 worker 的快照超過此時間 (秒) 未更新時，不計入其行程內的即時數值 (該 worker 可能已結束)
+SNAPSHOT_GAUGE_TTL = 30.0
+
+# 不在客戶端註冊表中的來源IP合併為同一個標籤值 (X-Forwarded-For 可由呼叫端任意設定，
+# 逐一標記會讓序列數量無上限)
+UNREGISTERED_CLIENT = "unregistered"
+
+# 目前請求累計的上游 (客戶端代理) 時間，由 MetricsMiddleware 為每個請求建立
+_upstream_time: ContextVar[Optional[List[float]]] = ContextVar("upstream_time", default=None)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{name}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Histogram:
+    """Prometheus 格式的延遲直方圖 (依標籤分組)"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        # 標籤值 -> [各區間計數..., +Inf 計數, 總和]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                series[index] += 1
+                break
+        else:
+            series[len(LATENCY_BUCKETS)] += 1
+        series[-1] += value
+
+    def remove(self, *label_values: str):
+        self._series.pop(label_values, None)
+
+    def export(self) -> List[List[Any]]:
+        return [[list(label_values), list(series)] for label_values, series in self._series.items()]
+
+    @staticmethod
+    def merge(total: List[float], series: List[float]) -> List[float]:
+        return [a + b for a, b in zip(total, series)]
+
+    def render(self, series_by_labels: Optional[Dict[Tuple[str, ...], List[float]]] = None) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        series_by_labels = self._series if series_by_labels is None else series_by_labels
+        for label_values, series in series_by_labels.items():
+            labels = tuple(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, count in zip([*map(str, LATENCY_BUCKETS), "+Inf"], series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Prometheus 格式的計數器 (依標籤分組)"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series: Dict[Tuple[str, ...], int] = {}
+
+    def inc(self, *label_values: str):
+        self._series[label_values] = self._series.get(label_values, 0) + 1
+
+    def remove(self, *label_values: str):
+        self._series.pop(label_values, None)
+
+    def export(self) -> List[List[Any]]:
+        return [[list(label_values), value] for label_values, value in self._series.items()]
+
+    @staticmethod
+    def merge(total: int, value: int) -> int:
+        return total + value
+
+    def render(self, series_by_labels: Optional[Dict[Tuple[str, ...], int]] = None) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        series_by_labels = self._series if series_by_labels is None else series_by_labels
+        for label_values, value in series_by_labels.items():
+            lines.append(f"{self.name}{_format_labels(tuple(zip(self.label_names, label_values)))} {value}")
+        return lines
+
+
+class ServerMetrics:
+    """服務器的請求統計
+
+    所有更新都在事件迴圈的執行緒中進行 (中介層與 httpx 傳輸層)，不需要加鎖；
+    抓取時只把現有的數值格式化成文字，不影響請求路徑。
+    'client' 標籤只使用已註冊的客戶端IP，客戶端過期時刪除其序列，序列數量不超過註冊表大小。
+
+    多個 worker 時每個 worker 只有自己處理的請求，各自以 snapshot() 保存到共用的狀態儲存，
+    抓取時以 render(snapshots) 加總所有 worker 的快照，不論抓取落在哪個 worker，計數器都不會倒退。
+    """
+
+    def __init__(self):
+        self.requests = Counter("ate_http_requests_total", "依路由、方法與狀態碼的請求數",
+                                ("route", "method", "status"))
+        self.request_duration = Histogram("ate_http_request_duration_seconds",
+                                          "請求到回應標頭送出的時間", ("route",))
+        self.client_duration = Histogram("ate_client_request_duration_seconds",
+                                         "依瀏覽器來源IP的請求時間", ("client",))
+        self.server_overhead = Histogram("ate_server_overhead_seconds",
+                                         "請求時間扣除等待客戶端程式的時間", ("route",))
+        self.upstream_duration = Histogram("ate_upstream_request_duration_seconds",
+                                           "轉發到客戶端程式 (app_client.py) 的時間", ("client",))
+        self.upstream_errors = Counter("ate_upstream_errors_total", "無法連接客戶端程式或逾時的次數",
+                                       ("client",))
+        self._metrics = (self.requests, self.request_duration, self.client_duration,
+                         self.server_overhead, self.upstream_duration, self.upstream_errors)
+        self._client_metrics = (self.client_duration, self.upstream_duration, self.upstream_errors)
+        # (名稱, 說明, 讀取函數, 是否為行程內的數值 (需要加總各 worker))
+        self._gauges: List[Tuple[str, str, Callable[[], float], bool]] = []
+        self._clients: Set[str] = set()
+        self.started_at = time.time()
+
+    def client_label(self, client_ip: str) -> str:
+        return client_ip if client_ip in self._clients else UNREGISTERED_CLIENT
+
+    def register_client(self, client_ip: str):
+        """允許以此IP作為 'client' 標籤 (客戶端已加入註冊表)"""
+        self._clients.add(client_ip)
+
+    def remove_clients(self, client_ips: Iterable[str]):
+        """刪除已過期客戶端的序列"""
+        for client_ip in client_ips:
+            self._clients.discard(client_ip)
+            for metric in self._client_metrics:
+                metric.remove(client_ip)
+
+    def sync_clients(self, client_ips: Iterable[str]):
+        """以註冊表的內容取代已知的客戶端 (其他 worker 清理的客戶端也會被刪除)"""
+        registered = set(client_ips)
+        self.remove_clients(self._clients - registered)
+        self._clients = registered
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float], per_process: bool = False):
+        """
+        登記抓取時才計算的即時數值
+
+        Args:
+            per_process: 數值只屬於本行程 (e.g., SSE 連線數)，多個 worker 時加總各 worker 快照中的數值；
+                         否則由共用的狀態儲存讀取 (e.g., 註冊客戶端數)
+        """
+        self._gauges.append((name, help_text, read, per_process))
+
+    def snapshot(self) -> Dict:
+        """本行程的統計快照 (可 JSON 序列化)"""
+        return {
+            "updated_at": time.time(),
+            "metrics": {metric.name: metric.export() for metric in self._metrics},
+            "gauges": {name: read() for name, _, read, per_process in self._gauges if per_process},
+        }
+
+    def render(self, snapshots: Optional[List[Dict]] = None) -> str:
+        """
+        輸出 Prometheus 文字格式
+
+        Args:
+            snapshots: 所有 worker 的快照 (含本行程)，未指定時只輸出本行程的統計
+        """
+        lines = []
+        for metric in self._metrics:
+            if snapshots is None:
+                lines.extend(metric.render())
+                continue
+            merged = {}
+            for snapshot in snapshots:
+                for label_values, value in snapshot["metrics"].get(metric.name, []):
+                    key = tuple(label_values)
+                    merged[key] = metric.merge(merged[key], value) if key in merged else value
+            if metric in self._client_metrics:
+                # 已結束的 worker 的快照中可能仍有已過期的客戶端
+                merged = {key: value for key, value in merged.items()
+                          if key[0] in self._clients or key[0] == UNREGISTERED_CLIENT}
+            lines.extend(metric.render(merged))
+
+        now = time.time()
+        for name, help_text, read, per_process in self._gauges:
+            if per_process and snapshots is not None:
+                value = sum(snapshot["gauges"].get(name, 0) for snapshot in snapshots
+                            if now - snapshot["updated_at"] <= SNAPSHOT_GAUGE_TTL)
+            else:
+                value = read()
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        lines += ["# HELP ate_uptime_seconds 服務器運行時間", "# TYPE ate_uptime_seconds gauge",
+                  f"ate_uptime_seconds {time.time() - self.started_at:.3f}"]
+        return "\n".join(lines) + "\n"
+
+
+server_metrics = ServerMetrics()
+
+
+class UpstreamTimingTransport(httpx.AsyncBaseTransport):
+    """記錄轉發到客戶端程式的時間 (到收到回應標頭為止) 與連線錯誤"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        client = server_metrics.client_label(request.url.host)
+        start = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except httpx.HTTPError:
+            server_metrics.upstream_errors.inc(client)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            server_metrics.upstream_duration.observe(elapsed, client)
+            upstream_time = _upstream_time.get()
+            if upstream_time is not None:
+                upstream_time[0] += elapsed
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class MetricsMiddleware:
+    """ASGI 中介層: 依路由與來源IP記錄請求數與延遲
+
+    延遲量測到回應標頭送出為止，串流回應 (NDJSON、SSE) 的傳輸時間不計入。
+    """
+
+    def __init__(self, app, client_ip: Callable[[Request], str]):
+        self.app = app
+        self.client_ip = client_ip
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        upstream_time = [0.0]
+        token = _upstream_time.set(upstream_time)
+        status = {"code": 500, "observed": False}
+
+        def observe():
+            status["observed"] = True
+            elapsed = time.perf_counter() - start
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            server_metrics.requests.inc(route, scope["method"], str(status["code"]))
+            server_metrics.request_duration.observe(elapsed, route)
+            server_metrics.client_duration.observe(elapsed, server_metrics.client_label(self.client_ip(Request(scope))))
+            server_metrics.server_overhead.observe(max(elapsed - upstream_time[0], 0.0), route)
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                observe()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        except Exception:
+            if not status["observed"]:
+                observe()
+            raise
+        finally:
+            _upstream_time.reset(token)
@@ -0,0 +1,60 @@
+# client/ 與 server/ 各有一份內容相同的 single_flight.py：服務器映像只以 server/ 目錄建置，
+# 客戶端在測試台上單獨從 client/ 目錄執行，兩者沒有共用的套件路徑。
+# 修改時兩份一起更新 (client/tests/test_single_flight.py 檢查內容一致)
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlight:
+    """合併相同的並行請求
+
+    同一個 key 的操作進行中時，後到的請求不再重複執行，而是等待同一個操作並取得相同結果
+    (或相同的例外)。ttl > 0 時成功的結果會保留 ttl 秒，期間內的請求直接返回快取。
+    """
+
+    def __init__(self, ttl: float = 0.0):
+        self.ttl = ttl
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._cache: Dict[Hashable, Tuple[float, Any]] = {}
+        # invalidate() 時遞增，之前開始的操作結果不再放入快取 (可能是變更前讀到的舊值)
+        self._generation = 0
+
+    async def run(self, key: Hashable, operation: Callable[[], Awaitable[Any]]) -> Any:
+        if self.ttl > 0:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                return cached[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(operation())
+            self._inflight[key] = task
+            generation = self._generation
+            task.add_done_callback(lambda done: self._finish(key, done, generation))
+        # 個別請求被取消時不影響其他等待同一個操作的請求
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task, generation: int):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if self.ttl > 0 and generation == self._generation:
+            self._cache[key] = (time.monotonic() + self.ttl, task.result())
+            # 順便清掉已過期的快取，避免長時間運行時累積
+            if len(self._cache) > 1024:
+                now = time.monotonic()
+                for stale in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+                    del self._cache[stale]
+
+    def invalidate(self, match: Optional[Callable[[Hashable], bool]] = None):
+        """
+        清除快取的結果 (match 為 None 時全部清除)
+
+        進行中的操作完成後不會放入快取，之後的請求也不再加入這些操作，而是重新執行。
+        """
+        self._generation += 1
+        for entries in (self._cache, self._inflight):
+            for key in [key for key in entries if match is None or match(key)]:
+                del entries[key]
@@ -0,0 +1,412 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# 客戶端記錄中可更新的欄位 (tunnel 為持有客戶端通道的 worker，見 client_tunnel.TunnelRelay)
+CLIENT_FIELDS = ("status", "instruments", "alarms", "tunnel")
+
+
+def new_client_record(client_ip: str) -> Dict:
+    """新的客戶端記錄，初始狀態為 disconnected"""
+    return {
+        "ip": client_ip,
+        "status": "disconnected",
+        "instruments": [],
+        "alarms": [],
+        "tunnel": None,
+        "last_seen": datetime.now(),
+        "session_id": str(uuid.uuid4())[:8]
+    }
+
+
+class StateStore(ABC):
+    """服務器共享狀態 (客戶端註冊表與事件) 的抽象基類
+
+    返回的客戶端記錄是複本，修改後必須透過 update_client/append_alarm 寫回，
+    這樣多個 worker 行程共用同一個儲存時也能看到彼此的更新。
+    """
+
+    # 是否由多個行程共用 (是的話事件需要由各 worker 自行從儲存讀取)
+    shared = False
+
+    @abstractmethod
+    def touch_client(self, client_ip: str) -> Tuple[Dict, bool]:
+        """
+        更新客戶端的最後見到時間，不存在時建立新記錄
+
+        Returns:
+            Tuple[Dict, bool]: (客戶端記錄, 是否為新建立)
+        """
+        pass
+
+    @abstractmethod
+    def get_client(self, client_ip: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def update_client(self, client_ip: str, **fields) -> None:
+        """更新客戶端記錄的欄位 (status、instruments、alarms、tunnel)，並更新最後見到時間"""
+        pass
+
+    @abstractmethod
+    def release_tunnel(self, client_ip: str, owner: str) -> bool:
+        """
+        通道關閉時清除擁有者並將狀態設為 disconnected
+
+        客戶端可能已經重新連線到另一個 worker，因此只有擁有者仍為 owner 時才更新。
+
+        Returns:
+            bool: 是否已更新
+        """
+        pass
+
+    @abstractmethod
+    def append_alarm(self, client_ip: str, alarm: Dict, keep: int) -> None:
+        """加入一筆警報，只保留最近 keep 筆"""
+        pass
+
+    @abstractmethod
+    def list_clients(self) -> List[Dict]:
+        pass
+
+    @abstractmethod
+    def count_clients(self, status: Optional[str] = None) -> int:
+        pass
+
+    @abstractmethod
+    def expire_clients(self, before: datetime) -> List[str]:
+        """刪除最後見到時間早於 before 的客戶端，返回被刪除的IP"""
+        pass
+
+    @abstractmethod
+    def publish_event(self, client_ip: str, event: Dict) -> None:
+        """記錄一筆要推送給瀏覽器的事件"""
+        pass
+
+    @abstractmethod
+    def events_since(self, after_id: int) -> Tuple[int, List[Tuple[str, Dict]]]:
+        """
+        讀取編號大於 after_id 的事件
+
+        Returns:
+            Tuple[int, List[Tuple[str, Dict]]]: (最新的事件編號, 其他行程發布的事件 [(客戶端IP, 事件)])
+        """
+        pass
+
+    @abstractmethod
+    def save_metrics(self, snapshot: Dict) -> None:
+        """保存本行程的請求統計快照 (server_metrics.snapshot())"""
+        pass
+
+    @abstractmethod
+    def load_metrics(self) -> List[Dict]:
+        """讀取所有行程 (含已結束的 worker) 最後保存的統計快照"""
+        pass
+
+    def latest_event_id(self) -> int:
+        return 0
+
+    def close(self):
+        pass
+
+
+class MemoryStateStore(StateStore):
+    """單一行程的記憶體儲存 (預設)
+
+    客戶端依最後見到時間由舊到新排列 (touch 時移到最後)，所有客戶端的超時時間相同，
+    因此清理時只需從最前面開始檢查，遇到未過期的客戶端即可停止。
+    """
+
+    def __init__(self):
+        self._clients: "OrderedDict[str, Dict]" = OrderedDict()
+        self._metrics: Optional[Dict] = None
+
+    def touch_client(self, client_ip: str) -> Tuple[Dict, bool]:
+        client_info = self._clients.get(client_ip)
+        created = client_info is None
+        if created:
+            client_info = self._clients[client_ip] = new_client_record(client_ip)
+        else:
+            client_info["last_seen"] = datetime.now()
+            self._clients.move_to_end(client_ip)
+        return dict(client_info), created
+
+    def get_client(self, client_ip: str) -> Optional[Dict]:
+        client_info = self._clients.get(client_ip)
+        return dict(client_info) if client_info is not None else None
+
+    def update_client(self, client_ip: str, **fields) -> None:
+        client_info = self._clients.get(client_ip)
+        if client_info is None:
+            return
+        client_info.update((name, fields[name]) for name in CLIENT_FIELDS if name in fields)
+        client_info["last_seen"] = datetime.now()
+        self._clients.move_to_end(client_ip)
+
+    def release_tunnel(self, client_ip: str, owner: str) -> bool:
+        client_info = self._clients.get(client_ip)
+        if client_info is None or client_info["tunnel"] != owner:
+            return False
+        client_info.update(tunnel=None, status="disconnected")
+        return True
+
+    def append_alarm(self, client_ip: str, alarm: Dict, keep: int) -> None:
+        client_info = self._clients.get(client_ip)
+        if client_info is not None:
+            client_info["alarms"] = (client_info["alarms"] + [alarm])[-keep:]
+
+    def list_clients(self) -> List[Dict]:
+        return [dict(client_info) for client_info in self._clients.values()]
+
+    def count_clients(self, status: Optional[str] = None) -> int:
+        if status is None:
+            return len(self._clients)
+        return sum(1 for client_info in self._clients.values() if client_info["status"] == status)
+
+    def expire_clients(self, before: datetime) -> List[str]:
+        expired = []
+        while self._clients:
+            client_ip, client_info = next(iter(self._clients.items()))
+            if client_info["last_seen"] > before:
+                break
+            del self._clients[client_ip]
+            expired.append(client_ip)
+        return expired
+
+    def publish_event(self, client_ip: str, event: Dict) -> None:
+        # 只有一個行程，事件由 app_server 直接推送給本地的訂閱者
+        pass
+
+    def events_since(self, after_id: int) -> Tuple[int, List[Tuple[str, Dict]]]:
+        return after_id, []
+
+    def save_metrics(self, snapshot: Dict) -> None:
+        self._metrics = snapshot
+
+    def load_metrics(self) -> List[Dict]:
+        return [self._metrics] if self._metrics is not None else []
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    ip TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    instruments TEXT NOT NULL,
+    alarms TEXT NOT NULL,
+    last_seen REAL NOT NULL,
+    tunnel TEXT
+);
+CREATE INDEX IF NOT EXISTS clients_last_seen ON clients (last_seen);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_ip TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_created ON events (created_at);
+CREATE TABLE IF NOT EXISTS metrics (
+    origin TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+"""
+
+
+class SQLiteStateStore(StateStore):
+    """以 SQLite (WAL 模式) 檔案在同一台主機的多個 worker 行程間共用狀態
+
+    WAL 模式下讀取不會被寫入阻擋，且 synchronous=NORMAL 時提交不需要等待 fsync，
+    每個請求更新一次最後見到時間的成本約數十微秒。事件寫入 events 資料表，
+    各 worker 輪詢新事件並推送給自己的 SSE 連線；各 worker 的請求統計快照寫入 metrics 資料表。
+    """
+
+    shared = True
+
+    def __init__(self, path: str, event_retention: float = 600.0):
+        """
+        Args:
+            path: 資料庫檔案路徑 (所有 worker 必須使用同一個檔案)
+            event_retention: 事件保留時間 (秒)，清理過期客戶端時一併刪除更舊的事件
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.event_retention = event_retention
+        # 區分事件來源，自己發布的事件已直接推送，不需要再從資料庫讀取
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in SQLITE_SCHEMA.split(";"):
+                    if statement.strip():
+                        self._db.execute(statement)
+                # 舊版建立的資料庫沒有 tunnel 欄位
+                columns = [row["name"] for row in self._db.execute("PRAGMA table_info(clients)")]
+                if "tunnel" not in columns:
+                    self._db.execute("ALTER TABLE clients ADD COLUMN tunnel TEXT")
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _to_record(row: sqlite3.Row) -> Dict:
+        return {
+            "ip": row["ip"],
+            "status": row["status"],
+            "instruments": json.loads(row["instruments"]),
+            "alarms": json.loads(row["alarms"]),
+            "tunnel": row["tunnel"],
+            "last_seen": datetime.fromtimestamp(row["last_seen"]),
+            "session_id": row["session_id"]
+        }
+
+    def touch_client(self, client_ip: str) -> Tuple[Dict, bool]:
+        now = time.time()
+        with self._lock:
+            # RETURNING 的結果需全部讀取，語句才會結束並釋放寫入鎖
+            rows = self._db.execute(
+                "UPDATE clients SET last_seen = ? WHERE ip = ? RETURNING *", (now, client_ip)
+            ).fetchall()
+            if rows:
+                return self._to_record(rows[0]), False
+
+            record = new_client_record(client_ip)
+            inserted = self._db.execute(
+                "INSERT INTO clients (ip, session_id, status, instruments, alarms, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (ip) DO NOTHING RETURNING ip",
+                (client_ip, record["session_id"], record["status"], json.dumps(record["instruments"]),
+                 json.dumps(record["alarms"]), now)
+            ).fetchall()
+            if not inserted:
+                # 另一個 worker 剛好同時建立了這個客戶端
+                row = self._db.execute("SELECT * FROM clients WHERE ip = ?", (client_ip,)).fetchone()
+                return self._to_record(row), False
+        return record, True
+
+    def get_client(self, client_ip: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM clients WHERE ip = ?", (client_ip,)).fetchone()
+        return self._to_record(row) if row else None
+
+    def update_client(self, client_ip: str, **fields) -> None:
+        columns, params = ["last_seen = ?"], [time.time()]
+        for name in CLIENT_FIELDS:
+            if name in fields:
+                columns.append(f"{name} = ?")
+                params.append(fields[name] if name in ("status", "tunnel") else json.dumps(fields[name]))
+        params.append(client_ip)
+        with self._lock:
+            self._db.execute(f"UPDATE clients SET {', '.join(columns)} WHERE ip = ?", params)
+
+    def release_tunnel(self, client_ip: str, owner: str) -> bool:
+        with self._lock:
+            rows = self._db.execute(
+                "UPDATE clients SET tunnel = NULL, status = 'disconnected' WHERE ip = ? AND tunnel = ? RETURNING ip",
+                (client_ip, owner)
+            ).fetchall()
+        return bool(rows)
+
+    def append_alarm(self, client_ip: str, alarm: Dict, keep: int) -> None:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT alarms FROM clients WHERE ip = ?", (client_ip,)).fetchone()
+                if row is not None:
+                    alarms = (json.loads(row["alarms"]) + [alarm])[-keep:]
+                    self._db.execute("UPDATE clients SET alarms = ? WHERE ip = ?", (json.dumps(alarms), client_ip))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def list_clients(self) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM clients ORDER BY last_seen").fetchall()
+        return [self._to_record(row) for row in rows]
+
+    def count_clients(self, status: Optional[str] = None) -> int:
+        with self._lock:
+            if status is None:
+                return self._db.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+            return self._db.execute("SELECT COUNT(*) FROM clients WHERE status = ?", (status,)).fetchone()[0]
+
+    def expire_clients(self, before: datetime) -> List[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "DELETE FROM clients WHERE last_seen <= ? RETURNING ip", (before.timestamp(),)
+            ).fetchall()
+            self._db.execute("DELETE FROM events WHERE created_at < ?", (time.time() - self.event_retention,))
+        return [row["ip"] for row in rows]
+
+    def publish_event(self, client_ip: str, event: Dict) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO events (client_ip, origin, created_at, payload) VALUES (?, ?, ?, ?)",
+                (client_ip, self.origin, time.time(), json.dumps(event))
+            )
+
+    def events_since(self, after_id: int) -> Tuple[int, List[Tuple[str, Dict]]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, client_ip, origin, payload FROM events WHERE id > ? ORDER BY id", (after_id,)
+            ).fetchall()
+        if not rows:
+            return after_id, []
+        # 自己發布的事件已直接推送給本地訂閱者
+        events = [(row["client_ip"], json.loads(row["payload"])) for row in rows if row["origin"] != self.origin]
+        return rows[-1]["id"], events
+
+    def latest_event_id(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def save_metrics(self, snapshot: Dict) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO metrics VALUES (?, ?, ?) "
+                "ON CONFLICT (origin) DO UPDATE SET updated_at = excluded.updated_at, payload = excluded.payload",
+                (self.origin, time.time(), json.dumps(snapshot))
+            )
+
+    def load_metrics(self) -> List[Dict]:
+        # 已結束的 worker 的快照保留下來，加總的計數器才不會在 worker 重新啟動時倒退
+        with self._lock:
+            rows = self._db.execute("SELECT payload FROM metrics").fetchall()
+        return [json.loads(row["payload"]) for row in rows]
+
+
+def create_state_store(spec: Optional[str] = None) -> StateStore:
+    """
+    依設定建立狀態儲存
+
+    Args:
+        spec: 'memory' (預設) 或 'sqlite:<檔案路徑>'，未指定時讀取環境變數 ATE_STATE_STORE
+
+    Raises:
+        ValueError: 無法識別的設定
+    """
+    spec = spec if spec is not None else os.environ.get("ATE_STATE_STORE", "memory")
+    if spec in ("", "memory"):
+        return MemoryStateStore()
+    if spec.startswith("sqlite:"):
+        return SQLiteStateStore(spec[len("sqlite:"):] or "ate_state.sqlite")
+    raise ValueError(f"無法識別的狀態儲存設定: {spec} (可用: memory、sqlite:<檔案路徑>)")
@@ -1,8 +1,40 @@
 let clientInfo = {};
 let isDetecting = false;
+let detectJobId = null;
 const instrumentTypes = ["power-supply", "afg", "eload", "daq", "scope"];
 const pollingIntervals = {};
+// 狀態輪詢的儀器類型與間隔 (ms)
+const STATUS_POLLING_TYPES = ["power-supply", "eload"];
+const STATUS_POLL_INTERVAL = 2000;
 let daqChannelCount = 1;
+// DAQ 警報監控的狀態 (由客戶端推送，DAQ 被其他操作使用時暫停並在之後重新設定掃描)
+const ALARM_MONITOR_STATES = {
+  armed: "監控中",
+  paused: "暫停 (DAQ 使用中)",
+  failed: "失敗 (已停止)",
+  stopped: "未啟動",
+};
+
+// 進行中的背景工作 (job_id -> { onProgress, resolve, reject })，以及提交請求返回前就收到的事件
+const pendingJobs = {};
+const earlyJobEvents = {};
+// 沒有收到 SSE 完成事件時 (例如串流中斷)，以輪詢確認工作狀態的間隔 (毫秒)
+const JOB_POLL_INTERVAL = 5000;
+
+// 圖表使用 WebGL 繪圖 (scattergl)，以 Plotly.react/extendTraces 只更新資料，不重建圖表
+const PLOT_LAYOUT = {
+  margin: { t: 20, l: 40, r: 20, b: 40 },
+  paper_bgcolor: "#1e1e1e",
+  plot_bgcolor: "#1e1e1e",
+  font: { color: "#e0e0e0" },
+  xaxis: { gridcolor: "#444" },
+  yaxis: { gridcolor: "#444" },
+};
+const PLOT_CONFIG = { responsive: true, displaylogo: false };
+// 趨勢圖每條曲線保留的最近點數
+const TREND_WINDOW = 3600;
+// 趨勢圖 (容器 id -> 曲線名稱與尚未繪製的新資料點)
+const trendCharts = {};
 
 // --- STATUS & DISPLAY FUNCTIONS ---
 
@@ -36,12 +68,14 @@ function updateStatusDisplay(instrumentType, data) {
   );
   if (!displayDiv) return;
 
+  // 儀器正被效率掃描等操作使用時，客戶端返回最近一次讀到的狀態
+  const busyNote = data.busy ? " (使用中)" : "";
   let html = "";
   if (instrumentType === "power-supply") {
     html = `
             <div class="status-item"><span class="status-label">State</span><span class="status-value">${
               data.output || "N/A"
-            }</span></div>
+            }${busyNote}</span></div>
             <div class="status-item"><span class="status-label">Voltage</span><span class="status-value">${
               data.voltage || "0.00"
             } V</span></div>
@@ -53,7 +87,7 @@ function updateStatusDisplay(instrumentType, data) {
     html = `
             <div class="status-item"><span class="status-label">State</span><span class="status-value">${
               data.output || "N/A"
-            }</span></div>
+            }${busyNote}</span></div>
             <div class="status-item"><span class="status-label">Current</span><span class="status-value">${
               data.current || "0.00"
             } A</span></div>
@@ -62,6 +96,19 @@ function updateStatusDisplay(instrumentType, data) {
   displayDiv.innerHTML = html;
 }
 
+function updateAlarmMonitorDisplay(monitor) {
+  const displayDiv = document.getElementById("status-display-daq");
+  const select = document.getElementById("address-daq");
+  if (!displayDiv || (select.value && monitor.address !== select.value)) return;
+
+  const rearms = monitor.rearms ? ` (已重新設定 ${monitor.rearms} 次)` : "";
+  displayDiv.innerHTML = `
+            <div class="status-item"><span class="status-label">Alarm</span><span class="status-value">${
+              ALARM_MONITOR_STATES[monitor.state] || monitor.state
+            }${rearms}</span></div>
+        `;
+}
+
 // --- CORE API FUNCTIONS ---
 
 async function checkClientStatus() {
@@ -81,30 +128,33 @@ async function checkClientStatus() {
 }
 
 async function detectInstruments() {
-  if (isDetecting) return;
-  isDetecting = true;
   const detectBtn = document.querySelector(".btn-detection");
-  detectBtn.disabled = true;
+  // 掃描進行中再按一次即取消
+  if (isDetecting) {
+    if (detectJobId) await cancelJob(detectJobId);
+    return;
+  }
+  isDetecting = true;
+  detectBtn.lastChild.textContent = "取消偵測";
   showGlobalStatus("正在掃描您的 GPIB 儀器...", "info");
 
   try {
-    const response = await fetch("/api/detect", { method: "POST" });
-    const result = await response.json();
-    if (response.ok && result.success) {
-      displayInstruments(result.instruments);
-      showGlobalStatus(
-        `✅ 成功偵測到 ${result.instruments.length} 個儀器`,
-        "success"
-      );
-      await checkClientStatus();
-    } else {
-      showGlobalStatus(`❌ 偵測失敗: ${result.detail || "未知錯誤"}`, "error");
-    }
+    const result = await runJob("detect", {}, (job) => {
+      detectJobId = job.job_id;
+      if (job.message) showGlobalStatus(`🔍 ${job.message}`, "info");
+    });
+    displayInstruments(result.instruments);
+    showGlobalStatus(
+      `✅ 成功偵測到 ${result.instruments.length} 個儀器`,
+      "success"
+    );
+    await checkClientStatus();
   } catch (error) {
-    showGlobalStatus(`❌ 偵測時發生網路錯誤`, "error");
+    showGlobalStatus(`❌ 偵測失敗: ${error.message}`, "error");
   } finally {
     isDetecting = false;
-    detectBtn.disabled = false;
+    detectJobId = null;
+    detectBtn.lastChild.textContent = "偵測所有儀器";
   }
 }
 
@@ -144,11 +194,95 @@ async function controlInstrument(instrumentType, action) {
     });
   }
 
+  if (instrumentType === "daq" && action === "start_alarm_monitor") {
+    payload.value = [];
+    document.querySelectorAll(".daq-channel-row").forEach((row) => {
+      const channel = row.querySelector('input[type="text"]').value;
+      const unit = row.querySelector("select").value;
+      const high = row.querySelector(".daq-high-limit").value;
+      if (channel && high !== "") {
+        payload.value.push({ channel, unit, high: parseFloat(high) });
+      }
+    });
+    if (payload.value.length === 0) {
+      showStatus(instrumentType, "❌ 請至少為一個通道設定警報上限", "error");
+      return;
+    }
+  }
+
+  if (instrumentType === "eload" && action === "set_dynamic") {
+    const read = (id) => parseFloat(document.getElementById(id).value);
+    const slew = read("value-eload-dyn-slew");
+    payload.value = {
+      level1: read("value-eload-dyn-l1"),
+      level2: read("value-eload-dyn-l2"),
+      t1: read("value-eload-dyn-t1") / 1000,
+      t2: read("value-eload-dyn-t2") / 1000,
+      rise: slew,
+      fall: slew,
+    };
+    if (Object.values(payload.value).some(isNaN)) {
+      showStatus(instrumentType, "❌ 請填寫 L1、L2、T1、T2 與斜率", "error");
+      return;
+    }
+  }
+
+  if (instrumentType === "eload" && action === "set_program") {
+    // 每個序列為 "記憶體:ON秒[:OFF秒]"，以逗號分隔
+    const sequences = document
+      .getElementById("value-eload-prog-sequences")
+      .value.split(",")
+      .map((item) => item.trim())
+      .filter((item) => item)
+      .map((item) => {
+        const [memory, onTime, offTime] = item.split(":").map(parseFloat);
+        return { memory, on_time: onTime, off_time: isNaN(offTime) ? 0 : offTime };
+      });
+    if (sequences.length === 0 || sequences.some((s) => isNaN(s.memory) || isNaN(s.on_time))) {
+      showStatus(instrumentType, "❌ 序列格式為 記憶體:ON秒[:OFF秒]，以逗號分隔", "error");
+      return;
+    }
+    payload.value = {
+      program: parseInt(document.getElementById("value-eload-prog-number").value, 10) || 1,
+      sequences,
+      repeat: parseInt(document.getElementById("value-eload-prog-repeat").value, 10) || 0,
+    };
+  }
+
+  if (instrumentType === "eload" && action === "run_program") {
+    payload.value = parseInt(document.getElementById("value-eload-prog-number").value, 10) || 1;
+  }
+
   if (instrumentType === "afg") {
     payload.channel = document.getElementById("channel-afg").value;
     if (action === "set_frequency") {
         payload.value = document.getElementById("value-afg-frequency").value;
     }
+    if (action === "set_sweep") {
+      const read = (id) => parseFloat(document.getElementById(id).value);
+      payload.value = {
+        start: read("value-afg-sweep-start"),
+        stop: read("value-afg-sweep-stop"),
+        time: read("value-afg-sweep-time"),
+      };
+      if (Object.values(payload.value).some(isNaN)) {
+        showStatus(instrumentType, "❌ 請填寫起始/結束頻率與掃描時間", "error");
+        return;
+      }
+      payload.value.spacing = document.getElementById("value-afg-sweep-spacing").value;
+      payload.value.mode = document.getElementById("value-afg-sweep-mode").value;
+      const interval = read("value-afg-sweep-interval");
+      payload.value.interval = isNaN(interval) ? null : interval / 1000;
+    }
+    if (action === "set_burst") {
+      const cycles = parseInt(document.getElementById("value-afg-burst-cycles").value, 10);
+      const interval = parseFloat(document.getElementById("value-afg-burst-interval").value);
+      if (isNaN(cycles)) {
+        showStatus(instrumentType, "❌ 請填寫叢發週期數", "error");
+        return;
+      }
+      payload.value = { cycles, interval: isNaN(interval) ? null : interval / 1000 };
+    }
   }
 
   console.log("Sending payload:", JSON.stringify(payload, null, 2));
@@ -172,6 +306,9 @@ async function controlInstrument(instrumentType, action) {
       if (action === "get_waveform") {
         plotWaveform(instrumentType, result.data);
       }
+      if (result.monitor) {
+        updateAlarmMonitorDisplay(result.monitor);
+      }
     } else {
       showStatus(
         instrumentType,
@@ -193,6 +330,7 @@ async function controlInstrument(instrumentType, action) {
 // --- INSTRUMENT SPECIFIC LOGIC ---
 
 function updateDaqResults(results) {
+  const now = Date.now();
   const rows = document.querySelectorAll(".daq-channel-row");
   rows.forEach((row) => {
     const channelInput = row.querySelector('input[type="text"]');
@@ -207,6 +345,7 @@ function updateDaqResults(results) {
       const value = results[channel];
       if (typeof value === "number" && !isNaN(value)) {
         resultSpan.textContent = `${value.toFixed(4)} ${unit}`;
+        appendTrend("trend-daq", channel, now, value);
         resultSpan.classList.remove("error");
       } else {
         resultSpan.textContent = "讀取失敗";
@@ -238,6 +377,10 @@ function addDaqChannel() {
                 <option value="TEMP">溫度 (°C)</option>
             </select>
         </div>
+        <div class="form-group">
+            <label for="value-daq-high-${daqChannelCount}">警報上限</label>
+            <input type="number" id="value-daq-high-${daqChannelCount}" class="daq-high-limit" placeholder="e.g., 80">
+        </div>
         <div class="form-group result-group">
             <label>讀值</label>
             <span class="daq-result">-.-- V</span>
@@ -250,32 +393,249 @@ function plotWaveform(instrumentType, data) {
   const container = document.getElementById(`waveform-${instrumentType}`);
   if (!container) return;
 
-  if (!data || !data.x || !data.y) {
+  if (!data || !data.y) {
     container.innerHTML =
       '<p style="color: red; text-align: center;">無效的波形資料</p>';
     return;
   }
 
-  Plotly.newPlot(
-    container,
-    [
-      {
-        x: data.x,
-        y: data.y,
-        type: "scatter",
-        mode: "lines",
-        marker: { color: "#03dac6" },
-      },
-    ],
-    {
-      margin: { t: 20, l: 40, r: 20, b: 40 },
-      paper_bgcolor: "#1e1e1e",
-      plot_bgcolor: "#1e1e1e",
-      font: { color: "#e0e0e0" },
-      xaxis: { gridcolor: "#444" },
-      yaxis: { gridcolor: "#444" },
+  // 等間隔的時間軸以 x0/dx 描述，不需要建立百萬點的 x 陣列
+  const trace = {
+    type: "scattergl",
+    mode: "lines",
+    y: data.y,
+    line: { color: "#03dac6", width: 1 },
+  };
+  if (data.x) {
+    trace.x = data.x;
+  } else {
+    trace.x0 = data.x0;
+    trace.dx = data.dx;
+  }
+  // uirevision 不變時保留使用者的縮放範圍
+  Plotly.react(container, [trace], { ...PLOT_LAYOUT, uirevision: instrumentType }, PLOT_CONFIG);
+}
+
+async function readScopeWaveform() {
+  const address = document.getElementById("address-scope").value;
+  if (!address) {
+    showStatus("scope", "❌ 請先選擇一個儀器位址", "error");
+    return;
+  }
+  const channel = document.getElementById("channel-scope").value;
+
+  showStatus("scope", "⚙️ 正在讀取波形...", "info");
+  try {
+    const response = await fetch(
+      `/api/scope/waveform?address=${encodeURIComponent(address)}&channel=${channel}`
+    );
+    if (!response.ok) {
+      const error = await response.json();
+      showStatus("scope", `❌ 讀取波形失敗: ${error.detail}`, "error");
+      return;
+    }
+    // 波形以 float32 二進位傳送，直接作為 Float32Array 繪圖 (不解析 JSON)
+    const samples = new Float32Array(await response.arrayBuffer());
+    plotWaveform("scope", {
+      y: samples,
+      x0: parseFloat(response.headers.get("X-Waveform-X-Zero")),
+      dx: parseFloat(response.headers.get("X-Waveform-X-Incr")),
+    });
+    const points = Number(response.headers.get("X-Waveform-Points"));
+    const shown = points > samples.length ? ` (顯示 ${samples.length.toLocaleString()} 點)` : "";
+    showStatus("scope", `✅ 已讀取 ${points.toLocaleString()} 點${shown}`, "success");
+  } catch (error) {
+    showStatus("scope", `❌ 讀取波形時發生網路錯誤`, "error");
+  }
+}
+
+/**
+ * 在趨勢圖加入一個資料點。資料點先暫存，在下一個動畫影格以一次 extendTraces 繪製，
+ * 每條曲線只保留最近 TREND_WINDOW 點。
+ */
+function appendTrend(containerId, name, time, value) {
+  const container = document.getElementById(containerId);
+  if (!container) return;
+
+  let chart = trendCharts[containerId];
+  if (!chart) {
+    chart = trendCharts[containerId] = {
+      names: [],
+      plotted: 0,
+      pending: {},
+      frame: null,
+      ready: Plotly.newPlot(
+        container,
+        [],
+        { ...PLOT_LAYOUT, xaxis: { ...PLOT_LAYOUT.xaxis, type: "date" }, showlegend: true },
+        PLOT_CONFIG
+      ),
+    };
+  }
+
+  let index = chart.names.indexOf(name);
+  if (index < 0) {
+    index = chart.names.push(name) - 1;
+  }
+  const pending = (chart.pending[index] = chart.pending[index] || { x: [], y: [] });
+  pending.x.push(time);
+  pending.y.push(value);
+
+  if (!chart.frame) {
+    chart.frame = requestAnimationFrame(() => flushTrend(container, chart));
+  }
+}
+
+function flushTrend(container, chart) {
+  chart.frame = null;
+  const pending = chart.pending;
+  chart.pending = {};
+  const indices = Object.keys(pending).map(Number);
+  const added = chart.names.slice(chart.plotted).map((name) => ({
+    type: "scattergl",
+    mode: "lines+markers",
+    name,
+    x: [],
+    y: [],
+  }));
+  chart.plotted = chart.names.length;
+
+  chart.ready = chart.ready.then(async () => {
+    if (added.length) await Plotly.addTraces(container, added);
+    await Plotly.extendTraces(
+      container,
+      { x: indices.map((i) => pending[i].x), y: indices.map((i) => pending[i].y) },
+      indices,
+      TREND_WINDOW
+    );
+  });
+}
+
+async function captureScopeScreenshot() {
+  const address = document.getElementById("address-scope").value;
+  if (!address) {
+    showStatus("scope", "❌ 請先選擇一個儀器位址", "error");
+    return;
+  }
+
+  showStatus("scope", "⚙️ 正在擷取截圖...", "info");
+  try {
+    const result = await runJob("scope_screenshot", { address });
+    // 檔案編號即內容雜湊，相同畫面由瀏覽器快取提供
+    const image = document.getElementById("screenshot-scope");
+    image.src = `/api/scope/files/${result.file_id}`;
+    image.hidden = false;
+    showStatus("scope", `✅ 截圖完成 (${(result.size / 1024).toFixed(0)} KB)`, "success");
+  } catch (error) {
+    showStatus("scope", `❌ 截圖失敗: ${error.message}`, "error");
+  }
+}
+
+// --- BACKGROUND JOBS ---
+
+/**
+ * 在客戶端提交背景工作，等待 SSE 'job' 事件回報完成。
+ * onProgress 在每次進度事件時以工作狀態 ({ progress, message, data }) 呼叫。
+ * 成功時返回工作結果，失敗或取消時拋出錯誤。
+ */
+async function runJob(kind, params, onProgress) {
+  const response = await fetch("/api/jobs", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ kind, params }),
+  });
+  const submitted = await response.json();
+  if (!response.ok || !submitted.success) {
+    throw new Error(submitted.detail || submitted.message || "提交工作失敗");
+  }
+
+  const jobId = submitted.job_id;
+  return new Promise((resolve, reject) => {
+    const pending = { onProgress, resolve, reject };
+    pending.poller = setInterval(() => pollJob(jobId), JOB_POLL_INTERVAL);
+    pendingJobs[jobId] = pending;
+    (earlyJobEvents[jobId] || []).forEach(handleJobEvent);
+    delete earlyJobEvents[jobId];
+  });
+}
+
+async function cancelJob(jobId) {
+  await fetch(`/api/jobs/${jobId}`, { method: "DELETE" });
+}
+
+function settleJob(job, result) {
+  const pending = pendingJobs[job.job_id];
+  if (!pending) return;
+  clearInterval(pending.poller);
+  delete pendingJobs[job.job_id];
+  if (job.state === "done") {
+    pending.resolve(result);
+  } else {
+    pending.reject(new Error(job.state === "cancelled" ? "已取消" : job.message || "未知錯誤"));
+  }
+}
+
+async function handleJobEvent(job) {
+  const pending = pendingJobs[job.job_id];
+  if (!pending) {
+    // 提交請求尚未返回，先保留事件
+    (earlyJobEvents[job.job_id] = earlyJobEvents[job.job_id] || []).push(job);
+    setTimeout(() => delete earlyJobEvents[job.job_id], 60000);
+    return;
+  }
+  if (job.state === "running" || job.state === "queued") {
+    if (pending.onProgress) pending.onProgress(job);
+    return;
+  }
+  // 結果太大時事件只通知完成，另外讀取結果
+  if (job.result_omitted) {
+    await pollJob(job.job_id);
+    return;
+  }
+  settleJob(job, job.result);
+}
+
+async function pollJob(jobId) {
+  try {
+    const response = await fetch(`/api/jobs/${jobId}`);
+    if (response.status === 404) {
+      settleJob({ job_id: jobId, state: "error", message: "工作已不存在" });
+      return;
+    }
+    const job = await response.json();
+    if (response.ok && !["queued", "running"].includes(job.state)) settleJob(job, job.result);
+  } catch (error) {
+    console.warn(`Failed to poll job ${jobId}`, error);
+  }
+}
+
+// --- SERVER EVENTS ---
+
+function handleAlarmEvent(alarm) {
+  const limitText = alarm.limit === "high" ? "超過上限" : "低於下限";
+  const message = `🚨 DAQ 警報: 通道 ${alarm.channel} ${limitText} (${alarm.value})`;
+  showGlobalStatus(message, "error");
+  showStatus("daq", message, "error");
+  appendTrend("trend-daq", String(alarm.channel), alarm.timestamp * 1000, Number(alarm.value));
+
+  document.querySelectorAll(".daq-channel-row").forEach((row) => {
+    const channel = row.querySelector('input[type="text"]').value;
+    const resultSpan = row.querySelector(".daq-result");
+    if (channel === String(alarm.channel) && resultSpan) {
+      resultSpan.textContent = `${Number(alarm.value).toFixed(4)} ⚠`;
+      resultSpan.classList.add("error");
     }
+  });
+}
+
+function subscribeServerEvents() {
+  const source = new EventSource("/api/events");
+  source.addEventListener("alarm", (e) => handleAlarmEvent(JSON.parse(e.data)));
+  source.addEventListener("alarm_monitor", (e) =>
+    updateAlarmMonitorDisplay(JSON.parse(e.data))
   );
+  source.addEventListener("job", (e) => handleJobEvent(JSON.parse(e.data)));
+  source.onerror = () => console.warn("Server event stream interrupted, retrying...");
 }
 
 // --- INITIALIZATION ---
@@ -312,24 +672,25 @@ function displayInstruments(instruments) {
 
 function startStatusPolling(instrumentType, address) {
   stopStatusPolling(instrumentType); // Stop any existing polling for this panel
-  // TODO: Uncomment when backend /api/status is ready
-  /*
-    pollingIntervals[instrumentType] = setInterval(async () => {
-        try {
-            const response = await fetch(`/api/status?instrument_type=${instrumentType}&address=${encodeURIComponent(address)}`);
-            if (response.ok) {
-                const data = await response.json();
-                updateStatusDisplay(instrumentType, data);
-            } else {
-                // Stop polling on error to prevent spamming
-                stopStatusPolling(instrumentType);
-            }
-        } catch (error) {
-            console.error(`Polling error for ${instrumentType}:`, error);
-            stopStatusPolling(instrumentType);
-        }
-    }, 2000); // Poll every 2 seconds
-    */
+  // 電源與負載的狀態由客戶端讀取並寫入量測記錄
+  if (!STATUS_POLLING_TYPES.includes(instrumentType)) return;
+  pollingIntervals[instrumentType] = setInterval(async () => {
+    try {
+      const response = await fetch(
+        `/api/status?instrument_type=${instrumentType}&address=${encodeURIComponent(address)}`
+      );
+      if (response.ok) {
+        const data = await response.json();
+        updateStatusDisplay(instrumentType, data);
+      } else {
+        // Stop polling on error to prevent spamming
+        stopStatusPolling(instrumentType);
+      }
+    } catch (error) {
+      console.error(`Polling error for ${instrumentType}:`, error);
+      stopStatusPolling(instrumentType);
+    }
+  }, STATUS_POLL_INTERVAL);
 }
 
 function stopStatusPolling(instrumentType) {
@@ -366,6 +727,7 @@ function initializePanels() {
 
 function initializeApp() {
   initializePanels();
+  subscribeServerEvents();
   checkClientStatus();
   setInterval(checkClientStatus, 15000);
   showGlobalStatus("🎉 歡迎使用 ATE 儀器控制系統！", "info");
@@ -0,0 +1,107 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from typing import Dict, Optional
+from fastapi import Response
+
+try:
+    import brotli
+except ImportError:  # brotli 為選用套件，未安裝時只提供 gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 值得壓縮的內容類型 (圖片等已壓縮的格式直接傳送)
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+# 小於此大小的檔案不壓縮（位元組）
+MIN_COMPRESS_SIZE = 256
+
+# 檔名含內容雜湊，內容改變時網址也會改變，瀏覽器可永久快取
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class StaticAsset:
+    """一個靜態檔案與其預先壓縮的版本"""
+
+    def __init__(self, path: str, data: bytes):
+        self.path = path
+        self.digest = hashlib.sha256(data).hexdigest()[:12]
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        # 編碼 -> 內容，依優先順序排列 (較小的在前)
+        self.variants: Dict[str, bytes] = {}
+        if len(data) >= MIN_COMPRESS_SIZE and self.media_type.startswith(COMPRESSIBLE_TYPES):
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(data, quality=11)
+            self.variants["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+            self.variants = {encoding: content for encoding, content in self.variants.items()
+                             if len(content) < len(data)}
+        self.variants["identity"] = data
+
+    @property
+    def fingerprinted_path(self) -> str:
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.{self.digest}{ext}"
+
+
+class StaticAssets:
+    """啟動時為靜態檔案產生含內容雜湊的檔名與 gzip/brotli 壓縮版本
+
+    模板以 asset_url('css/styles.css') 取得 /assets/css/styles.<雜湊>.css，
+    回應依 Accept-Encoding 選擇壓縮版本並設定 immutable 快取，重複造訪時不再傳輸靜態檔案。
+    """
+
+    def __init__(self, directory: str, url_prefix: str = "/assets", fallback_prefix: str = "/static"):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self.fallback_prefix = fallback_prefix
+        # 原始路徑 -> 檔案；含雜湊的路徑 -> 檔案
+        self._assets: Dict[str, StaticAsset] = {}
+        self._fingerprinted: Dict[str, StaticAsset] = {}
+
+    def build(self):
+        """讀取目錄下所有檔案並產生壓縮版本"""
+        assets = {}
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                full_path = os.path.join(root, filename)
+                path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+                with open(full_path, "rb") as f:
+                    assets[path] = StaticAsset(path, f.read())
+
+        self._assets = assets
+        self._fingerprinted = {asset.fingerprinted_path: asset for asset in assets.values()}
+        original = sum(len(asset.variants["identity"]) for asset in assets.values())
+        compressed = sum(len(next(iter(asset.variants.values()))) for asset in assets.values())
+        logger.info(f"📦 已建立 {len(assets)} 個靜態檔案 ({original} -> {compressed} bytes"
+                    f"{'，含 brotli' if brotli is not None else '，僅 gzip'})")
+
+    def url(self, path: str) -> str:
+        """靜態檔案的網址 (不在清單中時返回一般的 /static 網址)"""
+        asset = self._assets.get(path)
+        if asset is None:
+            return f"{self.fallback_prefix}/{path}"
+        return f"{self.url_prefix}/{asset.fingerprinted_path}"
+
+    def response(self, fingerprinted_path: str, accept_encoding: str,
+                 if_none_match: Optional[str] = None) -> Optional[Response]:
+        """依瀏覽器支援的壓縮格式返回檔案 (找不到時返回 None)"""
+        asset = self._fingerprinted.get(fingerprinted_path)
+        if asset is None:
+            return None
+
+        accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+        encoding = next(encoding for encoding in asset.variants
+                        if encoding == "identity" or encoding in accepted)
+        headers = {
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+            "ETag": f'"{asset.digest}-{encoding}"',
+            "Vary": "Accept-Encoding",
+        }
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        if if_none_match == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+        return Response(asset.variants[encoding], media_type=asset.media_type, headers=headers)